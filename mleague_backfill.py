@@ -0,0 +1,142 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import mleague_cache
+import mleague_dedup
+import mleague_fetch
+import mleague_metrics
+import mleague_parser
+import mleague_store
+
+# 過去シーズンの一括取り込み (バックフィル)
+# シーズンごとに月別URLを組み立て、1シーズン = 1プロセスで取得・解析・重複排除し、
+# 結果は親プロセスがデータベースのシーズン別パーティション (games.season) に書き込む
+
+DEFAULT_BACKFILL_OPTIONS = {
+    'first_season': 2018,      # Mリーグの初年度
+    'url_template': 'https://m-league.jp/games/?mly={year}&mlm={month}#schedule',
+    'season_months': [9, 10, 11, 12, 1, 2, 3, 4, 5],
+    'max_workers': None,       # None ならCPUコア数 (シーズン数が上限)
+    'per_host_limit': 2,       # 1プロセスあたりの同時接続数 (全体ではプロセス数倍になる)
+    'replace_partitions': True,  # シーズンの既存の試合を入れ替える (False なら追記のみ)
+}
+
+
+def get_backfill_options(config):
+    options = dict(DEFAULT_BACKFILL_OPTIONS)
+    options.update(config.get('backfill', {}))
+    return options
+
+
+def season_urls(season_start_year, url_template=DEFAULT_BACKFILL_OPTIONS['url_template'],
+                season_months=DEFAULT_BACKFILL_OPTIONS['season_months']):
+    # 2025 -> 2025年9月〜2026年5月のURL (年の繰り上がりは解析と同じ規則)
+    return [
+        url_template.format(year=mleague_parser.season_year(month, season_start_year), month=month)
+        for month in season_months
+    ]
+
+
+def scrape_season(season, urls, fetch_options, cache_options):
+    # ワーカープロセスで実行する: 取得 → 解析 → シーズン内の重複排除
+    # ログは親プロセスでまとめて出すため、リストに溜めて結果と一緒に返す
+    started = time.perf_counter()
+    logs = []
+    counters = {}
+    cache = mleague_cache.create_cache({'http_cache': cache_options})
+    pages = mleague_fetch.fetch_pages(urls, log_callback=logs.append, cache=cache, counters=counters, **fetch_options)
+
+    raw_games = []
+    for _, content in pages:
+        raw_games.extend(mleague_parser.parse_results_games(content, season))
+    # 同じ試合が2ページに載っていて内容が違えば後のものを使う
+    games = mleague_dedup.latest_games(mleague_dedup.dedupe_games(raw_games, mleague_dedup.SeenSet()))
+    counters.update(
+        games_in=len(raw_games),
+        games=len(games),
+        rows=sum(len(rows) for _, _, rows in games),
+        worker_seconds=round(time.perf_counter() - started, 4),
+    )
+    return season, games, counters, logs
+
+
+def run_backfill(config, seasons, log_callback=print, max_workers=None, metrics_callback=None):
+    # seasons: 取り込むシーズン (開幕年) のリスト。シーズンごとの結果 {シーズン: 計測値} を返す
+    options = get_backfill_options(config)
+    database_filename = config.get('database_filename')
+    if not database_filename:
+        raise ValueError("バックフィルには config の database_filename が必要です。")
+
+    fetch_options = mleague_fetch.get_fetch_options(config)
+    fetch_options['per_host_limit'] = options['per_host_limit']
+    cache_options = mleague_cache.get_cache_options(config)
+    max_workers = max_workers or options['max_workers'] or os.cpu_count() or 1
+    max_workers = max(1, min(max_workers, len(seasons)))
+    metrics = mleague_metrics.RunMetrics(metrics_callback)
+
+    log_callback(f"バックフィル: {len(seasons)}シーズン ({seasons[0]}〜{seasons[-1]}) を{max_workers}プロセスで取得します...")
+    results = {}
+    failed = {}
+    with mleague_store.ResultsStore(database_filename) as store, \
+            ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for season in seasons:
+            urls = season_urls(season, options['url_template'], options['season_months'])
+            futures[executor.submit(scrape_season, season, urls, fetch_options, cache_options)] = season
+
+        # 終わったシーズンから順に書き込む (SQLite への書き込みは親プロセスだけが行う)
+        for future in as_completed(futures):
+            season = futures[future]
+            stage = f"season-{season}"
+            try:
+                _, games, counters, logs = future.result()
+            except Exception as e:
+                failed[season] = e
+                log_callback(f"  {season}年シーズン: 取得・解析に失敗しました: {e}")
+                metrics.finish_stage(stage, 0.0, 'failed', e)
+                continue
+
+            for line in logs:
+                log_callback(line)
+            if games:
+                stored = store.upsert_games(games, season, replace=options['replace_partitions'])
+            else:
+                # ページが取れても試合が0件なら、既存のパーティションを消さないよう書き込まない
+                stored = 0
+            metrics.set(stage, db_games_written=stored, **counters)
+            metrics.finish_stage(stage, counters['worker_seconds'], 'ok')
+            results[season] = counters
+            log_callback(f"  {season}年シーズン: {counters['games']}試合を保存しました "
+                         f"({counters['pages']}ページ, {counters['worker_seconds']:.2f}秒)")
+
+    metrics.finish()
+    log_callback(f"バックフィル完了: 成功 {len(results)}シーズン / 失敗 {len(failed)}シーズン")
+    return results, failed
+
+
+def parse_seasons(start, end):
+    if end < start:
+        raise ValueError(f"シーズンの範囲が不正です: {start}〜{end}")
+    return list(range(start, end + 1))
+
+
+def main():
+    import mleague_scraper
+
+    config = mleague_scraper.load_config()
+    options = get_backfill_options(config)
+    arg_parser = argparse.ArgumentParser(description="Load past M-League seasons into the results database")
+    arg_parser.add_argument('--start', type=int, default=options['first_season'], help="最初のシーズン (開幕年)")
+    arg_parser.add_argument('--end', type=int, default=config['season_start_year'], help="最後のシーズン (開幕年)")
+    arg_parser.add_argument('--workers', type=int, default=None, help="プロセス数 (既定はCPUコア数)")
+    args = arg_parser.parse_args()
+
+    _, failed = run_backfill(config, parse_seasons(args.start, args.end), max_workers=args.workers)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
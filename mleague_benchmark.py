@@ -0,0 +1,406 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import mleague_dedup
+import mleague_history
+import mleague_metrics
+import mleague_parser
+import mleague_sheets
+import mleague_stats
+import mleague_viewer
+
+# 実ページの構造を模した合成ページでの計測 (ネットワーク不要)
+# 解析・重複排除・集計・各シートの値作成・HTML生成を段階ごとに計り、基準値より遅くなっていれば失敗にする
+# スプレッドシートの更新 (STEP 4) は mleague_sheets_emulator に対して計る
+
+DEFAULT_SCALES = [1, 10, 100]
+DEFAULT_BASELINE_FILENAME = 'benchmark_baseline.json'
+DEFAULT_THRESHOLD = 1.5     # 基準値の何倍を超えたら退行とみなすか
+MIN_REGRESSION_SECONDS = 0.02  # これより小さい差は計測誤差として無視する
+
+# 取得・集計・HTML生成だけの実行で読み込まれてはいけない重いライブラリと、mleague_scraper の読み込み時間の上限
+HEAVY_MODULES = ('gspread', 'gspread_formatting', 'google', 'googleapiclient', 'bs4')
+DEFAULT_IMPORT_BUDGET = 0.3
+
+FALLBACK_PLAYERS = ['選手A', '選手B', '選手C', '選手D', '選手E', '選手F', '選手G', '選手H']
+WEEKDAYS = ['月', '火', '水', '木', '金', '土', '日']
+
+
+def load_player_names():
+    config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.json')
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            return sorted(set(json.load(f)['m_league_players']))
+    except (OSError, ValueError, KeyError):
+        return FALLBACK_PLAYERS
+
+
+def format_point(point):
+    return f"+{point:.1f}pt" if point >= 0 else f"▲{-point:.1f}pt"
+
+
+def generate_month_page(year, month, game_days=12, games_per_day=2, seed=0, players=None, close_items=True):
+    # p-gamesResult のマークアップで1か月分の試合結果ページを作る
+    # close_items=False なら順位行の </li> を省略する (パーサーの比較用)
+    rng = random.Random(f"{seed}-{year}-{month}")
+    players = players or load_player_names()
+
+    html = ['<!DOCTYPE html><html lang="ja"><head><meta charset="UTF-8"><title>試合結果</title></head><body>']
+    html.append('<header class="l-header"><nav><ul>' + ''.join(f'<li><a href="/menu{i}">MENU {i}</a></li>' for i in range(30)) + '</ul></nav></header>')
+    html.append('<main><section class="p-gamesResult" id="schedule">')
+
+    for day_index in range(game_days):
+        day = min(28, 1 + day_index * 2)
+        weekday = WEEKDAYS[(day_index * 2) % 7]
+        html.append('<div class="p-gamesResult__item">')
+        html.append(f'<div class="p-gamesResult__date">{month}/{day}<span>({weekday})</span></div>')
+        html.append('<div class="p-gamesResult__columns">')
+        for game_number in range(1, games_per_day + 1):
+            names = rng.sample(players, 4)
+            points = sorted((round(rng.uniform(-90, 90), 1) for _ in range(4)), reverse=True)
+            html.append('<div class="p-gamesResult__column">')
+            html.append(f'<div class="p-gamesResult__number">{game_number}回戦</div>')
+            html.append('<ol class="p-gamesResult__rank-list">')
+            for rank, (name, point) in enumerate(zip(names, points), 1):
+                html.append(
+                    f'<li class="p-gamesResult__rank-item"><span class="p-gamesResult__rank">{rank}</span>'
+                    f'<img src="/img/player{rank}.png" alt="">'
+                    f'<div class="p-gamesResult__name">{name}</div>'
+                    f'<div class="p-gamesResult__point">{format_point(point)}</div>'
+                    + ('</li>' if close_items else '')
+                )
+            html.append('</ol></div>')
+        html.append('</div></div>')
+
+    html.append('</section></main>')
+    html.append('<footer class="l-footer">' + ''.join(f'<p>footer link {i}</p>' for i in range(30)) + '</footer>')
+    html.append('</body></html>')
+    return '\n'.join(html).encode('utf-8')
+
+
+def generate_season_pages(season_start_year=2025, scale=1, seed=0):
+    # 9月〜翌5月の9ページ。1日あたりの試合数を scale 倍にする (試合名は重複しない)
+    pages = []
+    for month in [9, 10, 11, 12, 1, 2, 3, 4, 5]:
+        year = season_start_year if month >= 9 else season_start_year + 1
+        pages.append(generate_month_page(year, month, games_per_day=2 * scale, seed=seed))
+    return pages
+
+
+def load_draft_config():
+    # ドラフトチームと色は config.json のものを使い、なければ合成する
+    config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.json')
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        return config['draft_teams'], config.get('team_colors', {}), config.get('special_rules', {})
+    except (OSError, ValueError, KeyError):
+        players = FALLBACK_PLAYERS
+        draft_teams = {'チームA': players[0:4], 'チームB': players[4:8]}
+        return draft_teams, {}, {}
+
+
+def best_time(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def bench_parsers(pages, season_start_year=2025, repeat=3):
+    def run(parse, pages=pages):
+        rows = []
+        for content in pages:
+            rows.extend(parse(content, season_start_year))
+        return rows
+
+    # 新旧パーサーの出力が一致することを確認してから計測する
+    # </li> を省略したページでも同じ行になることを確かめる
+    unclosed = [generate_month_page(season_start_year, 9, game_days=2, close_items=False)]
+    for checked in (unclosed, pages):
+        rows_new = run(mleague_parser.parse_results_page, checked)
+        if rows_new != run(mleague_parser.parse_results_page_bs4, checked):
+            raise AssertionError("ストリーミング版と BeautifulSoup 版の解析結果が一致しません")
+
+    return {
+        'rows': len(rows_new),
+        'bytes': sum(len(p) for p in pages),
+        'streaming': best_time(lambda: run(mleague_parser.parse_results_page), repeat),
+        'bs4': best_time(lambda: run(mleague_parser.parse_results_page_bs4), repeat),
+    }
+
+
+def bench_stages(pages, season_start_year=2025, repeat=3):
+    # パイプラインの各段階を個別に計る。段階ごとの入力は前の段階の結果を使い回す
+    draft_teams, team_colors, special_rules = load_draft_config()
+    players = load_player_names()
+    timings = {}
+
+    def parse():
+        games = []
+        for content in pages:
+            games.extend(mleague_parser.parse_results_games(content, season_start_year))
+        return games
+
+    def dedup():
+        return list(mleague_dedup.dedupe_games(games, mleague_dedup.SeenSet()))
+
+    games = parse()
+    timings['parse'] = best_time(parse, repeat)
+    unique_games = dedup()
+    timings['dedup'] = best_time(dedup, repeat)
+
+    player_data = [row for _, _, rows in unique_games for row in rows]
+    stats = mleague_stats.compute_stats(player_data, draft_teams)
+    timings['aggregate'] = best_time(lambda: mleague_stats.compute_stats(player_data, draft_teams), repeat)
+    # 別リーグ (チームと選手の組み合わせを入れ替えたドラフト) への射影
+    other_draft = dict(zip(reversed(list(draft_teams)), draft_teams.values()))
+    timings['project_league'] = best_time(lambda: stats.project(other_draft), repeat)
+    # グラフ用の推移 (既定の上限を超える規模では LTTB の間引きを含む)
+    timings['history'] = best_time(lambda: mleague_history.build_history(stats), repeat)
+
+    now = '2026/01/01 00:00:00'
+    timings['sheet_games'] = best_time(lambda: mleague_sheets.build_games_sheet(player_data, draft_teams), repeat)
+    timings['sheet_details'] = best_time(lambda: mleague_sheets.build_details_sheet(player_data, draft_teams, special_rules, now, stats=stats), repeat)
+    timings['sheet_chart'] = best_time(lambda: mleague_sheets.build_chart_sheet(player_data, draft_teams, special_rules, stats=stats), repeat)
+    timings['sheet_ranking'] = best_time(lambda: mleague_sheets.build_ranking_sheet(player_data, draft_teams, players, stats=stats), repeat)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output_path = os.path.join(tmp_dir, 'index.html')
+
+        data_dir = os.path.join(tmp_dir, mleague_viewer.DATA_DIR)
+
+        def render():
+            # 前回のデータファイルが残っていると書き込みが省かれるので、毎回消してから測る
+            shutil.rmtree(data_dir, ignore_errors=True)
+            with contextlib.redirect_stdout(io.StringIO()):
+                mleague_viewer.generate_html(player_data, draft_teams, team_colors, stats=stats, output_path=output_path)
+
+        timings['render_html'] = best_time(render, repeat)
+        html_bytes = os.path.getsize(output_path)
+        data_bytes = sum(
+            os.path.getsize(os.path.join(data_dir, filename))
+            for filename in os.listdir(data_dir) if filename.endswith('.json')
+        )
+
+    return {
+        'pages': len(pages),
+        'bytes': sum(len(p) for p in pages),
+        'games': len(unique_games),
+        'rows': len(player_data),
+        'html_bytes': html_bytes,
+        'data_bytes': data_bytes,
+        'timings': timings,
+        'player_data': player_data,
+    }
+
+
+def bench_publish(player_data, season_start_year=2025, repeat=3):
+    # STEP 4 を mleague_sheets_emulator に対して実行して計る (認証・クォータは使わない)
+    # publish_full は同期状態なしの全件書き込み、publish_diff は最後の1日分の試合を足したときの差分書き込み
+    import mleague_scraper
+    import mleague_sheets_emulator
+
+    draft_teams, team_colors, special_rules = load_draft_config()
+    last_date = max(row[0] for row in player_data).split(' ')[0]
+    base_data = [row for row in player_data if not row[0].startswith(last_date)]
+    timings = {}
+    requests = {}
+
+    with mleague_sheets_emulator.SheetsEmulator(port=0) as emulator, tempfile.TemporaryDirectory() as tmp_dir:
+        state_filename = os.path.join(tmp_dir, 'sheets_state.json')
+        config = {
+            'season_start_year': season_start_year,
+            'urls': [],
+            'spreadsheet_name': 'benchmark',
+            'output_filename': os.path.join(tmp_dir, 'results.csv'),
+            'service_account_file': os.path.join(tmp_dir, 'credentials.json'),
+            'draft_teams': draft_teams,
+            'team_colors': team_colors,
+            'special_rules': special_rules,
+            'm_league_players': load_player_names(),
+            'http_cache': {'enabled': False},
+            # トークンバケットで待つ時間ではなく、差分計算・リクエスト作成・送信の時間を計る
+            'google_api': {'endpoint': emulator.endpoint, 'requests_per_minute': 1000000, 'burst': 1000},
+            'sheets_sync': {'mode': 'diff', 'state_filename': state_filename},
+        }
+
+        def publish(data):
+            # (秒, エミュレーターが受けた呼び出し回数)
+            run = mleague_scraper.ScraperRun(config, log_callback=lambda message: None)
+            run.all_player_data = data
+            run.stats = run.leagues[0].stats = mleague_stats.compute_stats(data, draft_teams)
+            before = emulator.counters().get('requests', 0)
+            started = time.perf_counter()
+            mleague_scraper.stage_publish_sheets(run)
+            return time.perf_counter() - started, emulator.counters().get('requests', 0) - before
+
+        def reset():
+            emulator.state.reset()
+            if os.path.exists(state_filename):
+                os.remove(state_filename)
+
+        for name, base in (('publish_full', None), ('publish_diff', base_data)):
+            results = []
+            for _ in range(repeat):
+                reset()
+                if base is not None:
+                    publish(base)
+                results.append(publish(player_data))
+            timings[name], requests[name] = min(results)
+
+    return timings, requests
+
+
+def bench_import(module='mleague_scraper', repeat=3):
+    # 新しいプロセスでモジュールを読み込み、最短の読み込み時間と一緒に読み込まれた重いライブラリを返す
+    probe = (
+        "import json, sys, time\n"
+        "started = time.perf_counter()\n"
+        f"import {module}\n"
+        "seconds = time.perf_counter() - started\n"
+        f"heavy = sorted({{name.split('.')[0] for name in sys.modules}} & set({HEAVY_MODULES!r}))\n"
+        "print(json.dumps({'seconds': seconds, 'heavy_modules': heavy}))\n"
+    )
+    directory = os.path.dirname(os.path.abspath(__file__))
+    results = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', probe], cwd=directory, capture_output=True, text=True, check=True).stdout
+        results.append(json.loads(output))
+    return {
+        'module': module,
+        'seconds': min(result['seconds'] for result in results),
+        'heavy_modules': sorted({name for result in results for name in result['heavy_modules']}),
+    }
+
+
+def check_import(result, budget=DEFAULT_IMPORT_BUDGET):
+    # 問題があれば理由の文字列のリストを返す
+    problems = []
+    if result['heavy_modules']:
+        problems.append(f"{result['module']} の読み込みで {', '.join(result['heavy_modules'])} が読み込まれています")
+    if budget and result['seconds'] > budget:
+        problems.append(f"{result['module']} の読み込みに {result['seconds'] * 1000:.1f} ms かかっています (上限 {budget * 1000:.0f} ms)")
+    return problems
+
+
+def load_baseline(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def find_regressions(results, baseline, threshold=DEFAULT_THRESHOLD, min_seconds=MIN_REGRESSION_SECONDS):
+    # [(規模, 段階, 基準秒, 今回秒)] を返す。基準値にない規模・段階は比較しない
+    regressions = []
+    for scale, result in results.items():
+        base = (baseline or {}).get('results', {}).get(scale)
+        if not base:
+            continue
+        for stage, seconds in result['timings'].items():
+            base_seconds = base['timings'].get(stage)
+            if base_seconds is None:
+                continue
+            if seconds > base_seconds * threshold and seconds - base_seconds > min_seconds:
+                regressions.append((scale, stage, base_seconds, seconds))
+    return regressions
+
+
+def print_results(results, baseline=None):
+    for scale, result in results.items():
+        base = (baseline or {}).get('results', {}).get(scale, {}).get('timings', {})
+        print(f"[{scale}] pages: {result['pages']}  bytes: {result['bytes']:,}  games: {result['games']:,}  "
+              f"rows: {result['rows']:,}  html: {result['html_bytes']:,} bytes  data: {result.get('data_bytes', 0):,} bytes")
+        for stage, seconds in result['timings'].items():
+            line = f"  {stage:<14}: {seconds * 1000:9.1f} ms"
+            if stage in result.get('api_requests', {}):
+                line += f"  [{result['api_requests'][stage]} requests]"
+            if stage in base and base[stage] > 0:
+                line += f"  (基準 {base[stage] * 1000:.1f} ms, x{seconds / base[stage]:.2f})"
+            print(line)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="M-League scraper benchmarks (offline)")
+    arg_parser.add_argument('--scales', default=','.join(str(s) for s in DEFAULT_SCALES),
+                            help="1シーズン分の何倍の試合数で計測するか (カンマ区切り)")
+    arg_parser.add_argument('--repeat', type=int, default=3)
+    arg_parser.add_argument('--baseline', default=DEFAULT_BASELINE_FILENAME, help="基準値のJSONファイル")
+    arg_parser.add_argument('--save-baseline', action='store_true', help="今回の結果を基準値として保存する")
+    arg_parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                            help="基準値の何倍を超えたら失敗にするか")
+    arg_parser.add_argument('--compare-parsers', action='store_true',
+                            help="ストリーミング版と BeautifulSoup 版のパーサーを比較する")
+    arg_parser.add_argument('--import-budget', type=float, default=DEFAULT_IMPORT_BUDGET,
+                            help="mleague_scraper の読み込み時間の上限(秒)。0 なら上限を見ない")
+    arg_parser.add_argument('--skip-publish', action='store_true',
+                            help="スプレッドシートの更新 (エミュレーター) を計測しない")
+    arg_parser.add_argument('--report-only', action='store_true',
+                            help="基準値より遅い段階・読み込み時間の上限超えを表示するだけで失敗にしない")
+    args = arg_parser.parse_args()
+    scales = [int(s) for s in args.scales.split(',') if s.strip()]
+
+    if args.compare_parsers:
+        for scale in scales:
+            pages = generate_season_pages(scale=scale)
+            result = bench_parsers(pages, repeat=args.repeat)
+            print(f"[x{scale}] pages: {len(pages)}  bytes: {result['bytes']:,}  rows: {result['rows']:,}")
+            print(f"  streaming parser : {result['streaming'] * 1000:8.1f} ms")
+            print(f"  BeautifulSoup    : {result['bs4'] * 1000:8.1f} ms  (x{result['bs4'] / result['streaming']:.1f})")
+        return 0
+
+    results = {}
+    for scale in scales:
+        result = bench_stages(generate_season_pages(scale=scale), repeat=args.repeat)
+        if not args.skip_publish:
+            player_data = result.pop('player_data')
+            publish_timings, result['api_requests'] = bench_publish(player_data, repeat=args.repeat)
+            result['timings'].update(publish_timings)
+        result.pop('player_data', None)
+        results[f"x{scale}"] = result
+
+    baseline = load_baseline(args.baseline)
+    print_results(results, baseline)
+
+    # 起動の速さ (基準値とは比べず、上限と重いライブラリの有無だけを見る)
+    import_result = bench_import(repeat=args.repeat)
+    print(f"[import] {import_result['module']}: {import_result['seconds'] * 1000:.1f} ms")
+    import_problems = check_import(import_result, budget=args.import_budget)
+    for problem in import_problems:
+        print(f"起動: {problem}")
+    if args.report_only:
+        # 時間は計算機の速さで変わるので、失敗にするのは重いライブラリの読み込みだけ
+        import_problems = check_import(import_result, budget=0)
+
+    if args.save_baseline:
+        mleague_metrics.save_json({'version': 1, 'repeat': args.repeat, 'results': results}, args.baseline)
+        print(f"基準値を保存しました: {args.baseline}")
+        return 1 if import_problems else 0
+
+    if baseline is None:
+        print(f"基準値 ({args.baseline}) がないため比較しません。--save-baseline で作成できます。")
+        return 1 if import_problems else 0
+
+    regressions = find_regressions(results, baseline, threshold=args.threshold)
+    for scale, stage, base_seconds, seconds in regressions:
+        print(f"退行: [{scale}] {stage} {base_seconds * 1000:.1f} ms -> {seconds * 1000:.1f} ms (x{seconds / base_seconds:.2f})")
+    if args.report_only:
+        return 1 if import_problems else 0
+    return 1 if regressions or import_problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+import hashlib
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta
+from urllib.parse import urlparse, parse_qs
+
+DEFAULT_CACHE_OPTIONS = {
+    'enabled': True,
+    'dir': '.cache/http',
+    # 月が終わってから何日経てばページを「確定済み」とみなすか
+    'freeze_grace_days': 1,
+}
+
+DATE_FORMAT = '%Y/%m/%d %H:%M:%S'
+
+
+def get_cache_options(config):
+    options = dict(DEFAULT_CACHE_OPTIONS)
+    options.update(config.get('http_cache', {}))
+    return options
+
+
+def jst_now():
+    # 日本時間 (UTC+9)
+    return datetime.utcnow() + timedelta(hours=9)
+
+
+def page_month(url):
+    # https://m-league.jp/games/?mly=2025&mlm=9 -> (2025, 9)
+    query = parse_qs(urlparse(url).query)
+    try:
+        return int(query['mly'][0]), int(query['mlm'][0])
+    except (KeyError, IndexError, ValueError):
+        return None
+
+
+def month_end(year, month):
+    # 翌月1日 0:00 (JST) を月末の区切りとする
+    if month == 12:
+        return datetime(year + 1, 1, 1)
+    return datetime(year, month + 1, 1)
+
+
+def is_month_closed(url, fetched_at, grace_days):
+    ym = page_month(url)
+    if ym is None:
+        return False
+    return fetched_at >= month_end(*ym) + timedelta(days=grace_days)
+
+
+class HttpCache:
+    def __init__(self, cache_dir, freeze_grace_days=DEFAULT_CACHE_OPTIONS['freeze_grace_days']):
+        self.cache_dir = cache_dir
+        self.freeze_grace_days = freeze_grace_days
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _paths(self, url):
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        base = os.path.join(self.cache_dir, key)
+        return base + '.body', base + '.json'
+
+    def get(self, url):
+        body_path, meta_path = self._paths(url)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            with open(body_path, 'rb') as f:
+                meta['body'] = f.read()
+        except (OSError, ValueError):
+            return None
+        return meta
+
+    def conditional_headers(self, entry):
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def store(self, url, body, etag=None, last_modified=None):
+        body_path, meta_path = self._paths(url)
+        now = jst_now()
+        meta = {
+            'url': url,
+            'etag': etag,
+            'last_modified': last_modified,
+            'fetched_at': now.strftime(DATE_FORMAT),
+            'frozen': is_month_closed(url, now, self.freeze_grace_days),
+        }
+        self._atomic_write(body_path, body)
+        self._atomic_write(meta_path, json.dumps(meta, ensure_ascii=False, indent=2).encode('utf-8'))
+        return meta
+
+    def store_response(self, url, response):
+        return self.store(
+            url,
+            response.content,
+            etag=response.headers.get('ETag'),
+            last_modified=response.headers.get('Last-Modified'),
+        )
+
+    def revalidated(self, url, entry):
+        # 304 Not Modified の場合は本文はそのままで確認日時と確定状態だけ更新する
+        return self.store(url, entry['body'], etag=entry.get('etag'), last_modified=entry.get('last_modified'))
+
+    def _atomic_write(self, path, data):
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+def create_cache(config):
+    options = get_cache_options(config)
+    if not options['enabled']:
+        return None
+    return HttpCache(options['dir'], freeze_grace_days=options['freeze_grace_days'])
@@ -0,0 +1,161 @@
+import hashlib
+import json
+import os
+import tempfile
+
+from mleague_parser import UNKNOWN_DATE, UNKNOWN_NUMBER
+
+# 試合単位のストリーミング重複排除
+# 試合ID は試合の枠 (日付, 回戦) から作り、保存先の主キーにも使う (枠が読めなかった試合は内容も含める)
+# 選手・スコア・順位の内容ハッシュは別に持ち、同じ枠の内容が変わったら (公式サイトでの修正) 置き換える
+
+# 既出IDファイルは1行目のヘッダー (シーズン・全試合の指紋・対応する保存済みCSVの行数とバイト数) と「試合ID<TAB>内容ハッシュ」の行
+SEEN_VERSION = 1
+DEFAULT_SEEN_CAPACITY = 200000
+PLAYERS_PER_GAME = 4
+
+NEW = 'new'             # 初めて見た試合
+CHANGED = 'changed'     # 既出の試合だが内容が変わった (修正)
+
+
+def make_game_id(game_title, rows):
+    # "2025/09/03 1回戦" -> 日付と回戦だけから作る (スコアが修正されても同じID)
+    # 日付か回戦が読めなかった試合は同じ枠に何試合も入るので、選手・スコアの内容ハッシュも含めて別の試合にする
+    date_str, _, number_text = game_title.partition(' ')
+    parts = [date_str, number_text]
+    if date_str in ('', UNKNOWN_DATE) or number_text in ('', UNKNOWN_NUMBER):
+        parts.append(content_hash(rows))
+    payload = '\x1f'.join(parts)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:20]
+
+
+def content_hash(rows):
+    # rows は [試合名, 選手名, スコア, 順位] の行。並び順に依存しないよう選手名でソートする
+    players = sorted(f"{row[1]}:{float(row[2]):.1f}:{row[3]}" for row in rows)
+    return hashlib.sha256('\x1f'.join(players).encode('utf-8')).hexdigest()[:20]
+
+
+def game_fingerprint(game_id, digest):
+    # 1試合分の指紋。全試合の XOR を試合データ全体の指紋にする (並び順によらず、1試合ずつ足し引きできる)
+    return int(hashlib.sha256(f"{game_id}\t{digest}".encode('utf-8')).hexdigest(), 16)
+
+
+def group_games(player_data):
+    # 行リストを試合名ごとに4行ずつ区切った (試合名, 行) の並びにする (保存済みCSV・DB用)
+    games_raw = {}
+    for row in player_data:
+        games_raw.setdefault(row[0], []).append(row)
+    for game_title, entries in games_raw.items():
+        for i in range(0, len(entries), PLAYERS_PER_GAME):
+            chunk = entries[i:i+PLAYERS_PER_GAME]
+            if len(chunk) == PLAYERS_PER_GAME:
+                yield game_title, chunk
+
+
+class SeenSet:
+    # 既出の試合ID -> 内容ハッシュ。容量を超えたら古いものから忘れる (dict の挿入順を利用)
+    # fingerprint は追加した全試合の game_fingerprint の XOR (容量を超えて忘れた試合の分も残る)
+    def __init__(self, capacity=DEFAULT_SEEN_CAPACITY, items=(), fingerprint=None):
+        self.capacity = capacity
+        self._ids = dict(items)
+        if fingerprint is None:
+            fingerprint = 0
+            for game_id, digest in self._ids.items():
+                fingerprint ^= game_fingerprint(game_id, digest)
+        self.fingerprint = fingerprint
+        self.row_count = None       # 読み込んだファイルに記録されていた行数・CSVのバイト数・シーズン (作ったときは None)
+        self.results_bytes = None
+        self.season = None
+        self._trim()
+
+    def __contains__(self, game_id):
+        return game_id in self._ids
+
+    def __len__(self):
+        return len(self._ids)
+
+    def add(self, game_id, digest=None):
+        # 初出なら NEW、内容が変わっていれば CHANGED、同じ内容なら None
+        if game_id in self._ids:
+            previous = self._ids[game_id]
+            if previous == digest:
+                return None
+            self._ids[game_id] = digest
+            self.fingerprint ^= game_fingerprint(game_id, previous) ^ game_fingerprint(game_id, digest)
+            return CHANGED
+        self._ids[game_id] = digest
+        self.fingerprint ^= game_fingerprint(game_id, digest)
+        self._trim()
+        return NEW
+
+    def fingerprint_hex(self):
+        return f"{self.fingerprint:064x}"
+
+    def _trim(self):
+        while len(self._ids) > self.capacity:
+            del self._ids[next(iter(self._ids))]
+
+    def save(self, path, row_count, results_bytes=None, season=None):
+        # results_bytes は同時に保存したCSVの大きさ (次回、CSVを読まずに対応を確かめるのに使う)
+        # season はCSVの試合のシーズン (config の season_start_year。シーズンが替わったら使わない)
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                header = {'version': SEEN_VERSION, 'season': season, 'row_count': row_count,
+                          'results_bytes': results_bytes, 'fingerprint': self.fingerprint_hex()}
+                f.write(json.dumps(header) + '\n')
+                for game_id, digest in self._ids.items():
+                    f.write(f"{game_id}\t{digest}\n")
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path, capacity=DEFAULT_SEEN_CAPACITY, expected_rows=None, expected_bytes=None, expected_season=None):
+        # 使えない (無い・版違い・シーズン違い・保存済みデータと件数やバイト数が合わない) なら None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                header = json.loads(f.readline())
+                if header.get('version') != SEEN_VERSION:
+                    return None
+                if expected_season is not None and header.get('season') != expected_season:
+                    return None
+                if expected_rows is not None and header.get('row_count') != expected_rows:
+                    return None
+                if expected_bytes is not None and header.get('results_bytes') != expected_bytes:
+                    return None
+                items = (line.strip().split('\t') for line in f if line.strip())
+                seen = cls(capacity, items, fingerprint=int(header['fingerprint'], 16))
+                seen.row_count = header.get('row_count')
+                seen.results_bytes = header.get('results_bytes')
+                seen.season = header.get('season')
+                return seen
+        except (OSError, ValueError, KeyError):
+            return None
+
+
+def dedupe_games(games, seen, corrected=None):
+    # games: (試合名, 行) を1試合ずつ受け取り、初出か内容が変わった試合だけを (試合ID, 試合名, 行) で返す
+    # 内容が変わった試合は corrected (リスト) にも (試合ID, 試合名) を追加する
+    # 4人分そろっていない試合は取り込まない
+    for game_title, rows in games:
+        if len(rows) != PLAYERS_PER_GAME:
+            continue
+        game_id = make_game_id(game_title, rows)
+        status = seen.add(game_id, content_hash(rows))
+        if status is None:
+            continue
+        if status == CHANGED and corrected is not None:
+            corrected.append((game_id, game_title))
+        yield game_id, game_title, rows
+
+
+def latest_games(games):
+    # 同じ試合IDが複数あれば後のもの (修正後) だけを残す。順序は最初に出てきた位置
+    latest = {}
+    for game_id, game_title, rows in games:
+        latest[game_id] = (game_id, game_title, rows)
+    return list(latest.values())
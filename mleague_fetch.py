@@ -0,0 +1,113 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+DEFAULT_FETCH_OPTIONS = {
+    'max_workers': 4,       # 同時に走らせるスレッド数
+    'per_host_limit': 3,    # 同一ホストへの同時接続数の上限
+    'timeout': 20,          # 1リクエストあたりのタイムアウト(秒)
+    'retries': 3,           # 接続エラー・5xx・429 時の再試行回数
+    'backoff_factor': 1.0,  # 再試行間隔 (1, 2, 4... 秒)
+}
+
+
+def get_fetch_options(config):
+    options = dict(DEFAULT_FETCH_OPTIONS)
+    options.update(config.get('fetch', {}))
+    return options
+
+
+def create_session(headers=None, pool_size=DEFAULT_FETCH_OPTIONS['per_host_limit'],
+                   retries=DEFAULT_FETCH_OPTIONS['retries'],
+                   backoff_factor=DEFAULT_FETCH_OPTIONS['backoff_factor']):
+    # Keep-Alive で接続を使い回すセッション (TCP/TLSハンドシェイクは初回のみ)
+    session = requests.Session()
+    session.headers.update(headers or DEFAULT_HEADERS)
+
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def fetch_pages(urls, headers=None, log_callback=print, cache=None, counters=None, **options):
+    # 月別ページを並列に取得し、URLの順番どおりに (url, content) のリストで返す
+    # cache (mleague_cache.HttpCache) を渡すと確定済みの月は通信せず、それ以外は条件付きGETになる
+    # counters (dict) を渡すと取得件数・通信量・キャッシュ使用数を加算する
+    opts = dict(DEFAULT_FETCH_OPTIONS)
+    opts.update(options)
+    if counters is None:
+        counters = {}
+    for key in ('pages', 'requests', 'bytes_downloaded', 'cache_hits', 'not_modified'):
+        counters.setdefault(key, 0)
+    counter_lock = threading.Lock()
+
+    def count(**amounts):
+        with counter_lock:
+            for key, amount in amounts.items():
+                counters[key] += amount
+
+    host_limits = {}
+    for url in urls:
+        host = urlparse(url).netloc
+        if host not in host_limits:
+            host_limits[host] = threading.BoundedSemaphore(opts['per_host_limit'])
+
+    session = create_session(
+        headers=headers,
+        pool_size=opts['per_host_limit'],
+        retries=opts['retries'],
+        backoff_factor=opts['backoff_factor'],
+    )
+
+    def fetch_one(url):
+        entry = cache.get(url) if cache else None
+        if entry and entry.get('frozen'):
+            log_callback(f"  キャッシュ使用(確定済み): {url}")
+            count(pages=1, cache_hits=1)
+            return entry['body']
+
+        request_headers = cache.conditional_headers(entry) if entry else {}
+        with host_limits[urlparse(url).netloc]:
+            response = session.get(url, headers=request_headers, timeout=opts['timeout'])
+
+        if response.status_code == 304 and entry:
+            cache.revalidated(url, entry)
+            log_callback(f"  キャッシュ使用(未更新): {url}")
+            count(pages=1, requests=1, cache_hits=1, not_modified=1)
+            return entry['body']
+
+        response.raise_for_status()
+        if cache:
+            cache.store_response(url, response)
+        log_callback(f"  取得完了: {url}")
+        count(pages=1, requests=1, bytes_downloaded=len(response.content))
+        return response.content
+
+    try:
+        max_workers = max(1, min(opts['max_workers'], len(urls)))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            contents = list(executor.map(fetch_one, urls))
+    finally:
+        session.close()
+
+    return list(zip(urls, contents))
@@ -0,0 +1,72 @@
+import hashlib
+import importlib.util
+import json
+import os
+import tempfile
+import threading
+
+from mleague_dedup import content_hash, game_fingerprint, group_games, make_game_id
+from mleague_store import as_player_data
+
+# 公開済みの内容の指紋 (fingerprint)
+# 正規化した試合データ・リーグの設定・出力を作るコードのハッシュをまとめて1つの値にし、
+# 前回公開したときと同じならWebページ・スプレッドシートの作り直しと再公開を省く
+
+
+def data_fingerprint(player_data):
+    # 行の並び順やスコアの表記 (28.3 / 28.30) によらない試合データのハッシュ
+    # 試合ごとの指紋の XOR なので並べ替えは要らず、mleague_dedup.SeenSet.fingerprint_hex() と同じ値になる
+    fingerprint = 0
+    for game_title, rows in group_games(as_player_data(player_data)):
+        fingerprint ^= game_fingerprint(make_game_id(game_title, rows), content_hash(rows))
+    return f"{fingerprint:064x}"
+
+
+def source_fingerprint(*module_names):
+    # 出力を作るコードが変わったら、データが同じでも作り直す
+    # モジュールは読み込まずにファイルの場所だけを調べる (STEP 4 を省くときに Google のライブラリを読み込まない)
+    digest = hashlib.sha256()
+    for module_name in module_names:
+        with open(importlib.util.find_spec(module_name).origin, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def combine(*parts):
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class PublishState:
+    # 公開先 ("html:<リーグID>" / "sheets:<リーグID>") ごとに、最後に公開した内容の指紋を保存する
+    # STEP 4 と STEP 5 は並行して動くので、読み書きはロックの中で行う
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.data = json.load(f)
+        except (OSError, ValueError):
+            self.data = {}
+
+    def unchanged(self, target, fingerprint):
+        with self.lock:
+            return self.data.get(target) == fingerprint
+
+    def record(self, target, fingerprint):
+        with self.lock:
+            self.data[target] = fingerprint
+
+    def save(self):
+        with self.lock:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(self.data, f, ensure_ascii=False, indent=2, sort_keys=True)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
@@ -0,0 +1,217 @@
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Google API (gspread / googleapiclient) 呼び出しの共通窓口
+# トークンバケットで毎分のクォータに収まるよう間隔を空け、429・5xx は指数バックオフで再試行する
+
+DEFAULT_API_OPTIONS = {
+    'requests_per_minute': 60,  # Sheets API の「ユーザーごと・1分あたり」の上限に合わせる
+    'burst': 10,                # 間隔を空けずに続けて送ってよい回数
+    'max_retries': 8,           # 再試行の上限 (これを超えたら例外をそのまま投げる)
+    'backoff_base': 1.0,        # 再試行間隔の基準 (1, 2, 4... 秒にジッターをかける)
+    'backoff_max': 64.0,        # 再試行間隔の上限(秒)
+    'endpoint': None,           # 指定すると Google API の代わりにこのURL (mleague_sheets_emulator など) へ送る
+}
+
+RETRIABLE_STATUS = (408, 429, 500, 502, 503, 504)
+RATE_LIMIT_REASONS = ('rateLimitExceeded', 'userRateLimitExceeded', 'quotaExceeded')
+GOOGLE_API_HOSTS = ('https://sheets.googleapis.com', 'https://www.googleapis.com')
+
+
+DEFAULT_SYNC_OPTIONS = {
+    # 'diff': 前回の書き込み内容との差分だけを送る / 'full': 毎回クリアして全件書き込む
+    'mode': 'diff',
+    'state_filename': '.cache/sheets_state.json',
+    # 1回の spreadsheets.batchUpdate に載せる最大サイズ。超える分は複数回に分けて送る
+    'max_request_bytes': 2000000,
+    # シートを並列に書き込むスレッド数
+    'max_workers': 4,
+}
+
+
+def get_api_options(config):
+    options = dict(DEFAULT_API_OPTIONS)
+    options.update(config.get('google_api', {}))
+    return options
+
+
+def get_sync_options(config):
+    # スプレッドシートへの書き込み方 (mleague_publish)。設定の読み込みだけで gspread を読み込まないようここに置く
+    options = dict(DEFAULT_SYNC_OPTIONS)
+    options.update(config.get('sheets_sync', {}))
+    return options
+
+
+class TokenBucket:
+    # requests_per_minute の速さでトークンが溜まり、最大 burst 個まで貯められる
+    def __init__(self, requests_per_minute, burst, clock=time.monotonic, sleep=time.sleep):
+        self.rate = requests_per_minute / 60.0
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        # トークンが無ければ溜まるまで待つ。待った秒数を返す
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = self.clock()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            self.sleep(delay)
+            waited += delay
+
+    def drain(self):
+        # 429 を受けたら貯めていた分を捨て、次の呼び出しから間隔を空ける
+        with self.lock:
+            self.tokens = 0.0
+            self.updated = self.clock()
+
+
+class EndpointAdapter(HTTPAdapter):
+    # Sheets / Drive API 宛てのURLを endpoint に書き換えて送る (パス・クエリはそのまま)
+    def __init__(self, endpoint, **kwargs):
+        super().__init__(**kwargs)
+        self.endpoint = endpoint.rstrip('/')
+
+    def send(self, request, **kwargs):
+        for host in GOOGLE_API_HOSTS:
+            if request.url.startswith(host + '/'):
+                request.url = self.endpoint + request.url[len(host):]
+                break
+        return super().send(request, **kwargs)
+
+
+def endpoint_session(endpoint):
+    # gspread.authorize(None, session=endpoint_session(url)) で認証なしにエミュレーターへ接続する
+    session = requests.Session()
+    adapter = EndpointAdapter(endpoint)
+    for host in GOOGLE_API_HOSTS:
+        session.mount(host + '/', adapter)
+    return session
+
+
+def error_status(error):
+    # gspread.exceptions.APIError は response、googleapiclient.errors.HttpError は resp を持つ
+    response = getattr(error, 'response', None)
+    if response is not None and getattr(response, 'status_code', None) is not None:
+        return response.status_code, response.headers
+    resp = getattr(error, 'resp', None)
+    if resp is not None and getattr(resp, 'status', None) is not None:
+        return int(resp.status), resp
+    return None, {}
+
+
+def error_reasons(error):
+    details = getattr(error, 'error', None)
+    if not isinstance(details, dict):
+        return []
+    return [item.get('reason') for item in details.get('errors', []) if isinstance(item, dict)]
+
+
+def is_rate_limited(error):
+    status, _ = error_status(error)
+    if status == 429:
+        return True
+    return status == 403 and any(reason in RATE_LIMIT_REASONS for reason in error_reasons(error))
+
+
+def is_retriable(error, idempotent=True):
+    # 通信の切断・タイムアウト・5xx では要求が反映されたかどうか分からないので、冪等な要求だけ再試行する
+    # レート制限で断られた要求は反映されていないので、冪等でなくても再試行する
+    if is_rate_limited(error):
+        return True
+    if isinstance(error, (requests.ConnectionError, requests.Timeout, ConnectionError, TimeoutError)):
+        return idempotent
+    status, _ = error_status(error)
+    return idempotent and status in RETRIABLE_STATUS
+
+
+def retry_after(error):
+    # Retry-After ヘッダー (秒数 or HTTP日付) があれば待つ秒数を返す
+    _, headers = error_status(error)
+    value = headers.get('Retry-After') if headers else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class GoogleApiClient:
+    # すべての Google API 呼び出しを call() 経由にする (スレッドから同時に呼んでもよい)
+    def __init__(self, log_callback=print, sleep=time.sleep, **options):
+        self.options = dict(DEFAULT_API_OPTIONS)
+        self.options.update(options)
+        self.log_callback = log_callback
+        self.sleep = sleep
+        self.bucket = TokenBucket(self.options['requests_per_minute'], self.options['burst'], sleep=sleep)
+        self.lock = threading.Lock()
+        self.counters = {
+            'calls': 0,          # 実際に送った回数 (再試行を含む)
+            'retried': 0,        # 再試行した回数
+            'throttled': 0,      # 429 / レート制限で断られた回数
+            'failed': 0,         # 再試行を諦めた・再試行できない失敗の回数
+            'limiter_wait': 0.0,  # トークンバケットで待った秒数
+            'backoff_wait': 0.0,  # 再試行前に待った秒数
+        }
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] += amount
+
+    def backoff_delay(self, attempt, error):
+        delay = retry_after(error)
+        if delay is not None:
+            return min(delay, self.options['backoff_max'])
+        # Full Jitter: 0 〜 base * 2^attempt の一様乱数
+        cap = min(self.options['backoff_max'], self.options['backoff_base'] * (2 ** attempt))
+        return random.uniform(0, cap)
+
+    def call(self, func, *args, idempotent=True, **kwargs):
+        # idempotent=False (行の挿入・削除、シートの追加など) は二重に反映されないよう、レート制限のときだけ再試行する
+        attempt = 0
+        while True:
+            self.count('limiter_wait', self.bucket.acquire())
+            self.count('calls')
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                if is_rate_limited(e):
+                    self.count('throttled')
+                    self.bucket.drain()
+                if not is_retriable(e, idempotent) or attempt >= self.options['max_retries']:
+                    self.count('failed')
+                    raise
+                delay = self.backoff_delay(attempt, e)
+                attempt += 1
+                self.count('retried')
+                self.count('backoff_wait', delay)
+                name = getattr(func, '__name__', 'API')
+                self.log_callback(f"  {name}: {e} → {delay:.1f}秒後に再試行します ({attempt}/{self.options['max_retries']})")
+                self.sleep(delay)
+
+    def summary(self):
+        with self.lock:
+            counters = dict(self.counters)
+        counters['limiter_wait'] = round(counters['limiter_wait'], 2)
+        counters['backoff_wait'] = round(counters['backoff_wait'], 2)
+        return counters
@@ -0,0 +1,136 @@
+import re
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+# スコア推移 (チーム累計) の系列を作る
+# 試合を日付・回戦の順に並べて、試合ごと・日ごと・週ごとのいずれかの点にまとめる
+# 点が上限を超えたら形を保ったまま間引く (全チームで同じ点を残すので、ラベルは共通の1本で済む)
+
+RESOLUTIONS = ('game', 'day', 'week')
+
+DEFAULT_HISTORY_OPTIONS = {
+    'resolution': 'game',   # 'game' (1試合1点) / 'day' (1日1点) / 'week' (1週1点、月曜始まり)
+    'max_points': 500,      # 点数の上限 (超えたら LTTB で間引く。0 なら間引かない)
+}
+
+DATE_FORMAT = '%Y/%m/%d'
+GAME_NUMBER = re.compile(r'\d+')
+
+
+def get_history_options(config):
+    options = dict(DEFAULT_HISTORY_OPTIONS)
+    options.update(config.get('history', {}))
+    if options['resolution'] not in RESOLUTIONS:
+        raise ValueError(f"history の resolution が不正です: {options['resolution']} ({' / '.join(RESOLUTIONS)})")
+    return options
+
+
+def title_key(title):
+    # "2025/09/03 2回戦" -> ('2025/09/03', 2, '2回戦')。回戦は数値で比べる (10回戦は9回戦の後)
+    date, _, number_text = title.partition(' ')
+    match = GAME_NUMBER.search(number_text)
+    return (date, int(match.group()) if match else 0, number_text)
+
+
+def week_start(date):
+    # その週の月曜日 (日付として読めなければそのまま)
+    try:
+        day = datetime.strptime(date, DATE_FORMAT)
+    except ValueError:
+        return date
+    return (day - timedelta(days=day.weekday())).strftime(DATE_FORMAT)
+
+
+def chronological_titles(stats):
+    # 試合IDを時系列順に並べたリスト
+    return sorted(range(len(stats.titles)), key=lambda title_id: title_key(stats.titles.names[title_id]))
+
+
+def history_points(stats, resolution='game'):
+    # [(ラベル, 最後の試合の日付, [チーム順の累計], 時系列順で何試合目までか)] を時系列順に返す
+    # 日ごと・週ごとはその日・週の最後の試合を終えた時点の累計
+    team_count = len(stats.teams)
+    cumulative = [0.0] * team_count
+    points = []
+    for end, title_id in enumerate(chronological_titles(stats), 1):
+        date = stats.title_dates[title_id]
+        base = title_id * team_count
+        for team_id in range(team_count):
+            cumulative[team_id] += stats.title_team_scores[base + team_id]
+
+        if resolution == 'game':
+            label = stats.titles.names[title_id]
+        elif resolution == 'day':
+            label = date
+        else:
+            label = week_start(date) + '〜'
+        point = (label, date, list(cumulative), end)
+        if points and points[-1][0] == label:
+            points[-1] = point
+        else:
+            points.append(point)
+    return points
+
+
+def downsample(points, max_points):
+    # Largest-Triangle-Three-Buckets を全チームの系列にまとめてかける
+    # 点を max_points - 2 個の区間に分け、区間ごとに「直前に残した点」「次の区間の平均」と作る
+    # 三角形の面積 (全チームの合計) が最大の点を1つ残す。最初と最後の点は必ず残す
+    if not max_points or len(points) <= max_points:
+        return points
+    max_points = max(max_points, 3)
+    team_count = len(points[0][2])
+    bucket_size = (len(points) - 2) / (max_points - 2)
+
+    sampled = [points[0]]
+    selected = 0
+    for bucket in range(max_points - 2):
+        start = int(bucket * bucket_size) + 1
+        end = int((bucket + 1) * bucket_size) + 1
+        next_end = max(min(int((bucket + 2) * bucket_size) + 1, len(points)), end + 1)
+
+        next_x = (end + next_end - 1) / 2
+        next_y = [sum(points[i][2][k] for i in range(end, next_end)) / (next_end - end) for k in range(team_count)]
+        selected_y = points[selected][2]
+
+        best, best_area = start, -1.0
+        for i in range(start, end):
+            values = points[i][2]
+            area = sum(
+                abs((selected - next_x) * (values[k] - selected_y[k]) - (selected - i) * (next_y[k] - selected_y[k]))
+                for k in range(team_count)
+            )
+            if area > best_area:
+                best, best_area = i, area
+        sampled.append(points[best])
+        selected = best
+
+    sampled.append(points[-1])
+    return sampled
+
+
+def player_history(stats, points, player_data=None):
+    # 各点の時点での選手ごとの累計 [選手ID][点の番号] (points は history_points / build_history の結果)
+    # スナップショットから読み込んだ集計なら player_data (集計に使った行) から行ごとの列を作り直す
+    stats.ensure_rows(player_data)
+    title_rows = defaultdict(list)
+    for title_id, player_id, score in zip(stats.row_title, stats.row_player, stats.row_score):
+        title_rows[title_id].append((player_id, score))
+
+    order = chronological_titles(stats)
+    cumulative = [0.0] * len(stats.players)
+    series = [[] for _ in range(len(stats.players))]
+    position = 0
+    for _, _, _, end in points:
+        for title_id in order[position:end]:
+            for player_id, score in title_rows[title_id]:
+                cumulative[player_id] += score
+        position = end
+        for player_id, value in enumerate(cumulative):
+            series[player_id].append(value)
+    return series
+
+
+def build_history(stats, resolution=DEFAULT_HISTORY_OPTIONS['resolution'],
+                  max_points=DEFAULT_HISTORY_OPTIONS['max_points']):
+    return downsample(history_points(stats, resolution), max_points)
@@ -0,0 +1,47 @@
+import os
+
+# 1回の取得・集計を複数のドラフトリーグで共有する
+# config 最上位の draft_teams / team_colors / special_rules / spreadsheet_name が既定のリーグ、
+# leagues に追加のリーグを並べる。リーグごとにスプレッドシートとWebページを1つずつ持つ
+
+DEFAULT_LEAGUE_ID = 'default'
+LEAGUES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'leagues')
+
+
+class League:
+    def __init__(self, league_id, spreadsheet_name, draft_teams, team_colors=None, special_rules=None, output_html=None):
+        self.id = league_id
+        self.spreadsheet_name = spreadsheet_name
+        self.draft_teams = draft_teams
+        self.team_colors = team_colors or {}
+        self.special_rules = special_rules or {}
+        self.output_html = output_html  # None なら mleague_viewer の既定 (index.html)
+        self.stats = None               # 集計 (既定のリーグ以外は共有の集計からの射影)
+
+
+def get_leagues(config):
+    leagues = [League(
+        DEFAULT_LEAGUE_ID,
+        config['spreadsheet_name'],
+        config['draft_teams'],
+        config.get('team_colors', {}),
+        config.get('special_rules', {}),
+    )]
+    for entry in config.get('leagues', []):
+        league_id = entry['id']
+        leagues.append(League(
+            league_id,
+            entry['spreadsheet_name'],
+            entry['draft_teams'],
+            entry.get('team_colors', {}),
+            entry.get('special_rules', {}),
+            entry.get('output_html') or os.path.join(LEAGUES_DIR, league_id, 'index.html'),
+        ))
+
+    # 同じスプレッドシート・同じページに2つのリーグが書き込まないようにする
+    for attr in ('id', 'spreadsheet_name', 'output_html'):
+        values = [getattr(league, attr) for league in leagues if getattr(league, attr) is not None]
+        duplicates = sorted({value for value in values if values.count(value) > 1})
+        if duplicates:
+            raise ValueError(f"leagues の {attr} が重複しています: {', '.join(duplicates)}")
+    return leagues
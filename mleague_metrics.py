@@ -0,0 +1,94 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+# ステージごとの計測値 (処理時間・通信量・件数など)
+# metrics_callback を渡したときだけ MetricsEvent (JSON 1行の文字列) として流し、実行の最後にまとめて JSON ファイルへ書き出す
+# (log_callback は人が読む進捗のメッセージだけにする)
+
+METRICS_VERSION = 1
+EVENT_PREFIX = '[metrics] '
+
+
+class MetricsEvent(str):
+    # print すれば JSON 1行として読め、受け取る側は .name / .data で中身を取り出せる
+    def __new__(cls, name, data):
+        payload = dict({'event': name}, **data)
+        event = super().__new__(cls, EVENT_PREFIX + json.dumps(payload, ensure_ascii=False, sort_keys=True))
+        event.name = name
+        event.data = data
+        return event
+
+
+class RunMetrics:
+    def __init__(self, metrics_callback=None):
+        self.metrics_callback = metrics_callback
+        self.started_at = datetime.now().isoformat(timespec='seconds')
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.lock = threading.Lock()
+
+    def _stage(self, stage):
+        return self.stages.setdefault(stage, {})
+
+    def add(self, stage, **amounts):
+        with self.lock:
+            values = self._stage(stage)
+            for key, amount in amounts.items():
+                values[key] = values.get(key, 0) + amount
+
+    def set(self, stage, **values):
+        with self.lock:
+            self._stage(stage).update(values)
+
+    def get(self, stage, key, default=None):
+        with self.lock:
+            return self.stages.get(stage, {}).get(key, default)
+
+    def emit(self, name, data):
+        if self.metrics_callback:
+            self.metrics_callback(MetricsEvent(name, data))
+
+    def finish_stage(self, stage, wall_time, status, error=None):
+        values = {'wall_time': round(wall_time, 4), 'status': status}
+        if error is not None:
+            values['error'] = str(error)
+        self.set(stage, **values)
+        with self.lock:
+            data = dict(self.stages[stage])
+        self.emit('stage', dict(data, stage=stage))
+
+    def to_dict(self):
+        with self.lock:
+            stages = {name: dict(values) for name, values in self.stages.items()}
+        return {
+            'version': METRICS_VERSION,
+            'started_at': self.started_at,
+            'total_seconds': round(time.perf_counter() - self.started, 4),
+            'stages': stages,
+        }
+
+    def finish(self, path=None):
+        # 全体の集計を1イベント流し、path があれば JSON ファイルに書き出す
+        summary = self.to_dict()
+        self.emit('run', {'total_seconds': summary['total_seconds'], 'stages': len(summary['stages'])})
+        if path:
+            save_json(summary, path)
+        return summary
+
+
+def save_json(data, path):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
@@ -0,0 +1,270 @@
+import re
+from html.parser import HTMLParser
+
+DATE_CLASS = 'p-gamesResult__date'
+COLUMN_CLASS = 'p-gamesResult__column'
+NUMBER_CLASS = 'p-gamesResult__number'
+RANK_LIST_CLASS = 'p-gamesResult__rank-list'
+NAME_CLASS = 'p-gamesResult__name'
+POINT_CLASS = 'p-gamesResult__point'
+
+# 日付・回戦が読めなかった試合の試合名に使う
+UNKNOWN_DATE = "日付不明"
+UNKNOWN_NUMBER = "回戦不明"
+
+# 閉じタグを持たない要素 (スタックに積まない)
+VOID_ELEMENTS = frozenset([
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+    'link', 'meta', 'param', 'source', 'track', 'wbr',
+])
+
+
+# シーズンは秋に始まり、この月までは開幕の翌年として扱う
+SEASON_LAST_MONTH = 5
+
+
+def season_year(month, season_start_year):
+    # 9月 -> 2025, 1月 -> 2026 (season_start_year=2025 のとき)
+    return season_start_year + 1 if month <= SEASON_LAST_MONTH else season_start_year
+
+
+def title_season(game_title):
+    # "2026/01/10 1回戦" -> 2025 (その試合のシーズンの開幕年)。日付が読めなければ None
+    try:
+        year, month, _ = map(int, game_title.split(' ')[0].split('/'))
+    except ValueError:
+        return None
+    return year - 1 if month <= SEASON_LAST_MONTH else year
+
+
+def normalize_date(date_text_raw, season_start_year):
+    # "9/15" -> "2025/09/15" (1〜5月は翌年)
+    try:
+        month, day = map(int, date_text_raw.split('/'))
+        year = season_year(month, season_start_year)
+        return f"{year}/{month:02}/{day:02}"
+    except (ValueError, IndexError):
+        return date_text_raw
+
+
+def parse_point(point_text):
+    # "+55.3pt" -> 55.3, "▲12.0pt" -> -12.0, 数値にならなければ None
+    temp_str = point_text.replace('▲', '-')
+    point_value_str = re.sub(r'[^-0-9.]', '', temp_str)
+    try:
+        if point_value_str and point_value_str != '-':
+            return float(point_value_str)
+    except (ValueError, TypeError):
+        pass
+    return None
+
+
+class ResultsPageParser(HTMLParser):
+    # 試合結果ページを先頭から1回だけ走査し、直前の日付ブロックを状態として持ち回る
+    # feed() は分割して呼んでもよい (ストリーミング解析)
+    def __init__(self, season_start_year):
+        super().__init__(convert_charrefs=True)
+        self.season_start_year = season_start_year
+        self.rows = []
+        self.games = []             # [(試合名, その試合の行)] カラム単位
+
+        self._stack = []            # [(タグ名, この要素で有効になった役割)]
+        self._text_parts = []       # 現在のテキストノード (チャンク境界で分割されうる)
+        self._captures = []         # テキストを集めている最中のバッファ
+
+        self._date_parts = None     # 直近の日付ブロックのテキスト (未出現なら None)
+        self._game = None           # 処理中の試合カラム
+        self._item = None           # 処理中の順位行 (li)
+
+    # --- テキストノードの区切り ---
+    def _flush_text(self):
+        if not self._text_parts:
+            return
+        text = ''.join(self._text_parts).strip()
+        self._text_parts = []
+        if text:
+            for buffer in self._captures:
+                buffer.append(text)
+
+    def _start_capture(self, roles, role):
+        buffer = []
+        self._captures.append(buffer)
+        roles.append((role, buffer))
+        return buffer
+
+    # --- HTMLParser のコールバック ---
+    def handle_data(self, data):
+        self._text_parts.append(data)
+
+    def handle_comment(self, data):
+        self._flush_text()
+
+    def handle_decl(self, decl):
+        self._flush_text()
+
+    def handle_pi(self, data):
+        self._flush_text()
+
+    def handle_startendtag(self, tag, attrs):
+        self._flush_text()
+
+    def handle_starttag(self, tag, attrs):
+        self._flush_text()
+        if tag in VOID_ELEMENTS:
+            return
+
+        classes = ()
+        for key, value in attrs:
+            if key == 'class' and value:
+                classes = value.split()
+                break
+
+        roles = []
+        game = self._game
+        if tag == 'div' and classes:
+            if DATE_CLASS in classes:
+                self._date_parts = self._start_capture(roles, 'date')
+            if COLUMN_CLASS in classes and game is None:
+                game = self._game = {
+                    'date_parts': self._date_parts,
+                    'number': None,
+                    'has_rank_list': False,
+                    'in_rank_list': False,
+                    'items': [],
+                }
+                roles.append(('column', None))
+            if game is not None:
+                if NUMBER_CLASS in classes and game['number'] is None:
+                    game['number'] = self._start_capture(roles, 'number')
+                item = self._item
+                if item is not None:
+                    if NAME_CLASS in classes and item['name'] is None:
+                        item['name'] = self._start_capture(roles, 'name')
+                    if POINT_CLASS in classes and item['point'] is None:
+                        item['point'] = self._start_capture(roles, 'point')
+        elif tag == 'ol' and game is not None and not game['has_rank_list'] and RANK_LIST_CLASS in classes:
+            game['has_rank_list'] = True
+            game['in_rank_list'] = True
+            roles.append(('rank_list', None))
+        elif tag == 'li' and game is not None and game['in_rank_list']:
+            # </li> を省略した順位行は、次の <li> が始まった時点で閉じる (HTMLの暗黙の終了タグ)
+            if self._item is not None:
+                self._close_element('li')
+            self._item = {'name': None, 'point': None}
+            game['items'].append(self._item)
+            roles.append(('item', None))
+
+        self._stack.append((tag, roles))
+
+    def handle_endtag(self, tag):
+        self._flush_text()
+        self._close_element(tag)
+
+    def _close_element(self, tag):
+        # 対応する開始タグまでさかのぼって閉じる (閉じ忘れの要素も一緒に閉じる)
+        for index in range(len(self._stack) - 1, -1, -1):
+            if self._stack[index][0] == tag:
+                break
+        else:
+            return
+        while len(self._stack) > index:
+            _, roles = self._stack.pop()
+            for role, buffer in reversed(roles):
+                self._end_role(role, buffer)
+
+    def close(self):
+        super().close()
+        self._flush_text()
+        while self._stack:
+            _, roles = self._stack.pop()
+            for role, buffer in reversed(roles):
+                self._end_role(role, buffer)
+
+    def _end_role(self, role, buffer):
+        if buffer is not None:
+            self._captures.remove(buffer)
+        if role == 'item':
+            self._item = None
+        elif role == 'rank_list':
+            self._game['in_rank_list'] = False
+        elif role == 'column':
+            self._emit_game(self._game)
+            self._game = None
+
+    def _emit_game(self, game):
+        if not game['has_rank_list']:
+            return
+
+        if game['date_parts'] is None:
+            date_text_raw = UNKNOWN_DATE
+        else:
+            date_text_raw = ''.join(game['date_parts']).split('(')[0]
+        full_date_str = normalize_date(date_text_raw, self.season_start_year)
+
+        number_text = ''.join(game['number']) if game['number'] is not None else UNKNOWN_NUMBER
+        unique_game_title = f"{full_date_str} {number_text}"
+
+        game_rows = []
+        for rank, item in enumerate(game['items'], 1):
+            if item['name'] is None or item['point'] is None:
+                continue
+            point_as_float = parse_point(''.join(item['point']))
+            if point_as_float is not None:
+                game_rows.append([unique_game_title, ''.join(item['name']), point_as_float, rank])
+        self.rows.extend(game_rows)
+        self.games.append((unique_game_title, game_rows))
+
+
+def parse_results_page(content, season_start_year):
+    # 月別ページ1枚を [試合名, 選手名, スコア, 順位] の行リストに変換する
+    if isinstance(content, bytes):
+        content = content.decode('utf-8', errors='replace')
+    parser = ResultsPageParser(season_start_year)
+    parser.feed(content)
+    parser.close()
+    return parser.rows
+
+
+def parse_results_games(content, season_start_year):
+    # 試合カラムごとに (試合名, [行, ...]) のリストで返す (重複排除は試合単位で行う)
+    if isinstance(content, bytes):
+        content = content.decode('utf-8', errors='replace')
+    parser = ResultsPageParser(season_start_year)
+    parser.feed(content)
+    parser.close()
+    return parser.games
+
+
+def parse_results_page_bs4(content, season_start_year):
+    # 従来の BeautifulSoup 版 (比較・ベンチマーク用)
+    from bs4 import BeautifulSoup
+
+    page_data = []
+    soup = BeautifulSoup(content, 'html.parser', from_encoding='utf-8')
+
+    game_columns = soup.find_all('div', class_=COLUMN_CLASS)
+
+    for column in game_columns:
+        date_block = column.find_previous('div', class_=DATE_CLASS)
+        date_text_raw = date_block.get_text(strip=True).split('(')[0] if date_block else UNKNOWN_DATE
+        full_date_str = normalize_date(date_text_raw, season_start_year)
+
+        number_tag = column.find('div', class_=NUMBER_CLASS)
+        number_text = number_tag.get_text(strip=True) if number_tag else UNKNOWN_NUMBER
+        unique_game_title = f"{full_date_str} {number_text}"
+
+        rank_list = column.find('ol', class_=RANK_LIST_CLASS)
+        if not rank_list:
+            continue
+
+        player_list_items = rank_list.find_all('li')
+
+        for rank, item in enumerate(player_list_items, 1):
+            name_tag = item.find('div', class_=NAME_CLASS)
+            point_tag = item.find('div', class_=POINT_CLASS)
+            if name_tag and point_tag:
+                player_name = name_tag.get_text(strip=True)
+                point_as_float = parse_point(point_tag.get_text(strip=True))
+                if point_as_float is not None:
+                    page_data.append([unique_game_title, player_name, point_as_float, rank])
+    return page_data
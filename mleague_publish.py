@@ -0,0 +1,300 @@
+import json
+import os
+import tempfile
+
+from gspread import utils as gspread_utils
+from gspread_formatting import CellFormat, Color, TextFormat
+from gspread_formatting.batch_update_requests import format_cell_ranges as format_requests
+
+import mleague_sheets
+from mleague_google import DEFAULT_SYNC_OPTIONS, GoogleApiClient
+
+# Googleスプレッドシートへの書き込み (STEP 4)
+# シートごとに値・書式の変更を1つのリクエスト列にまとめ、まとめて送る
+
+# 2回送ると結果が変わるリクエスト (通信エラーでは再試行しない)
+NON_IDEMPOTENT_REQUESTS = ('appendDimension', 'insertDimension', 'deleteDimension', 'addSheet', 'duplicateSheet')
+
+DEFAULT_FORMAT = CellFormat(
+    backgroundColor=Color(1, 1, 1),
+    textFormat=TextFormat(bold=False)
+)
+
+def build_team_colors(team_colors_config, draft_teams):
+    team_colors = {}
+    for team_name, color_data in team_colors_config.items():
+        team_colors[team_name] = Color(color_data['red'], color_data['green'], color_data['blue'])
+
+    # 色設定がないチームのためにデフォルト値を設定 (白)
+    for team_name in draft_teams.keys():
+        if team_name not in team_colors:
+            team_colors[team_name] = Color(1, 1, 1)
+    return team_colors
+
+
+def to_color_formats(color_ranges, team_colors):
+    return [(cell_range, CellFormat(backgroundColor=team_colors.get(team_name))) for cell_range, team_name in color_ranges]
+
+
+class SheetsSyncState:
+    # 最後に書き込んだ値をシートごとに保存しておき、次回の差分計算に使う
+    def __init__(self, path):
+        self.path = path
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.data = json.load(f)
+        except (OSError, ValueError):
+            self.data = {}
+
+    def get(self, spreadsheet_id, title, sheet_id):
+        entry = self.data.get(spreadsheet_id, {}).get(title)
+        if not entry or entry.get('sheet_id') != sheet_id:
+            return None
+        return entry['rows']
+
+    def set(self, spreadsheet_id, title, sheet_id, rows):
+        self.data.setdefault(spreadsheet_id, {})[title] = {'sheet_id': sheet_id, 'rows': rows}
+
+    def discard(self, spreadsheet_id, title):
+        self.data.get(spreadsheet_id, {}).pop(title, None)
+
+    def save(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self.data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+def cell_value(value):
+    # USER_ENTERED で書いていた値を updateCells 用の型付きの値にする
+    if value is None or value == '':
+        return {}
+    if isinstance(value, bool):
+        return {'userEnteredValue': {'boolValue': value}}
+    if isinstance(value, (int, float)):
+        return {'userEnteredValue': {'numberValue': value}}
+    value = str(value)
+    if value.startswith('='):
+        return {'userEnteredValue': {'formulaValue': value}}
+    return {'userEnteredValue': {'stringValue': value}}
+
+
+def is_idempotent(requests):
+    return not any(kind in NON_IDEMPOTENT_REQUESTS for request in requests for kind in request)
+
+
+def request_size(request):
+    return len(json.dumps(request, ensure_ascii=False).encode('utf-8'))
+
+
+def split_request(request):
+    # 大きすぎる updateCells は行で半分に分ける (それ以外は分けられない)
+    update = request.get('updateCells')
+    if not update or len(update['rows']) < 2:
+        return [request]
+    middle = len(update['rows']) // 2
+    start = update['start']
+    first = {'updateCells': {'start': start, 'rows': update['rows'][:middle], 'fields': update['fields']}}
+    second_start = dict(start, rowIndex=start['rowIndex'] + middle)
+    second = {'updateCells': {'start': second_start, 'rows': update['rows'][middle:], 'fields': update['fields']}}
+    return [first, second]
+
+
+class SheetsBatch:
+    # spreadsheets.batchUpdate のリクエストを順番どおりに貯めておき、flush で最小回数にまとめて送る
+    # 行の挿入・削除で範囲がずれないよう、シートごとの行数・列数をここで追跡する
+    def __init__(self, spreadsheet, api=None, max_request_bytes=DEFAULT_SYNC_OPTIONS['max_request_bytes']):
+        self.spreadsheet = spreadsheet
+        self.api = api or GoogleApiClient()
+        self.max_request_bytes = max_request_bytes
+        self.requests = []
+        self.pending = []   # 区切り済みで未送信のリクエスト (再試行時は続きから送る)
+        self.grid = {}
+
+    def __len__(self):
+        return len(self.requests) + sum(len(chunk) for chunk in self.pending)
+
+    def track(self, worksheet):
+        self.grid.setdefault(worksheet.id, [worksheet.row_count, worksheet.col_count])
+
+    def ensure_size(self, worksheet, rows, cols):
+        self.track(worksheet)
+        size = self.grid[worksheet.id]
+        if rows > size[0]:
+            self.requests.append({'appendDimension': {'sheetId': worksheet.id, 'dimension': 'ROWS', 'length': rows - size[0]}})
+            size[0] = rows
+        if cols > size[1]:
+            self.requests.append({'appendDimension': {'sheetId': worksheet.id, 'dimension': 'COLUMNS', 'length': cols - size[1]}})
+            size[1] = cols
+
+    def clear_values(self, worksheet, start_row=None, end_row=None):
+        # 行を指定しなければシート全体の値を消す (worksheet.clear 相当)
+        grid_range = {'sheetId': worksheet.id}
+        if start_row is not None:
+            grid_range.update(startRowIndex=start_row - 1, endRowIndex=end_row)
+        self.requests.append({'updateCells': {'range': grid_range, 'fields': 'userEnteredValue'}})
+
+    def delete_rows(self, worksheet, start_row, end_row):
+        self.track(worksheet)
+        self.requests.append({'deleteDimension': {'range': {
+            'sheetId': worksheet.id, 'dimension': 'ROWS', 'startIndex': start_row - 1, 'endIndex': end_row,
+        }}})
+        self.grid[worksheet.id][0] -= end_row - start_row + 1
+
+    def insert_rows(self, worksheet, row, count):
+        self.track(worksheet)
+        self.requests.append({'insertDimension': {'range': {
+            'sheetId': worksheet.id, 'dimension': 'ROWS', 'startIndex': row - 1, 'endIndex': row - 1 + count,
+        }, 'inheritFromBefore': False}})
+        self.grid[worksheet.id][0] += count
+
+    def write_values(self, worksheet, row, col, values):
+        if not values:
+            return
+        width = max(len(r) for r in values)
+        self.ensure_size(worksheet, row + len(values) - 1, col + max(width, 1) - 1)
+        self.requests.append({'updateCells': {
+            'start': {'sheetId': worksheet.id, 'rowIndex': row - 1, 'columnIndex': col - 1},
+            'rows': [{'values': [cell_value(v) for v in r]} for r in values],
+            'fields': 'userEnteredValue',
+        }})
+
+    def format_ranges(self, worksheet, formats):
+        if formats:
+            self.requests.extend(format_requests(worksheet, formats))
+
+    def clamp_range(self, worksheet, start_row, end_row, last_col=26):
+        # シートの大きさを超える範囲は書式設定でエラーになるので切り詰める
+        self.track(worksheet)
+        rows, cols = self.grid[worksheet.id]
+        return f"A{start_row}:{mleague_sheets.rowcol_to_a1(min(end_row, rows), min(last_col, cols))}"
+
+    def auto_resize_columns(self, worksheet, start_index, end_index):
+        self.requests.append({'autoResizeDimensions': {'dimensions': {
+            'sheetId': worksheet.id, 'dimension': 'COLUMNS', 'startIndex': start_index, 'endIndex': end_index,
+        }}})
+
+    def chunks(self):
+        # 順番を保ったまま max_request_bytes に収まるように区切る
+        chunk, size = [], 0
+        pending = list(reversed(self.requests))
+        while pending:
+            request = pending.pop()
+            request_bytes = request_size(request)
+            if request_bytes > self.max_request_bytes:
+                parts = split_request(request)
+                if len(parts) > 1:
+                    pending.extend(reversed(parts))
+                    continue
+            if chunk and size + request_bytes > self.max_request_bytes:
+                yield chunk
+                chunk, size = [], 0
+            chunk.append(request)
+            size += request_bytes
+        if chunk:
+            yield chunk
+
+    def flush(self):
+        # 送った回数を返す。途中で失敗しても送信済みの分は pending から外れているので、もう一度呼べば続きから送る
+        self.pending.extend(self.chunks())
+        self.requests = []
+        calls = 0
+        while self.pending:
+            self.api.call(self.spreadsheet.batch_update, {'requests': self.pending[0]},
+                          idempotent=is_idempotent(self.pending[0]))
+            self.pending.pop(0)
+            calls += 1
+        return calls
+
+
+def open_worksheets(sh, sheet_specs, api=None):
+    # sheet_specs: [(シート名, 新規作成時の行数, 列数)]。既存シートの一覧は1回で取得する
+    api = api or GoogleApiClient()
+    existing = {worksheet.title: worksheet for worksheet in api.call(sh.worksheets)}
+    worksheets = {}
+    for title, rows, cols in sheet_specs:
+        worksheet = existing.get(title)
+        if worksheet is None:
+            worksheet = api.call(sh.add_worksheet, title=title, rows=rows, cols=cols, idempotent=False)
+        worksheets[title] = worksheet
+    return worksheets
+
+
+def stage_full(batch, worksheet, values, color_formats, formatted):
+    batch.clear_values(worksheet)
+    batch.write_values(worksheet, 1, 1, values)
+    if formatted:
+        batch.format_ranges(worksheet, [(batch.clamp_range(worksheet, 1, 1000), DEFAULT_FORMAT)])
+        batch.format_ranges(worksheet, color_formats)
+
+
+def stage_diff(batch, worksheet, diff, color_ranges, team_colors, formatted):
+    # 1. 末尾の不要になった行を空にする (旧レイアウト)
+    for start, end in diff.clear_rows:
+        batch.clear_values(worksheet, start, end)
+    if formatted:
+        batch.format_ranges(worksheet, [(batch.clamp_range(worksheet, start, end), DEFAULT_FORMAT) for start, end in diff.clear_rows])
+
+    # 2. 行の削除・挿入 (下から順に)
+    for op in diff.structural:
+        if op[0] == 'delete':
+            batch.delete_rows(worksheet, op[1], op[2])
+        else:
+            batch.insert_rows(worksheet, op[1], len(op[2]))
+            batch.write_values(worksheet, op[1], 1, op[2])
+
+    # 3. 変わったセルだけを書き込む
+    for cell_range, values in diff.updates:
+        row, col = gspread_utils.a1_to_rowcol(cell_range.split(':')[0])
+        batch.write_values(worksheet, row, col, values)
+
+    # 4. 内容が変わった行だけ書式を設定し直す
+    if formatted and diff.touched_rows:
+        formats = [(batch.clamp_range(worksheet, start, end), DEFAULT_FORMAT) for start, end in mleague_sheets.row_blocks(diff.touched_rows)]
+        for cell_range, team_name in color_ranges:
+            start, end = mleague_sheets.a1_row_span(cell_range)
+            if any(row in diff.touched_rows for row in range(start, end + 1)):
+                formats.append((cell_range, CellFormat(backgroundColor=team_colors.get(team_name))))
+        batch.format_ranges(worksheet, formats)
+
+
+def stage_worksheet(batch, worksheet, values, color_ranges, team_colors,
+                    formatted=True, sync_state=None, log_callback=print):
+    # sync_state があり前回の書き込み内容が分かっていれば差分だけ積む。なければ全件書き込む
+    # 送信が終わったら commit_sync_state で今回の内容を記録する
+    title = worksheet.title
+    previous = sync_state.get(batch.spreadsheet.id, title, worksheet.id) if sync_state else None
+
+    if previous is None:
+        stage_full(batch, worksheet, values, to_color_formats(color_ranges, team_colors), formatted)
+    else:
+        diff = mleague_sheets.diff_rows(previous, values)
+        if diff.is_empty():
+            log_callback(f"    {title}: 変更なし")
+        else:
+            log_callback(f"    {title}: 挿入{diff.inserted_row_count()}行・更新{len(diff.updates)}箇所")
+            stage_diff(batch, worksheet, diff, color_ranges, team_colors, formatted)
+    return [mleague_sheets.normalize_row(row) for row in values]
+
+
+def flush_batch(batch, sync_state, staged, log_callback=print):
+    # staged: {シート名: (worksheet, 正規化した値)}
+    # 途中で失敗したらシートの状態が分からないので、先に記録を消しておき次回は全件書き込みにする
+    if sync_state is not None:
+        for title in staged:
+            sync_state.discard(batch.spreadsheet.id, title)
+    request_count = len(batch)
+    calls = batch.flush()
+    if calls:
+        log_callback(f"    {', '.join(staged)}: {request_count}件の変更を{calls}回のリクエストで送信しました。")
+    if sync_state is not None:
+        for title, (worksheet, rows) in staged.items():
+            sync_state.set(batch.spreadsheet.id, title, worksheet.id, rows)
+    return calls
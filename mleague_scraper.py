@@ -1,493 +1,880 @@
+import argparse
 import os
-import re
-import time
-import csv
-import gspread
-import requests
-from bs4 import BeautifulSoup
-from collections import defaultdict
-from datetime import datetime
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
-# gspread-formattingに必要な部品をすべてインポート
-from gspread_formatting import CellFormat, Color, TextFormat, format_cell_range, format_cell_ranges
-import mleague_viewer
-
-import os
-import re
+import sys
+import threading
 import time
 import csv
 import json
-import gspread
-import requests
-from bs4 import BeautifulSoup
-from collections import defaultdict
 from datetime import datetime
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
-# gspread-formattingに必要な部品をすべてインポート
-from gspread_formatting import CellFormat, Color, TextFormat, format_cell_range, format_cell_ranges
+import mleague_viewer
+import mleague_fetch
+import mleague_cache
+import mleague_parser
+import mleague_store
+import mleague_sheets
+import mleague_stats
+import mleague_dedup
+import mleague_google
+import mleague_tasks
+import mleague_metrics
+import mleague_leagues
+import mleague_history
+import mleague_fingerprint
+
+# gspread・google-auth・gspread-formatting (と mleague_publish) は読み込みに時間がかかるので、
+# STEP 3・4 を実際に実行するときに関数の中で読み込む (取得・集計・HTML生成だけなら読み込まない)
 
 def load_config():
     config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.json')
     with open(config_path, 'r', encoding='utf-8') as f:
         return json.load(f)
 
-def run_scraper(log_callback=print):
+def load_results_csv(filename, limit=None):
+    # STEP 2 で保存したCSVを読み込む (存在しなければ空)
+    # limit を指定すると先頭からその行数だけを読む (今回末尾に追記した行を含めない)
+    if not os.path.exists(filename):
+        return []
+    player_data = []
+    with open(filename, 'r', newline='', encoding='utf-8-sig') as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for row in reader:
+            if limit is not None and len(player_data) >= limit:
+                break
+            if len(row) < 4:
+                continue
+            player_data.append([row[0], row[1], float(row[2]), int(row[3])])
+    return player_data
+
+def load_last_result(filename, block_size=4096):
+    # CSVは試合名順に保存しているので、末尾の1行が最新の試合 (ファイル全体は読まない)
     try:
-        config = load_config()
-        
-        SEASON_START_YEAR = config['season_start_year']
-        urls = config['urls']
-        spreadsheet_name = config['spreadsheet_name']
-        output_filename = config['output_filename']
-        SERVICE_ACCOUNT_FILE = config['service_account_file']
-        DRAFT_TEAMS = config['draft_teams']
-        TEAM_COLORS_CONFIG = config.get('team_colors', {})
-        SPECIAL_RULES = config.get('special_rules', {})
-        M_LEAGUE_PLAYERS = sorted(list(set(config['m_league_players'])))
-        
-        # ▼▼▼▼▼【重要】Google Driveを操作するための権限を再度追加します ▼▼▼▼▼
-        SCOPES = ['https://www.googleapis.com/auth/spreadsheets', 'https://www.googleapis.com/auth/drive']
-        # ▲▲▲▲▲【重要】Google Driveを操作するための権限を再度追加します ▲▲▲▲▲
-
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-
-        # === STEP 1: スクレイピング処理 ===
-        log_callback("STEP 1: スクレイピングを開始します...")
-        raw_player_data = []
+        with open(filename, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - block_size))
+            lines = f.read().decode('utf-8-sig', errors='replace').splitlines()
+    except OSError:
+        return None
+    for line in reversed(lines):
+        row = next(csv.reader([line]), [])
+        if len(row) < 4:
+            continue
         try:
-            for url in urls:
-                log_callback(f"  処理中: {url}")
-                response = requests.get(url, headers=headers)
-                response.raise_for_status()
-                soup = BeautifulSoup(response.content, 'html.parser', from_encoding='utf-8')
-
-                game_columns = soup.find_all('div', class_='p-gamesResult__column')
-
-                for column in game_columns:
-                    date_block = column.find_previous('div', class_='p-gamesResult__date')
-                    date_text_raw = date_block.get_text(strip=True).split('(')[0] if date_block else "日付不明"
-                    
-                    try:
-                        month, day = map(int, date_text_raw.split('/'))
-                        year = SEASON_START_YEAR + 1 if month <= 5 else SEASON_START_YEAR
-                        full_date_str = f"{year}/{month:02}/{day:02}"
-                    except (ValueError, IndexError):
-                        full_date_str = date_text_raw
-
-                    number_tag = column.find('div', class_='p-gamesResult__number')
-                    number_text = number_tag.get_text(strip=True) if number_tag else "回戦不明"
-                    unique_game_title = f"{full_date_str} {number_text}"
-                    
-                    rank_list = column.find('ol', class_='p-gamesResult__rank-list')
-                    if not rank_list:
-                        continue
-
-                    player_list_items = rank_list.find_all('li')
-                    
-                    for rank, item in enumerate(player_list_items, 1):
-                        name_tag = item.find('div', class_='p-gamesResult__name')
-                        point_tag = item.find('div', class_='p-gamesResult__point')
-                        if name_tag and point_tag:
-                            player_name = name_tag.get_text(strip=True)
-                            point_text = point_tag.get_text(strip=True)
-                            
-                            temp_str = point_text.replace('▲', '-')
-                            point_value_str = re.sub(r'[^-0-9.]', '', temp_str)
-                            
-                            try:
-                                if point_value_str and point_value_str != '-':
-                                    point_as_float = float(point_value_str)
-                                    raw_player_data.append([unique_game_title, player_name, point_as_float, rank])
-                            except (ValueError, TypeError):
-                                pass
-
-            log_callback("STEP 1: スクレイピングが完了しました。\n")
-        except Exception as e:
-            log_callback(f"  STEP 1でエラーが発生しました: {e}\n")
-            # スクレイピング失敗時は続行不可とするか、あるいは既存データだけで動くかだが、
-            # 元のロジックでは raw_player_data=[] にして続行しているのでそれに従う
-            raw_player_data = []
-
-
-        # === STEP 1.5: 重複データの削除 ===
-        all_player_data = []
-        if raw_player_data:
-            log_callback("STEP 1.5: 重複データの削除処理を開始します...")
-            
-            games_raw = defaultdict(list)
-            for game_data in raw_player_data:
-                games_raw[game_data[0]].append(game_data)
-                
-            processed_games = set()
-
-            for game_title, all_entries_for_title in games_raw.items():
-                for i in range(0, len(all_entries_for_title), 4):
-                    single_game_data = all_entries_for_title[i:i+4]
-                    
-                    if len(single_game_data) == 4:
-                        player_names_in_game = sorted([p[1] for p in single_game_data])
-                        game_key = (game_title, tuple(player_names_in_game))
-
-                        if game_key not in processed_games:
-                            all_player_data.extend(single_game_data)
-                            processed_games.add(game_key)
-
-            log_callback(f"  重複削除後のデータ件数: {len(all_player_data)}件\n")
-
-
-        # === STEP 2: ローカルにCSVファイルとして保存 ===
-        if all_player_data:
-            log_callback(f"STEP 2: データをローカルファイル '{output_filename}' に保存します...")
-            header = ['試合', '選手名', 'スコア', '順位']
-            sorted_data = sorted(all_player_data, key=lambda x: x[0])
+            return [row[0], row[1], float(row[2]), int(row[3])]
+        except ValueError:
+            continue
+    return None
+
+def season_rows(player_data, season):
+    # 今シーズンの行だけを残す (シーズンが替わった後も前のシーズンのCSVが残っていることがある)
+    # 日付が読めない試合はシーズンを決められないので残す
+    return [row for row in player_data if mleague_parser.title_season(row[0]) in (None, season)]
+
+def select_incremental_urls(urls, existing_player_data):
+    # 保存済みの最新試合の月以降のページだけが新しい試合を含みうる
+    last_month = None
+    for game_title, _, _, _ in existing_player_data:
+        try:
+            year, month, _ = map(int, game_title.split(' ')[0].split('/'))
+        except ValueError:
+            continue
+        if last_month is None or (year, month) > last_month:
+            last_month = (year, month)
+
+    if last_month is None:
+        return list(urls)
+
+    targets = []
+    for url in urls:
+        ym = mleague_cache.page_month(url)
+        if ym is None or ym >= last_month:
+            targets.append(url)
+    return targets
+
+# ▼▼▼▼▼【重要】Google Driveを操作するための権限を再度追加します ▼▼▼▼▼
+SCOPES = ['https://www.googleapis.com/auth/spreadsheets', 'https://www.googleapis.com/auth/drive']
+# ▲▲▲▲▲【重要】Google Driveを操作するための権限を再度追加します ▲▲▲▲▲
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+# 同時に走りうるステージ数 (publish-sheets と render-html など)
+PIPELINE_MAX_WORKERS = 3
+
+
+class ScraperRun:
+    # 1回の実行の設定と、ステージ間で受け渡すデータ
+    def __init__(self, config, log_callback=print, metrics_callback=None):
+        # metrics_callback はステージごとの計測値 (mleague_metrics.MetricsEvent) を受け取る (省略時は流さない)
+        self.log_callback = log_callback
+
+        self.SEASON_START_YEAR = config['season_start_year']
+        self.urls = config['urls']
+        self.spreadsheet_name = config['spreadsheet_name']
+        self.output_filename = config['output_filename']
+        self.SERVICE_ACCOUNT_FILE = config['service_account_file']
+        self.DRAFT_TEAMS = config['draft_teams']
+        self.TEAM_COLORS_CONFIG = config.get('team_colors', {})
+        self.SPECIAL_RULES = config.get('special_rules', {})
+        self.M_LEAGUE_PLAYERS = sorted(list(set(config['m_league_players'])))
+        self.leagues = mleague_leagues.get_leagues(config)
+        self.FETCH_OPTIONS = mleague_fetch.get_fetch_options(config)
+        self.HTTP_CACHE = mleague_cache.create_cache(config)
+        self.INCREMENTAL = config.get('incremental', False)
+        self.DATABASE_FILENAME = config.get('database_filename')
+        self.SNAPSHOT_FILENAME = config.get('stats_snapshot_filename')
+        self.SEEN_IDS_FILENAME = config.get('seen_ids_filename')
+        self.VERIFY_SNAPSHOT = config.get('verify_snapshot', False)
+        self.SHEETS_SYNC = mleague_google.get_sync_options(config)
+        self.GOOGLE_API = mleague_google.get_api_options(config)
+        self.METRICS_FILENAME = config.get('metrics_filename')
+        self.HISTORY = mleague_history.get_history_options(config)
+        # 前回公開したときと内容が同じなら STEP 4・5 を省く (ファイル名を指定したときだけ)
+        self.PUBLISH_STATE_FILENAME = config.get('publish_state_filename')
+        self.publish_state = None
+        self.FORCE_PUBLISH = False      # True なら変更がなくても STEP 4・5 を実行する (--force)
+        self.RESULTS_SOURCE = 'auto'    # sheets / render で読み込む保存済みの結果 ('auto' / 'csv' / 'db')
+        if self.PUBLISH_STATE_FILENAME:
+            self.publish_state = mleague_fingerprint.PublishState(self.PUBLISH_STATE_FILENAME)
+        self.metrics = mleague_metrics.RunMetrics(metrics_callback)
+
+        # ステージの出力
+        # 保存済みの行 (existing_player_data) と重複排除後の全行 (all_player_data) は、差分モードで
+        # 既出の試合IDとCSVの対応が確かめられたときは参照されるまで読み込まない (None が未読み込み)
+        self._existing_player_data = []
+        self._all_player_data = []
+        self._load_lock = threading.Lock()
+        self.existing_rows = 0              # 保存済みの行数 (読み込む前から分かる)
+        self.total_rows = 0                 # 重複排除後の全行数
+        self.last_existing_title = None     # 保存済みの最新の試合名 (読み込みを省いたときだけ)
+        self.pages = []
+        self.raw_games = []
+        self.new_player_data = []
+        self.new_games = []
+        self.seen_games = None
+        self.rewrite_results = False  # 既存の行が変わった (修正・重複の整理) ので CSV を書き直し全件から集計する
+        self.stats = None
+        self.data_fingerprint = None
+        self.stage_results = {}
+        self.stage_errors = {}
+
+    @property
+    def existing_player_data(self):
+        with self._load_lock:
+            if self._existing_player_data is None:
+                # 今回追記した行を含めないよう、保存済みだった行数だけを読む
+                self._existing_player_data = load_results_csv(self.output_filename, limit=self.existing_rows)
+            return self._existing_player_data
+
+    @existing_player_data.setter
+    def existing_player_data(self, player_data):
+        self._existing_player_data = player_data
+        self.existing_rows = len(player_data)
+
+    @property
+    def all_player_data(self):
+        if self._all_player_data is None:
+            existing_player_data = self.existing_player_data
+            with self._load_lock:
+                if self._all_player_data is None:
+                    self._all_player_data = existing_player_data + self.new_player_data
+        return self._all_player_data
+
+    @all_player_data.setter
+    def all_player_data(self, player_data):
+        self._all_player_data = player_data
+        self.total_rows = len(player_data)
+
+    def defer_existing(self, row_count, last_title):
+        # 保存済みの行は件数と最新の試合名だけを持っておき、必要になったときに読み込む
+        self._existing_player_data = None
+        self._all_player_data = None
+        self.existing_rows = row_count
+        self.last_existing_title = last_title
+
+    def existing_deferred(self):
+        return self._existing_player_data is None
+
+
+def select_target_urls(run):
+    # === STEP 0: 差分モードでは保存済みの結果から対象ページを決める ===
+    # 既出の試合IDのファイルが今シーズンの今のCSVに対応していれば (バイト数が一致)、CSVは末尾の1行だけを読む
+    # 前のシーズンの行は読み込まず、CSVは書き直す (すべて前のシーズンなら全ページを取得し直す)
+    target_urls = run.urls
+    if run.INCREMENTAL:
+        seen = None
+        last_row = None
+        if run.SEEN_IDS_FILENAME and os.path.exists(run.output_filename):
+            seen = mleague_dedup.SeenSet.load(run.SEEN_IDS_FILENAME, expected_bytes=os.path.getsize(run.output_filename),
+                                              expected_season=run.SEASON_START_YEAR)
+            if seen is not None and seen.row_count:
+                last_row = load_last_result(run.output_filename)
+        if last_row is not None:
+            run.seen_games = seen
+            run.defer_existing(seen.row_count, last_row[0])
+            target_urls = select_incremental_urls(run.urls, [last_row])
+        else:
+            player_data = load_results_csv(run.output_filename)
+            run.existing_player_data = season_rows(player_data, run.SEASON_START_YEAR)
+            if len(run.existing_player_data) != len(player_data):
+                run.rewrite_results = True
+                run.log_callback(f"  {run.SEASON_START_YEAR}年シーズン以外の保存済みの行{len(player_data) - run.existing_rows}件を除きます。")
+            target_urls = select_incremental_urls(run.urls, run.existing_player_data)
+        run.log_callback(f"STEP 0: 差分モード: 保存済み{run.existing_rows}件、対象ページ{len(target_urls)}/{len(run.urls)}件\n")
+    return target_urls
+
+
+def stage_fetch(run):
+    log_callback = run.log_callback
+    target_urls = select_target_urls(run)
+
+    # === STEP 1: スクレイピング処理 ===
+    log_callback("STEP 1: スクレイピングを開始します...")
+    counters = {}
+    try:
+        # 全ページを1つのセッションで並列取得する
+        run.pages = mleague_fetch.fetch_pages(target_urls, headers=HEADERS, log_callback=log_callback, cache=run.HTTP_CACHE, counters=counters, **run.FETCH_OPTIONS)
+    except Exception as e:
+        log_callback(f"  STEP 1でエラーが発生しました: {e}\n")
+        raise
+    finally:
+        run.metrics.set('fetch', urls=len(target_urls), **counters)
+
+
+def stage_load_cached_pages(run):
+    # === STEP 1 (通信なし): 取得済みのページをHTTPキャッシュから読み込む (parse コマンド) ===
+    log_callback = run.log_callback
+    if run.HTTP_CACHE is None:
+        raise RuntimeError("HTTPキャッシュが無効なため、取得済みのページを読み込めません (http_cache.enabled)。")
+    target_urls = select_target_urls(run)
+
+    log_callback("STEP 1: 取得済みのページをキャッシュから読み込みます...")
+    missing = []
+    for url in target_urls:
+        entry = run.HTTP_CACHE.get(url)
+        if entry is None:
+            missing.append(url)
+        else:
+            run.pages.append((url, entry['body']))
+    run.metrics.set('fetch', urls=len(target_urls), pages=len(run.pages), cache_hits=len(run.pages), requests=0)
+    if missing:
+        raise FileNotFoundError(f"キャッシュにないページが{len(missing)}件あります。先に fetch を実行してください: {', '.join(missing)}")
+
+
+def stage_load_results(run):
+    # === STEP 0 (通信なし): 保存済みの結果を読み込む (sheets / render コマンド) ===
+    # 'auto' はCSV (STEP 2) を優先し、なければデータベース (STEP 2.5) の今シーズン分を使う
+    log_callback = run.log_callback
+    source = run.RESULTS_SOURCE
+    player_data = []
+    if source in ('auto', 'csv'):
+        player_data = season_rows(load_results_csv(run.output_filename), run.SEASON_START_YEAR)
+        if player_data:
+            source = 'csv'
+    if not player_data and source in ('auto', 'db') and run.DATABASE_FILENAME and os.path.exists(run.DATABASE_FILENAME):
+        with mleague_store.ResultsStore(run.DATABASE_FILENAME, run.SEASON_START_YEAR) as store:
+            player_data = store.all_player_data(run.SEASON_START_YEAR)
+        source = 'db'
+    if not player_data:
+        raise FileNotFoundError("保存済みの結果がありません。先に all または fetch・parse を実行してください。")
+
+    # 保存済みのデータは重複排除済みなので、そのまま既存データ・全データとして扱う
+    run.existing_player_data = player_data
+    run.all_player_data = player_data
+    run.metrics.set('load', source=source, rows=len(player_data))
+    log_callback(f"STEP 0: 保存済みの結果 ({source}) を{len(player_data)}件読み込みました。\n")
+
+
+def stage_parse(run):
+    log_callback = run.log_callback
+    # 解析はURL順に行う
+    try:
+        for url, content in run.pages:
+            log_callback(f"  処理中: {url}")
+            run.raw_games.extend(mleague_parser.parse_results_games(content, run.SEASON_START_YEAR))
+    except Exception as e:
+        log_callback(f"  STEP 1でエラーが発生しました: {e}\n")
+        run.raw_games = []
+        raise
+    run.metrics.set('parse', pages=len(run.pages), games=len(run.raw_games),
+                    rows=sum(len(rows) for _, rows in run.raw_games))
+    log_callback("STEP 1: スクレイピングが完了しました。\n")
+
+
+def stage_dedup(run):
+    # === STEP 1.5: 重複データの削除 ===
+    # 試合ごとに枠 (日付, 回戦) の試合IDを付け、既出で内容も同じ試合を1件ずつ除外する
+    # 既出で内容が変わった試合 (スコアの修正) は保存済みの行を置き換える
+    # 取得・解析に失敗しても、元のロジックどおり保存済みのデータだけで続行する
+    # 保存済みの行を読み込まずに済んでいる (STEP 0) ときは、修正も順序の入れ替わりもなければ読み込まない
+    log_callback = run.log_callback
+    if not (run.raw_games or run.existing_rows):
+        return
+    log_callback("STEP 1.5: 重複データの削除処理を開始します...")
+
+    all_player_data = None
+    if run.seen_games is None and run.SEEN_IDS_FILENAME and run.existing_rows:
+        run.seen_games = mleague_dedup.SeenSet.load(run.SEEN_IDS_FILENAME, expected_rows=run.existing_rows,
+                                                    expected_season=run.SEASON_START_YEAR)
+    if run.seen_games is None:
+        # 作り直すときは、同じ枠の試合が複数あれば (以前の修正前後の行が両方残っている) 後のものを使う
+        existing_player_data = run.existing_player_data
+        run.seen_games = mleague_dedup.SeenSet()
+        existing_games = mleague_dedup.group_games(existing_player_data)
+        all_player_data = [
+            row for _, _, rows in mleague_dedup.latest_games(mleague_dedup.dedupe_games(existing_games, run.seen_games))
+            for row in rows
+        ]
+        if len(all_player_data) != len(existing_player_data):
+            run.rewrite_results = True
+
+    corrected = []
+    run.new_games = mleague_dedup.latest_games(mleague_dedup.dedupe_games(run.raw_games, run.seen_games, corrected))
+    for _, _, rows in run.new_games:
+        run.new_player_data.extend(rows)
+
+    if run.existing_deferred() and not corrected and all(row[0] >= run.last_existing_title for row in run.new_player_data):
+        # 新しい試合はCSVの末尾に足すだけなので、保存済みの行は読み込まずに件数だけを数える
+        run.total_rows = run.existing_rows + len(run.new_player_data)
+    else:
+        if all_player_data is None:
+            all_player_data = list(run.existing_player_data)
+        if corrected:
+            # 修正された試合の古い行を除いてから新しい行を足す (CSVは書き直し、集計は全件から)
+            corrected_titles = {game_title for _, game_title in corrected}
+            all_player_data = [row for row in all_player_data if row[0] not in corrected_titles]
+            run.rewrite_results = True
+        all_player_data.extend(run.new_player_data)
+        run.all_player_data = all_player_data
+    incomplete = sum(1 for _, rows in run.raw_games if len(rows) != mleague_dedup.PLAYERS_PER_GAME)
+    run.metrics.set('dedup', games_in=len(run.raw_games), new_games=len(run.new_games), new_rows=len(run.new_player_data),
+                    corrected_games=len(corrected), existing_loaded=not run.existing_deferred(),
+                    duplicates_dropped=len(run.raw_games) - incomplete - len(run.new_games),
+                    incomplete_dropped=incomplete, total_rows=run.total_rows)
+
+    if run.INCREMENTAL:
+        log_callback(f"  新規データ件数: {len(run.new_player_data)}件")
+    if corrected:
+        log_callback(f"  内容が修正された試合: {len(corrected)}件 (保存済みの行を置き換えます)")
+    log_callback(f"  重複削除後のデータ件数: {run.total_rows}件\n")
+
+
+def stage_persist(run):
+    log_callback = run.log_callback
+    new_player_data = run.new_player_data
+    output_filename = run.output_filename
+
+    # === STEP 2: ローカルにCSVファイルとして保存 ===
+    if run.total_rows and run.existing_rows and not new_player_data and not run.rewrite_results:
+        log_callback("STEP 2: 新しい試合がないため保存をスキップします。\n")
+    elif run.total_rows:
+        log_callback(f"STEP 2: データをローカルファイル '{output_filename}' に保存します...")
+        header = ['試合', '選手名', 'スコア', '順位']
+        last_title = run.last_existing_title
+        if last_title is None and run.existing_rows:
+            last_title = max(x[0] for x in run.existing_player_data)
+        if run.existing_rows and not run.rewrite_results and min(x[0] for x in new_player_data) >= last_title:
+            # 新しい試合がすべて既存より後ならCSVの末尾に追記するだけでソート順は保たれる
+            with open(output_filename, 'a', newline='', encoding='utf-8-sig') as f:
+                writer = csv.writer(f)
+                writer.writerows(sorted(new_player_data, key=lambda x: x[0]))
+            run.metrics.set('persist', csv_mode='append', csv_rows_written=len(new_player_data))
+        else:
+            sorted_data = sorted(run.all_player_data, key=lambda x: x[0])
             with open(output_filename, 'w', newline='', encoding='utf-8-sig') as f:
                 writer = csv.writer(f)
                 writer.writerow(header)
                 writer.writerows(sorted_data)
-            log_callback("STEP 2: ローカルへの保存が完了しました。\n")
+            run.metrics.set('persist', csv_mode='rewrite', csv_rows_written=len(sorted_data))
+        log_callback("STEP 2: ローカルへの保存が完了しました。\n")
+    else:
+        log_callback("STEP 2: 有効なデータが取得できませんでした。\n")
+
+    # 既出の試合IDはCSVの保存後に書き出す (CSVと件数・バイト数がずれたら次回は作り直す)
+    # 試合が増えず、ファイルの記録も今のCSVと一致していれば書き直さない
+    seen_games = run.seen_games
+    if run.total_rows and run.SEEN_IDS_FILENAME and seen_games is not None:
+        try:
+            results_bytes = os.path.getsize(output_filename)
+            if (run.new_games or run.rewrite_results
+                    or (seen_games.row_count, seen_games.results_bytes, seen_games.season)
+                    != (run.total_rows, results_bytes, run.SEASON_START_YEAR)):
+                seen_games.save(run.SEEN_IDS_FILENAME, run.total_rows, results_bytes, run.SEASON_START_YEAR)
+        except Exception as e:
+            log_callback(f"  試合IDの保存に失敗しました: {e}")
+
+    # === STEP 2.5: SQLiteデータベースへの保存 ===
+    if run.total_rows and run.DATABASE_FILENAME:
+        try:
+            with mleague_store.ResultsStore(run.DATABASE_FILENAME, run.SEASON_START_YEAR) as store:
+                # 既にデータがあれば今回の新規・修正分だけを書き込む (書き込みは冪等で、修正された試合は行を入れ替える)
+                if store.count_games(run.SEASON_START_YEAR):
+                    stored = store.upsert_games(run.new_games, run.SEASON_START_YEAR)
+                else:
+                    stored = store.upsert_player_data(run.all_player_data, run.SEASON_START_YEAR)
+            run.metrics.set('persist', db_games_written=stored)
+            log_callback(f"STEP 2.5: データベース '{run.DATABASE_FILENAME}' に{stored}試合を保存しました。\n")
+        except Exception as e:
+            log_callback(f"  STEP 2.5でエラーが発生しました: {e}\n")
+            raise
+
+
+def stage_aggregate(run):
+    # === STEP 2.6: 集計 (STEP 4・5 で共有) ===
+    # 保存済みの行は、全件から集計するとき・検証するとき・射影するときだけ読み込む
+    log_callback = run.log_callback
+    new_player_data = run.new_player_data
+    DRAFT_TEAMS = run.DRAFT_TEAMS
+    if not run.total_rows:
+        return
+
+    log_callback("STEP 2.6: 集計処理を開始します...")
+    stats = None
+    # 前回のスナップショットが今回の既存データと一致していれば新しい試合だけを適用する
+    # 試合が修正された (既存の行が変わった) ときは全件から集計し直す
+    base_rows = run.total_rows - len(new_player_data)
+    if run.SNAPSHOT_FILENAME and base_rows > 0 and not run.rewrite_results:
+        stats = mleague_stats.load_snapshot(run.SNAPSHOT_FILENAME, DRAFT_TEAMS, expected_rows=base_rows,
+                                            season=run.SEASON_START_YEAR)
+    if stats:
+        stats.apply(new_player_data)
+        run.metrics.set('aggregate', source='snapshot', rows_applied=len(new_player_data))
+        log_callback(f"  スナップショットに新規{len(new_player_data)}件を適用しました。")
+    else:
+        all_player_data = run.all_player_data
+        stats = mleague_stats.compute_stats(all_player_data, DRAFT_TEAMS)
+        run.metrics.set('aggregate', source='full', rows_applied=len(all_player_data))
+        log_callback(f"  全{len(all_player_data)}件から集計しました。")
+
+    if run.VERIFY_SNAPSHOT:
+        all_player_data = run.all_player_data
+        mismatches = mleague_stats.verify_stats(stats, all_player_data, DRAFT_TEAMS)
+        if mismatches:
+            log_callback(f"  検証: 全件集計との不一致が{len(mismatches)}件あります。全件集計の結果を使用します。")
+            for mismatch in mismatches[:10]:
+                log_callback(f"    {mismatch}")
+            stats = mleague_stats.compute_stats(all_player_data, DRAFT_TEAMS)
         else:
-            log_callback("STEP 2: 有効なデータが取得できませんでした。\n")
+            log_callback("  検証: 全件集計と一致しました。")
 
+    if run.SNAPSHOT_FILENAME:
+        try:
+            mleague_stats.save_snapshot(stats, run.SNAPSHOT_FILENAME, run.SEASON_START_YEAR)
+        except Exception as e:
+            log_callback(f"  スナップショットの保存に失敗しました: {e}")
+    run.stats = stats
 
-        # === STEP 3: Googleへの認証 ===
-        creds = None
-        if all_player_data:
-            log_callback("STEP 3: Googleへの認証情報を読み込みます...")
-            try:
-                # 1. まずローカルファイルを確認
-                if os.path.exists(SERVICE_ACCOUNT_FILE):
-                    creds = Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=SCOPES)
-                    log_callback(f"STEP 3: ローカルファイル({SERVICE_ACCOUNT_FILE})での認証が成功しました。\n")
-                
-                # 2. ファイルがない場合、環境波数を確認 (クラウド用)
-                elif 'GOOGLE_CREDENTIALS_JSON' in os.environ:
-                    log_callback("  ローカルファイルが見つかりません。環境変数から認証情報を読み込みます...")
-                    service_account_info = json.loads(os.environ['GOOGLE_CREDENTIALS_JSON'])
-                    creds = Credentials.from_service_account_info(service_account_info, scopes=SCOPES)
-                    log_callback("STEP 3: 環境変数での認証が成功しました。\n")
-                
-                else:
-                    raise FileNotFoundError(f"認証ファイル({SERVICE_ACCOUNT_FILE})も環境変数(GOOGLE_CREDENTIALS_JSON)も見つかりません。")
+    if run.publish_state is not None:
+        if run.seen_games is not None:
+            # 既出の試合IDが持つ全試合の指紋は data_fingerprint と同じ値 (保存済みの行を読まずに済む)
+            run.data_fingerprint = run.seen_games.fingerprint_hex()
+        else:
+            run.data_fingerprint = mleague_fingerprint.data_fingerprint(run.all_player_data)
+
+    # 追加のリーグは共有の集計から射影する (取得・解析・全件集計はやり直さない)
+    # スナップショットから読み込んだ集計は、射影のときだけ行ごとの列を試合データから作り直す
+    # STEP 4・5 のどちらでも前回の公開から変わっていないリーグは使われないので射影しない
+    run.leagues[0].stats = stats
+    if len(run.leagues) > 1:
+        started = time.perf_counter()
+        projected = [league for league in run.leagues[1:] if not league_unchanged(run, league)]
+        for league in projected:
+            league.stats = stats.project(league.draft_teams, run.all_player_data)
+        run.metrics.set('aggregate', leagues=len(run.leagues), projected_leagues=len(projected),
+                        projection_seconds=round(time.perf_counter() - started, 4))
+        log_callback(f"  追加の{len(projected)}/{len(run.leagues) - 1}リーグの集計を射影しました。")
+    log_callback("STEP 2.6: 集計が完了しました。\n")
+
+
+def league_fingerprint(run, league, target):
+    # 公開先ごとに、出力に影響する設定と出力を作るコードを試合データの指紋と合わせる
+    if target == 'html':
+        settings = [league.draft_teams, league.team_colors, league.output_html, run.HISTORY]
+        source = mleague_fingerprint.source_fingerprint('mleague_viewer', 'mleague_history')
+    else:
+        settings = [league.draft_teams, league.team_colors, league.special_rules, league.spreadsheet_name, run.M_LEAGUE_PLAYERS]
+        source = mleague_fingerprint.source_fingerprint('mleague_sheets', 'mleague_publish')
+    return mleague_fingerprint.combine(run.data_fingerprint, settings, source)
+
+
+def changed_leagues(run, target):
+    # 前回の公開から内容が変わったリーグと、その指紋 [(リーグ, 指紋)] を返す
+    if run.publish_state is None or run.data_fingerprint is None:
+        return [(league, None) for league in run.leagues]
+    changed = []
+    for league in run.leagues:
+        fingerprint = league_fingerprint(run, league, target)
+        if not run.FORCE_PUBLISH and run.publish_state.unchanged(f"{target}:{league.id}", fingerprint):
+            run.log_callback(f"  [{league.id}] 前回の公開から変更がないためスキップします。")
+        else:
+            changed.append((league, fingerprint))
+    return changed
 
-            except Exception as e:
-                log_callback(f"  認証情報の読み込みに失敗しました: {e}")
-                log_callback("  設定を確認してください。")
 
+def league_unchanged(run, league):
+    # Webページ・スプレッドシートの両方が前回の公開から変わっていなければ True
+    if run.publish_state is None or run.data_fingerprint is None or run.FORCE_PUBLISH:
+        return False
+    return all(
+        run.publish_state.unchanged(f"{target}:{league.id}", league_fingerprint(run, league, target))
+        for target in ('html', 'sheets')
+    )
 
-        # === STEP 4: スプレッドシートへの書き込み処理 ===
-        if creds:
-            try:
-                log_callback("STEP 4: スプレッドシートへの書き込み処理を開始します...")
-                gc = gspread.authorize(creds)
-                sh = gc.open(spreadsheet_name)
 
-                default_format = CellFormat(
-                    backgroundColor=Color(1, 1, 1),
-                    textFormat=TextFormat(bold=False)
-                )
+def record_published(run, target, league, fingerprint):
+    if run.publish_state is not None and fingerprint is not None:
+        run.publish_state.record(f"{target}:{league.id}", fingerprint)
 
-                # --- 4-1: 「試合結果」シートの更新 ---
-                log_callback("  4-1: 「試合結果」シートを更新中...")
-                player_to_team = {player: team for team, players in DRAFT_TEAMS.items() for player in players}
-                
-                team_colors = {}
-                for team_name, color_data in TEAM_COLORS_CONFIG.items():
-                    team_colors[team_name] = Color(color_data['red'], color_data['green'], color_data['blue'])
-                
-                # 色設定がないチームのためにデフォルト値を設定 (白)
-                for team_name in DRAFT_TEAMS.keys():
-                    if team_name not in team_colors:
-                        team_colors[team_name] = Color(1, 1, 1)
-
-                games = defaultdict(list)
-                for game_title, player_name, score, rank in all_player_data:
-                    games[game_title].append({'name': player_name, 'score': score, 'rank': rank})
-
-                unique_games = []
-                for game_title, players_data in games.items():
-                    for i in range(0, len(players_data), 4):
-                        game_chunk = players_data[i:i+4]
-                        if len(game_chunk) == 4:
-                            unique_games.append((game_title, game_chunk))
-
-                legend_row = ['凡例:'] + list(DRAFT_TEAMS.keys())
-                header_games = ['試合', '1位', '2位', '3位', '4位']
-                data_games = [legend_row, header_games]
-                color_formats = []
-
-                sorted_unique_games = sorted(unique_games, key=lambda x: x[0], reverse=True)
-                for row_idx, (game_title, players_in_game) in enumerate(sorted_unique_games, 3):
-                    sorted_players = sorted(players_in_game, key=lambda p: p['rank'])
-                    row_to_write = [game_title]
-                    
-                    for player_info in sorted_players:
-                        player_name = player_info['name']
-                        score = player_info['score']
-                        score_str = f"({'+' if score >= 0 else ''}{round(score, 1)})"
-                        display_text = f"{player_name} {score_str}"
-                        row_to_write.append(display_text)
-                    
-                    row_to_write.extend([''] * (5 - len(row_to_write)))
-                    data_games.append(row_to_write[:5])
-
-                try:
-                    worksheet_games = sh.worksheet("試合結果")
-                except gspread.WorksheetNotFound:
-                    worksheet_games = sh.add_worksheet(title="試合結果", rows=len(data_games)+10, cols=5)
-
-                worksheet_games.clear()
-                worksheet_games.update(data_games, value_input_option='USER_ENTERED')
-                
-                format_cell_range(worksheet_games, 'A1:Z1000', default_format)
-                
-                for i, team_name in enumerate(DRAFT_TEAMS.keys(), 2):
-                    color_formats.append((gspread.utils.rowcol_to_a1(1, i), CellFormat(backgroundColor=team_colors.get(team_name))))
-
-                for row_idx, (game_title, players_in_game) in enumerate(sorted_unique_games, 3):
-                    sorted_players = sorted(players_in_game, key=lambda p: p['rank'])
-                    for player_info in sorted_players:
-                        rank = player_info['rank']
-                        player_name = player_info['name']
-                        col_idx = rank + 1
-                        cell_label = gspread.utils.rowcol_to_a1(row_idx, col_idx)
-                        if player_name in player_to_team:
-                            team_name = player_to_team[player_name]
-                            color_formats.append((cell_label, CellFormat(backgroundColor=team_colors.get(team_name))))
-                
-                if color_formats:
-                    format_cell_ranges(worksheet_games, color_formats)
-                
-                # --- 4-2: 「チーム別スコア内訳」シートの作成・更新 ---
-                log_callback("  4-2: 「チーム別スコア内訳」シートを更新中...")
-                
-                player_stats = defaultdict(lambda: {'total_score': 0.0, 'game_count': 0, 'rank_sum': 0})
-                
-                for _, player_name, score, rank in all_player_data:
-                    player_stats[player_name]['total_score'] += score
-                    player_stats[player_name]['game_count'] += 1
-                    player_stats[player_name]['rank_sum'] += rank
-
-                team_totals = defaultdict(float)
-                for team, members in DRAFT_TEAMS.items():
-                    for member in members:
-                        team_totals[team] += player_stats[member]['total_score']
-
-                # 特別ルール: チームボーナス
-                team_bonus = SPECIAL_RULES.get('team_bonus', {})
-                for team, bonus in team_bonus.items():
-                    if team in team_totals:
-                        team_totals[team] += bonus
-                
-                now = datetime.now().strftime('%Y/%m/%d %H:%M:%S')
-                data_details = [[f"最終更新日時: {now}"], []]
-                
-                data_details.append(["チーム総合ランキング"])
-                data_details.append(["順位", "チーム名", "合計スコア"])
-                sorted_teams = sorted(team_totals.items(), key=lambda item: item[1], reverse=True)
-                
-                for i, (team_name, total_score) in enumerate(sorted_teams, 1):
-                    data_details.append([f"{i}位", team_name, round(total_score, 1)])
-                data_details.append([])
-                
-                data_details.append(["選手別 詳細成績"])
-                header_players = ["所属チーム", "選手名", "個人合計スコア", "平均順位", "出場回数"]
-                data_details.append(header_players)
-                
-                color_formats_list_details = []
-                
-                player_bonus = SPECIAL_RULES.get('player_bonus', {})
-
-                for team_name, players in DRAFT_TEAMS.items():
-                    for player in players:
-                        stats = player_stats[player]
-                        player_display_score = stats['total_score']
-                        
-                        # 特別ルール: 個人ボーナス
-                        if player in player_bonus:
-                            player_display_score += player_bonus[player]
-                        
-                        avg_rank = round(stats['rank_sum'] / stats['game_count'], 2) if stats['game_count'] > 0 else 0
-                        data_details.append([team_name, player, round(player_display_score, 1), avg_rank, stats['game_count']])
-                    
-                    data_details.append([f"{team_name} 合計", "", round(team_totals[team_name], 1), "", ""])
-                    
-                    total_row_num = len(data_details)
-                    total_row_color_format = CellFormat(backgroundColor=team_colors.get(team_name))
-                    color_formats_list_details.append((f'A{total_row_num}:E{total_row_num}', total_row_color_format))
-                    
-                    data_details.append([])
-
-                try:
-                    worksheet_details = sh.worksheet("チーム別スコア内訳")
-                except gspread.WorksheetNotFound:
-                    worksheet_details = sh.add_worksheet(title="チーム別スコア内訳", rows=1, cols=1)
-                
-                worksheet_details.clear()
-                worksheet_details.update(data_details, value_input_option='USER_ENTERED')
-                
-                # --- 4-3: 書式設定 ---
-                log_callback("  4-3: 書式を設定中...")
-                
-                format_cell_range(worksheet_details, 'A1:Z1000', default_format)
-                
-                team_to_rank_row = {team_name: i + 5 for i, (team_name, _) in enumerate(sorted_teams)}
-                for team_name, row_num in team_to_rank_row.items():
-                    color_formats_list_details.append((f'B{row_num}', CellFormat(backgroundColor=team_colors.get(team_name))))
-
-                if color_formats_list_details:
-                    format_cell_ranges(worksheet_details, color_formats_list_details)
-                
-                # --- 4-4: 「スコア推移グラフ用データ」シートの更新 ---
-                log_callback("  4-4: 「スコア推移グラフ用データ」シートを更新中...")
-                
-                games_team_scores = defaultdict(lambda: defaultdict(float))
-                for game_title, player_name, score, _ in all_player_data:
-                    for team, members in DRAFT_TEAMS.items():
-                        if player_name in members:
-                            games_team_scores[game_title][team] += score
-
-                chart_data = []
-                team_order = list(DRAFT_TEAMS.keys())
-                header_chart = ['試合'] + team_order
-                chart_data.append(header_chart)
-
-                cumulative_scores = {team: 0.0 for team in team_order}
-                
-                # 特別ルール: 開幕前スコア (チームボーナス)
-                team_bonus = SPECIAL_RULES.get('team_bonus', {})
-                for team, bonus in team_bonus.items():
-                    if team in cumulative_scores:
-                        cumulative_scores[team] = bonus
-
-                chart_data.append(['開幕前'] + [round(s, 1) for s in cumulative_scores.values()])
-                
-                for game_title in sorted(games_team_scores.keys()):
-                    for team_name in team_order:
-                        cumulative_scores[team_name] += games_team_scores[game_title].get(team_name, 0.0)
-                    
-                    row = [game_title] + [round(cumulative_scores[team], 1) for team in team_order]
-                    chart_data.append(row)
-
-                try:
-                    worksheet_chart = sh.worksheet("スコア推移グラフ用データ")
-                except gspread.WorksheetNotFound:
-                    worksheet_chart = sh.add_worksheet(title="スコア推移グラフ用データ", rows=1, cols=1)
-                    
-                worksheet_chart.clear()
-                worksheet_chart.update(chart_data, value_input_option='USER_ENTERED')
-                
-                # --- 4-5: 「個人ランキング」シートの作成・更新 ---
-                log_callback("  4-5: 「個人ランキング」シートを更新中...")
-
-                all_player_stats_for_ranking = defaultdict(lambda: {
-                    'total_score': 0.0,
-                    'ranks': {1: 0, 2: 0, 3: 0, 4: 0}
-                })
-                
-                for _, player_name, score, rank in all_player_data:
-                    if player_name in M_LEAGUE_PLAYERS:
-                        all_player_stats_for_ranking[player_name]['total_score'] += score
-                        if rank in [1, 2, 3, 4]:
-                            all_player_stats_for_ranking[player_name]['ranks'][rank] += 1
-                
-                ranking_data = []
-                for player_name in M_LEAGUE_PLAYERS:
-                    stats = all_player_stats_for_ranking[player_name]
-                    ranking_data.append([
-                        player_name, 
-                        stats['total_score'], 
-                        stats['ranks'][1], 
-                        stats['ranks'][2], 
-                        stats['ranks'][3], 
-                        stats['ranks'][4]
-                    ])
-                    
-                sorted_ranking = sorted(ranking_data, key=lambda x: x[1], reverse=True)
-
-                data_for_ranking_sheet = [["順位", "選手名", "合計スコア", "1位", "2位", "3位", "4位"]]
-                ranking_color_formats = []
-
-                for i, (player_name, total_score, r1, r2, r3, r4) in enumerate(sorted_ranking, 1):
-                    data_for_ranking_sheet.append([f"{i}位", player_name, round(total_score, 1), r1, r2, r3, r4])
-                    
-                    if player_name in player_to_team:
-                        team_name = player_to_team[player_name]
-                        cell_format = CellFormat(backgroundColor=team_colors.get(team_name))
-                        ranking_color_formats.append((f'A{i+1}:G{i+1}', cell_format))
-
-                try:
-                    worksheet_ranking = sh.worksheet("個人ランキング")
-                except gspread.WorksheetNotFound:
-                    worksheet_ranking = sh.add_worksheet(title="個人ランキング", rows=len(M_LEAGUE_PLAYERS) + 5, cols=7)
-                
-                worksheet_ranking.clear()
-                worksheet_ranking.update(data_for_ranking_sheet, value_input_option='USER_ENTERED')
-                
-                format_cell_range(worksheet_ranking, 'A1:Z1000', default_format)
-                if ranking_color_formats:
-                    format_cell_ranges(worksheet_ranking, ranking_color_formats)
-
-                # --- 4-6: 全シートの列幅を自動調整 ---
-                log_callback("  4-6: 全シートの列幅を自動調整中...")
-                requests_body = {
-                    'requests': [
-                        {'autoResizeDimensions': {'dimensions': { 'sheetId': worksheet_games.id, 'dimension': 'COLUMNS', 'startIndex': 0, 'endIndex': 5 }}},
-                        {'autoResizeDimensions': {'dimensions': { 'sheetId': worksheet_details.id, 'dimension': 'COLUMNS', 'startIndex': 0, 'endIndex': 5 }}},
-                        {'autoResizeDimensions': {'dimensions': { 'sheetId': worksheet_chart.id, 'dimension': 'COLUMNS', 'startIndex': 0, 'endIndex': len(DRAFT_TEAMS) + 1 }}},
-                        {'autoResizeDimensions': {'dimensions': { 'sheetId': worksheet_ranking.id, 'dimension': 'COLUMNS', 'startIndex': 0, 'endIndex': 7 }}}
-                    ]
-                }
-                
-                # --- Retry Logic for API Calls ---
-                max_retries = 3
-                for attempt in range(max_retries):
-                    try:
-                        sh.batch_update(requests_body)
-                        break
-                    except Exception as e:
-                        if "503" in str(e) or "500" in str(e) or "quota" in str(e).lower():
-                            if attempt < max_retries - 1:
-                                sleep_time = (attempt + 1) * 5
-                                log_callback(f"  API Error ({e}). Retrying in {sleep_time} seconds...")
-                                time.sleep(sleep_time)
-                            else:
-                                log_callback(f"  Failed to resize columns after {max_retries} attempts. Continuing without resize.")
-                        else:
-                            log_callback(f"  Non-retriable error in resize: {e}")
-                            break
-                    
-                log_callback("STEP 4: すべてのスプレッドシートの更新が完了しました。\n")
-
-            except Exception as e:
-                log_callback(f"  STEP 4でエラーが発生しました: {e}\n")
-
-        # === STEP 5: Webページ生成 ===
-        if all_player_data:
-            try:
-                log_callback("STEP 5: Webページ(index.html)を生成します...")
-                
+
+def save_publish_state(run):
+    if run.publish_state is None:
+        return
+    try:
+        run.publish_state.save()
+    except Exception as e:
+        run.log_callback(f"  公開状態の保存に失敗しました: {e}")
+
+
+def load_credentials(run):
+    # === STEP 3: Googleへの認証 ===
+    from google.oauth2.service_account import Credentials
+
+    log_callback = run.log_callback
+    SERVICE_ACCOUNT_FILE = run.SERVICE_ACCOUNT_FILE
+    log_callback("STEP 3: Googleへの認証情報を読み込みます...")
+    try:
+        # 1. まずローカルファイルを確認
+        if os.path.exists(SERVICE_ACCOUNT_FILE):
+            creds = Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=SCOPES)
+            log_callback(f"STEP 3: ローカルファイル({SERVICE_ACCOUNT_FILE})での認証が成功しました。\n")
+
+        # 2. ファイルがない場合、環境波数を確認 (クラウド用)
+        elif 'GOOGLE_CREDENTIALS_JSON' in os.environ:
+            log_callback("  ローカルファイルが見つかりません。環境変数から認証情報を読み込みます...")
+            service_account_info = json.loads(os.environ['GOOGLE_CREDENTIALS_JSON'])
+            creds = Credentials.from_service_account_info(service_account_info, scopes=SCOPES)
+            log_callback("STEP 3: 環境変数での認証が成功しました。\n")
+
+        else:
+            raise FileNotFoundError(f"認証ファイル({SERVICE_ACCOUNT_FILE})も環境変数(GOOGLE_CREDENTIALS_JSON)も見つかりません。")
+
+    except Exception as e:
+        # 認証情報がなくても (フォークやローカルでの実行) STEP 4 を省くだけで処理は続ける
+        log_callback(f"  認証情報の読み込みに失敗しました: {e}")
+        log_callback("  設定を確認してください。")
+        return None
+    return creds
+
+
+def publish_league(run, league, gc, api, sync_state, log_callback):
+    # 1リーグ分のスプレッドシートを更新し、シートごとのタスクの (結果, エラー) を返す
+    import mleague_publish
+
+    all_player_data = run.all_player_data
+    stats = league.stats
+    DRAFT_TEAMS = league.draft_teams
+    SPECIAL_RULES = league.special_rules
+    M_LEAGUE_PLAYERS = run.M_LEAGUE_PLAYERS
+    SHEETS_SYNC = run.SHEETS_SYNC
+
+    sh = api.call(gc.open, league.spreadsheet_name)
+    team_colors = mleague_publish.build_team_colors(league.team_colors, DRAFT_TEAMS)
+
+    worksheets = mleague_publish.open_worksheets(sh, [
+        ("試合結果", len(all_player_data) // 4 + 12, 5),
+        ("チーム別スコア内訳", 1, 1),
+        ("スコア推移グラフ用データ", 1, 1),
+        ("個人ランキング", len(M_LEAGUE_PLAYERS) + 5, 7),
+    ], api=api)
+    worksheet_games = worksheets["試合結果"]
+    worksheet_details = worksheets["チーム別スコア内訳"]
+    worksheet_chart = worksheets["スコア推移グラフ用データ"]
+    worksheet_ranking = worksheets["個人ランキング"]
+
+    # シートごとの「作成→差分→送信」を別タスクにして並列に実行し、列幅調整は全シートの完了を待つ
+    now = datetime.now().strftime('%Y/%m/%d %H:%M:%S')
+
+    def sheet_task(label, worksheet, build, formatted=True):
+        def task():
+            log_callback(f"  {label}: 「{worksheet.title}」シートを更新中...")
+            values, color_ranges = build()
+            batch = mleague_publish.SheetsBatch(sh, api=api, max_request_bytes=SHEETS_SYNC['max_request_bytes'])
+            rows = mleague_publish.stage_worksheet(
+                batch, worksheet, values, color_ranges, team_colors,
+                formatted=formatted, sync_state=sync_state, log_callback=log_callback,
+            )
+            return mleague_publish.flush_batch(batch, sync_state, {worksheet.title: (worksheet, rows)}, log_callback=log_callback)
+        return task
+
+    graph = mleague_tasks.TaskGraph(max_workers=SHEETS_SYNC['max_workers'])
+    # --- 4-1: 「試合結果」シートの更新 ---
+    graph.add('4-1', sheet_task('4-1', worksheet_games, lambda: mleague_sheets.build_games_sheet(all_player_data, DRAFT_TEAMS)))
+    # --- 4-2 / 4-3: 「チーム別スコア内訳」シートの作成・更新と書式設定 ---
+    graph.add('4-2', sheet_task('4-2', worksheet_details, lambda: mleague_sheets.build_details_sheet(all_player_data, DRAFT_TEAMS, SPECIAL_RULES, now, stats=stats)))
+    # --- 4-4: 「スコア推移グラフ用データ」シートの更新 ---
+    graph.add('4-4', sheet_task('4-4', worksheet_chart, lambda: (mleague_sheets.build_chart_sheet(all_player_data, DRAFT_TEAMS, SPECIAL_RULES, stats=stats), []), formatted=False))
+    # --- 4-5: 「個人ランキング」シートの作成・更新 ---
+    graph.add('4-5', sheet_task('4-5', worksheet_ranking, lambda: mleague_sheets.build_ranking_sheet(all_player_data, DRAFT_TEAMS, M_LEAGUE_PLAYERS, stats=stats)))
+
+    # --- 4-6: 全シートの列幅を自動調整 (書き込めたシートだけ) ---
+    resize_columns = [('4-1', worksheet_games, 5), ('4-2', worksheet_details, 5), ('4-4', worksheet_chart, len(DRAFT_TEAMS) + 1), ('4-5', worksheet_ranking, 7)]
+
+    def resize_task():
+        log_callback("  4-6: 全シートの列幅を自動調整中...")
+        batch = mleague_publish.SheetsBatch(sh, api=api, max_request_bytes=SHEETS_SYNC['max_request_bytes'])
+        for name, worksheet, end_index in resize_columns:
+            if graph.succeeded(name):
+                batch.auto_resize_columns(worksheet, 0, end_index)
+        return batch.flush()
+
+    graph.add('4-6', resize_task, deps=[name for name, _, _ in resize_columns], always=True)
+    return graph.run()
+
+
+def stage_publish_sheets(run):
+    log_callback = run.log_callback
+    SHEETS_SYNC = run.SHEETS_SYNC
+    if not run.total_rows:
+        return
+
+    leagues = changed_leagues(run, 'sheets')
+    run.metrics.set('publish-sheets', skipped_leagues=len(run.leagues) - len(leagues))
+    if not leagues:
+        log_callback("STEP 4: 前回の公開から変更がないため、スプレッドシートの更新をスキップします。\n")
+        return
+
+    import gspread
+    import mleague_publish
+
+    endpoint = run.GOOGLE_API['endpoint']
+    if endpoint:
+        # ローカルのエミュレーターなどへ送る場合は認証しない
+        log_callback(f"STEP 3: Google API の代わりに {endpoint} へ接続します (認証なし)。\n")
+        creds = None
+    else:
+        creds = load_credentials(run)
+        if creds is None:
+            run.metrics.set('publish-sheets', skipped_reason='no_credentials')
+            log_callback("STEP 4: 認証情報がないため、スプレッドシートの更新をスキップします。\n")
+            return
+
+    # === STEP 4: スプレッドシートへの書き込み処理 ===
+    try:
+        log_callback("STEP 4: スプレッドシートへの書き込み処理を開始します...")
+        # Google API の呼び出しはすべて api.call 経由 (レート制限と再試行)
+        api = mleague_google.GoogleApiClient(log_callback=log_callback, **run.GOOGLE_API)
+        if endpoint:
+            gc = gspread.authorize(None, session=mleague_google.endpoint_session(endpoint))
+        else:
+            gc = gspread.authorize(creds)
+
+        sync_state = None
+        if SHEETS_SYNC['mode'] == 'diff':
+            sync_state = mleague_publish.SheetsSyncState(SHEETS_SYNC['state_filename'])
+
+        # リーグごとのスプレッドシートを並列に更新する (レート制限と同期状態は全リーグで共有)
+        multi_league = len(run.leagues) > 1
+
+        def league_task(league, fingerprint):
+            def task():
+                league_log = log_callback
+                if multi_league:
+                    league_log = lambda message: log_callback(f"[{league.id}] {message}")
+                _, errors = publish_league(run, league, gc, api, sync_state, league_log)
+                for name, error in errors.items():
+                    league_log(f"  {name}でエラーが発生しました: {error}")
+                if errors:
+                    raise RuntimeError(f"{len(errors)}件のタスクが失敗しました ({', '.join(errors)})")
+                record_published(run, 'sheets', league, fingerprint)
+            return task
+
+        graph = mleague_tasks.TaskGraph(max_workers=len(leagues))
+        for league, fingerprint in leagues:
+            graph.add(league.id, league_task(league, fingerprint))
+
+        try:
+            _, errors = graph.run()
+        finally:
+            if sync_state is not None:
+                sync_state.save()
+            save_publish_state(run)
+            counters = api.summary()
+            run.metrics.set('publish-sheets', leagues=len(leagues), api_calls=counters['calls'], api_retries=counters['retried'],
+                            api_throttled=counters['throttled'], api_failed=counters['failed'],
+                            limiter_wait_seconds=counters['limiter_wait'], backoff_wait_seconds=counters['backoff_wait'])
+            log_callback(f"  API呼び出し: {counters['calls']}回 (再試行 {counters['retried']}回・レート制限 {counters['throttled']}回)")
+
+        if errors and not multi_league:
+            raise next(iter(errors.values()))
+        failed = [league.id for league in run.leagues if league.id in errors]
+        for league_id in failed:
+            log_callback(f"  [{league_id}] 更新に失敗しました: {type(errors[league_id]).__name__}: {errors[league_id]}")
+        if failed:
+            raise RuntimeError(f"{len(failed)}リーグの更新に失敗しました ({', '.join(failed)})")
+
+        log_callback("STEP 4: すべてのスプレッドシートの更新が完了しました。\n")
+
+    except Exception as e:
+        log_callback(f"  STEP 4でエラーが発生しました: {e}\n")
+        raise
+
+
+def stage_render_html(run):
+    # === STEP 5: Webページ生成 ===
+    # スプレッドシートとは独立しているので、集計が終わればSTEP 4と並行して生成する
+    log_callback = run.log_callback
+    if not run.total_rows:
+        return
+    try:
+        leagues = changed_leagues(run, 'html')
+        if not leagues:
+            run.metrics.set('render-html', html_bytes=0, pages=0, skipped_pages=len(run.leagues))
+            log_callback("STEP 5: 前回の公開から変更がないため、Webページの生成をスキップします。\n")
+            return
+        log_callback("STEP 5: Webページ(index.html)を生成します...")
+
+        html_bytes = 0
+        try:
+            for league, fingerprint in leagues:
                 # 色設定の構築
                 team_colors = {}
-                for team_name, color_data in TEAM_COLORS_CONFIG.items():
+                for team_name, color_data in league.team_colors.items():
                     team_colors[team_name] = color_data
-                
-                mleague_viewer.generate_html(all_player_data, DRAFT_TEAMS, team_colors)
-                log_callback("STEP 5: 生成が完了しました。\n")
-                
-            except Exception as e:
-                log_callback(f"  STEP 5でエラーが発生しました: {e}\n")
 
+                output_path = mleague_viewer.generate_html(run.all_player_data, league.draft_teams, team_colors,
+                                                           stats=league.stats, output_path=league.output_html,
+                                                           history_options=run.HISTORY)
+                html_bytes += os.path.getsize(output_path)
+                record_published(run, 'html', league, fingerprint)
+        finally:
+            save_publish_state(run)
+        run.metrics.set('render-html', html_bytes=html_bytes, pages=len(leagues), skipped_pages=len(run.leagues) - len(leagues))
+        log_callback("STEP 5: 生成が完了しました。\n")
+
+    except Exception as e:
+        log_callback(f"  STEP 5でエラーが発生しました: {e}\n")
+        raise
+
+
+# (ステージ名, 関数, 依存するステージ, 依存先が失敗しても実行するか)
+PIPELINE_STAGES = [
+    ('fetch', stage_fetch, (), False),
+    ('parse', stage_parse, ('fetch',), False),
+    ('dedup', stage_dedup, ('parse',), True),
+    ('persist', stage_persist, ('dedup',), False),
+    ('aggregate', stage_aggregate, ('dedup',), False),
+    ('publish-sheets', stage_publish_sheets, ('aggregate',), False),
+    ('render-html', stage_render_html, ('aggregate',), False),
+]
+
+# コマンドごとに実行するステージ。all 以外は保存済みのデータ (HTTPキャッシュ・CSV・データベース) を読み書きする
+COMMAND_STAGES = {
+    # 全ステージ (取得から公開まで)
+    'all': PIPELINE_STAGES,
+    # ページを取得してHTTPキャッシュに保存するだけ
+    'fetch': [
+        ('fetch', stage_fetch, (), False),
+    ],
+    # キャッシュのページを解析して保存・集計する (通信なし)
+    'parse': [
+        ('fetch', stage_load_cached_pages, (), False),
+        ('parse', stage_parse, ('fetch',), False),
+        ('dedup', stage_dedup, ('parse',), True),
+        ('persist', stage_persist, ('dedup',), False),
+        ('aggregate', stage_aggregate, ('dedup',), False),
+    ],
+    # 保存済みの結果からスプレッドシートだけを更新する
+    'sheets': [
+        ('load', stage_load_results, (), False),
+        ('aggregate', stage_aggregate, ('load',), False),
+        ('publish-sheets', stage_publish_sheets, ('aggregate',), False),
+    ],
+    # 保存済みの結果からWebページだけを生成する
+    'render': [
+        ('load', stage_load_results, (), False),
+        ('aggregate', stage_aggregate, ('load',), False),
+        ('render-html', stage_render_html, ('aggregate',), False),
+    ],
+}
+
+
+def run_stage(run, name, func):
+    # ステージの実行時間と結果を計測値に記録する
+    started = time.perf_counter()
+    try:
+        func(run)
+    except Exception as e:
+        run.metrics.finish_stage(name, time.perf_counter() - started, 'failed', e)
+        raise
+    run.metrics.finish_stage(name, time.perf_counter() - started, 'ok')
+
+
+def run_pipeline(run, stages=PIPELINE_STAGES):
+    graph = mleague_tasks.TaskGraph(max_workers=PIPELINE_MAX_WORKERS)
+    for name, func, deps, always in stages:
+        graph.add(name, lambda name=name, func=func: run_stage(run, name, func), deps=deps, always=always)
+    run.stage_results, run.stage_errors = graph.run()
+    for name, error in run.stage_errors.items():
+        if isinstance(error, mleague_tasks.DependencyFailed):
+            run.metrics.finish_stage(name, 0.0, 'skipped', error)
+
+    run.log_callback("ステージ結果:")
+    for name, _, _, _ in stages:
+        if name in run.stage_errors:
+            error = run.stage_errors[name]
+            status = "スキップ" if isinstance(error, mleague_tasks.DependencyFailed) else "失敗"
+            run.log_callback(f"  {name}: {status} ({error})")
+        else:
+            run.log_callback(f"  {name}: 成功 ({graph.durations[name]:.2f}秒)")
+    return run
+
+
+def run_scraper(log_callback=print, command='all', force=False, source='auto', metrics_callback=None):
+    try:
+        config = load_config()
+        run = ScraperRun(config, log_callback=log_callback, metrics_callback=metrics_callback)
+        run.FORCE_PUBLISH = force
+        run.RESULTS_SOURCE = source
+        if command in ('fetch', 'parse') and run.HTTP_CACHE is None:
+            raise RuntimeError(f"{command} コマンドにはHTTPキャッシュが必要です (http_cache.enabled)。")
+        run_pipeline(run, COMMAND_STAGES[command])
+        try:
+            run.metrics.finish(run.METRICS_FILENAME)
+        except Exception as e:
+            log_callback(f"  計測結果の保存に失敗しました: {e}")
         log_callback("すべての処理が完了しました。")
+        return run
 
     except Exception as e:
         log_callback(f"予期せぬエラーが発生しました: {e}")
 
-if __name__ == "__main__":
-    run_scraper()
 
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="M-League draft scraper")
+    subparsers = arg_parser.add_subparsers(dest='command', metavar='command')
+    command_help = {
+        'all': "取得から公開まで全ステージを実行する (省略時)",
+        'fetch': "ページを取得してHTTPキャッシュに保存する",
+        'parse': "キャッシュのページを解析し、CSV・データベース・集計を更新する (通信なし)",
+        'sheets': "保存済みの結果からスプレッドシートを更新する",
+        'render': "保存済みの結果からWebページを生成する (通信なし)",
+    }
+    for command, help_text in command_help.items():
+        command_parser = subparsers.add_parser(command, help=help_text)
+        if command in ('all', 'sheets', 'render'):
+            command_parser.add_argument('--force', action='store_true', help="前回の公開から変更がなくても公開する")
+        if command in ('sheets', 'render'):
+            command_parser.add_argument('--source', choices=('auto', 'csv', 'db'), default='auto',
+                                        help="読み込む保存済みの結果 (auto はCSV、なければデータベース)")
+    args = arg_parser.parse_args(argv)
+
+    run = run_scraper(command=args.command or 'all', force=getattr(args, 'force', False),
+                      source=getattr(args, 'source', 'auto'))
+    if run is None:
+        return 1
+    return 1 if run.stage_errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,275 @@
+import difflib
+import json
+from collections import defaultdict
+
+from mleague_stats import compute_stats
+from mleague_store import as_player_data
+
+# 各シートに書き込む値の組み立て (Google API には依存しない)
+# 色付けは (セル範囲, チーム名) のリストで返し、書式への変換は呼び出し側で行う
+
+GAMES_SHEET = "試合結果"
+DETAILS_SHEET = "チーム別スコア内訳"
+CHART_SHEET = "スコア推移グラフ用データ"
+RANKING_SHEET = "個人ランキング"
+
+
+def rowcol_to_a1(row, col):
+    # (1, 2) -> "B1"
+    letters = ''
+    while col > 0:
+        col, remainder = divmod(col - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return f"{letters}{row}"
+
+
+def a1_row_span(cell_range):
+    # "B5" -> (5, 5), "A10:E12" -> (10, 12)
+    rows = []
+    for part in cell_range.split(':'):
+        digits = ''.join(ch for ch in part if ch.isdigit())
+        rows.append(int(digits))
+    return rows[0], rows[-1]
+
+
+def row_blocks(rows):
+    # [3, 4, 5, 9] -> [(3, 5), (9, 9)]
+    blocks = []
+    for row in sorted(rows):
+        if blocks and row == blocks[-1][1] + 1:
+            blocks[-1] = (blocks[-1][0], row)
+        else:
+            blocks.append((row, row))
+    return blocks
+
+
+def player_team_map(draft_teams):
+    return {player: team for team, players in draft_teams.items() for player in players}
+
+
+def build_games_sheet(player_data, draft_teams):
+    # --- 4-1: 「試合結果」シート ---
+    player_data = as_player_data(player_data)
+    player_to_team = player_team_map(draft_teams)
+
+    games = defaultdict(list)
+    for game_title, player_name, score, rank in player_data:
+        games[game_title].append({'name': player_name, 'score': score, 'rank': rank})
+
+    unique_games = []
+    for game_title, players_data in games.items():
+        for i in range(0, len(players_data), 4):
+            game_chunk = players_data[i:i+4]
+            if len(game_chunk) == 4:
+                unique_games.append((game_title, game_chunk))
+
+    legend_row = ['凡例:'] + list(draft_teams.keys())
+    header_games = ['試合', '1位', '2位', '3位', '4位']
+    data_games = [legend_row, header_games]
+    color_ranges = []
+
+    for i, team_name in enumerate(draft_teams.keys(), 2):
+        color_ranges.append((rowcol_to_a1(1, i), team_name))
+
+    sorted_unique_games = sorted(unique_games, key=lambda x: x[0], reverse=True)
+    for row_idx, (game_title, players_in_game) in enumerate(sorted_unique_games, 3):
+        sorted_players = sorted(players_in_game, key=lambda p: p['rank'])
+        row_to_write = [game_title]
+
+        for player_info in sorted_players:
+            player_name = player_info['name']
+            score = player_info['score']
+            score_str = f"({'+' if score >= 0 else ''}{round(score, 1)})"
+            row_to_write.append(f"{player_name} {score_str}")
+
+            if player_name in player_to_team:
+                cell_label = rowcol_to_a1(row_idx, player_info['rank'] + 1)
+                color_ranges.append((cell_label, player_to_team[player_name]))
+
+        row_to_write.extend([''] * (5 - len(row_to_write)))
+        data_games.append(row_to_write[:5])
+
+    return data_games, color_ranges
+
+
+def build_details_sheet(player_data, draft_teams, special_rules, now, stats=None):
+    # --- 4-2 / 4-3: 「チーム別スコア内訳」シート ---
+    if stats is None:
+        stats = compute_stats(player_data, draft_teams)
+
+    team_totals = {team: stats.team_total(team) for team in draft_teams.keys()}
+
+    # 特別ルール: チームボーナス
+    team_bonus = special_rules.get('team_bonus', {})
+    for team, bonus in team_bonus.items():
+        if team in team_totals:
+            team_totals[team] += bonus
+
+    data_details = [[f"最終更新日時: {now}"], []]
+
+    data_details.append(["チーム総合ランキング"])
+    data_details.append(["順位", "チーム名", "合計スコア"])
+    sorted_teams = sorted(team_totals.items(), key=lambda item: item[1], reverse=True)
+
+    for i, (team_name, total_score) in enumerate(sorted_teams, 1):
+        data_details.append([f"{i}位", team_name, round(total_score, 1)])
+    data_details.append([])
+
+    data_details.append(["選手別 詳細成績"])
+    data_details.append(["所属チーム", "選手名", "個人合計スコア", "平均順位", "出場回数"])
+
+    color_ranges = []
+    player_bonus = special_rules.get('player_bonus', {})
+
+    for team_name, players in draft_teams.items():
+        for player in players:
+            player_stats = stats.player(player)
+            player_display_score = player_stats['total_score']
+
+            # 特別ルール: 個人ボーナス
+            if player in player_bonus:
+                player_display_score += player_bonus[player]
+
+            avg_rank = round(stats.avg_rank(player), 2)
+            data_details.append([team_name, player, round(player_display_score, 1), avg_rank, player_stats['game_count']])
+
+        data_details.append([f"{team_name} 合計", "", round(team_totals[team_name], 1), "", ""])
+
+        total_row_num = len(data_details)
+        color_ranges.append((f'A{total_row_num}:E{total_row_num}', team_name))
+
+        data_details.append([])
+
+    # チーム総合ランキングのチーム名セル
+    for i, (team_name, _) in enumerate(sorted_teams):
+        color_ranges.append((f'B{i + 5}', team_name))
+
+    return data_details, color_ranges
+
+
+def build_chart_sheet(player_data, draft_teams, special_rules, stats=None):
+    # --- 4-4: 「スコア推移グラフ用データ」シート ---
+    if stats is None:
+        stats = compute_stats(player_data, draft_teams)
+
+    team_order = list(draft_teams.keys())
+    chart_data = [['試合'] + team_order]
+
+    cumulative_scores = {team: 0.0 for team in team_order}
+
+    # 特別ルール: 開幕前スコア (チームボーナス)
+    team_bonus = special_rules.get('team_bonus', {})
+    for team, bonus in team_bonus.items():
+        if team in cumulative_scores:
+            cumulative_scores[team] = bonus
+
+    chart_data.append(['開幕前'] + [round(s, 1) for s in cumulative_scores.values()])
+
+    history = stats.team_history(initial=cumulative_scores.values(), team_games_only=True)
+    for game_title, cumulative in history:
+        chart_data.append([game_title] + [round(score, 1) for score in cumulative])
+
+    return chart_data
+
+
+def build_ranking_sheet(player_data, draft_teams, m_league_players, stats=None):
+    # --- 4-5: 「個人ランキング」シート ---
+    if stats is None:
+        stats = compute_stats(player_data, draft_teams)
+    player_to_team = player_team_map(draft_teams)
+
+    ranking_data = []
+    for player_name in m_league_players:
+        player_stats = stats.player(player_name)
+        ranking_data.append([
+            player_name,
+            player_stats['total_score'],
+            player_stats['ranks'][1],
+            player_stats['ranks'][2],
+            player_stats['ranks'][3],
+            player_stats['ranks'][4]
+        ])
+
+    sorted_ranking = sorted(ranking_data, key=lambda x: x[1], reverse=True)
+
+    data_for_ranking_sheet = [["順位", "選手名", "合計スコア", "1位", "2位", "3位", "4位"]]
+    color_ranges = []
+
+    for i, (player_name, total_score, r1, r2, r3, r4) in enumerate(sorted_ranking, 1):
+        data_for_ranking_sheet.append([f"{i}位", player_name, round(total_score, 1), r1, r2, r3, r4])
+
+        if player_name in player_to_team:
+            color_ranges.append((f'A{i+1}:G{i+1}', player_to_team[player_name]))
+
+    return data_for_ranking_sheet, color_ranges
+
+
+# --- 差分更新 ---
+
+def normalize_row(row):
+    # 末尾の空セルは比較に影響させない
+    row = list(row)
+    while row and row[-1] in ('', None):
+        row.pop()
+    return row
+
+
+class SheetDiff:
+    def __init__(self):
+        self.clear_rows = []        # 先に空にする旧レイアウトの行範囲 [(開始行, 終了行)]
+        self.structural = []        # 下から順に適用する ('delete', 開始行, 終了行) / ('insert', 行, 値)
+        self.updates = []           # 新レイアウトでのセル更新 [(A1範囲, [[値, ...]])]
+        self.touched_rows = set()   # 内容が変わった新レイアウトの行 (書式の再設定対象)
+
+    def is_empty(self):
+        return not (self.clear_rows or self.structural or self.updates)
+
+    def inserted_row_count(self):
+        return sum(len(op[2]) for op in self.structural if op[0] == 'insert')
+
+
+def diff_rows(old_rows, new_rows):
+    # 前回書き込んだ値と今回の値を比べ、行の挿入・削除とセル単位の更新に分解する
+    old = [normalize_row(r) for r in old_rows]
+    new = [normalize_row(r) for r in new_rows]
+    old_keys = [json.dumps(r, ensure_ascii=False) for r in old]
+    new_keys = [json.dumps(r, ensure_ascii=False) for r in new]
+
+    diff = SheetDiff()
+    matcher = difflib.SequenceMatcher(None, old_keys, new_keys, autojunk=False)
+
+    # 行番号がずれないよう下のブロックから処理する
+    for tag, i1, i2, j1, j2 in reversed(matcher.get_opcodes()):
+        if tag == 'equal':
+            continue
+        common = min(i2 - i1, j2 - j1)
+
+        # 対応する行同士はセル単位で更新
+        for offset in range(common):
+            old_row, new_row = old[i1 + offset], new[j1 + offset]
+            width = max(len(old_row), len(new_row))
+            old_row = old_row + [''] * (width - len(old_row))
+            new_row = new_row + [''] * (width - len(new_row))
+            changed = [col for col in range(width) if old_row[col] != new_row[col]]
+            if changed:
+                row_num = j1 + offset + 1
+                first, last = changed[0], changed[-1]
+                cell_range = f"{rowcol_to_a1(row_num, first + 1)}:{rowcol_to_a1(row_num, last + 1)}"
+                diff.updates.append((cell_range, [new_row[first:last + 1]]))
+                diff.touched_rows.add(row_num)
+
+        # 余った旧行は削除 (末尾なら行を消さずに空にする)
+        if i1 + common < i2:
+            if i2 == len(old) and j2 == len(new):
+                diff.clear_rows.append((i1 + common + 1, i2))
+            else:
+                diff.structural.append(('delete', i1 + common + 1, i2))
+
+        # 余った新行は挿入
+        if j1 + common < j2:
+            values = [row or [''] for row in new[j1 + common:j2]]
+            diff.structural.append(('insert', i1 + common + 1, values))
+            diff.touched_rows.update(range(j1 + common + 1, j2 + 1))
+
+    diff.updates.reverse()
+    return diff
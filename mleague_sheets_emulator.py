@@ -0,0 +1,614 @@
+import argparse
+import copy
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+# gspread / gspread_formatting が使う Sheets v4・Drive v3 API の一部を手元で再現するHTTPサーバー
+# 遅延・429/503 の注入・呼び出し回数の記録ができ、クォータを使わずに STEP 4 を計測・試験できる
+# config の google_api.endpoint にこのサーバーのURLを入れると run_scraper が接続先を切り替える
+
+DEFAULT_EMULATOR_OPTIONS = {
+    'host': '127.0.0.1',
+    'port': 8780,
+    'latency': 0.0,           # 1回の呼び出しごとに待つ秒数
+    'latency_jitter': 0.0,    # latency に加える 0〜この秒数の揺らぎ
+    'error_rate_429': 0.0,    # この割合で 429 (RESOURCE_EXHAUSTED) を返す
+    'error_rate_503': 0.0,    # この割合で 503 (UNAVAILABLE) を返す
+    'quota_per_minute': None,  # 直近60秒の呼び出しがこの回数を超えたら 429 を返す
+    'retry_after': 1,         # 429 に付ける Retry-After (秒)
+    'auto_create': True,      # 名前で開かれたスプレッドシートが無ければ作る
+    'seed': None,
+}
+
+DEFAULT_ROWS = 1000
+DEFAULT_COLS = 26
+SHEETS_MIME_TYPE = 'application/vnd.google-apps.spreadsheet'
+
+
+class EmulatorError(Exception):
+    def __init__(self, code, status, message, reason=None, headers=None):
+        super().__init__(message)
+        self.code = code
+        self.status = status
+        self.reason = reason
+        self.headers = headers or {}
+
+    def body(self):
+        error = {'code': self.code, 'message': str(self), 'status': self.status}
+        if self.reason:
+            error['errors'] = [{'reason': self.reason, 'message': str(self)}]
+        return {'error': error}
+
+
+def bad_request(message):
+    return EmulatorError(400, 'INVALID_ARGUMENT', message)
+
+
+def column_index(letters):
+    index = 0
+    for ch in letters:
+        index = index * 26 + ord(ch.upper()) - 64
+    return index
+
+
+def parse_a1(a1_range):
+    # "'シート'!A1:C3" -> (シート名, 開始行, 開始列, 終了行, 終了列) 0始まり・終了は含まない。範囲がなければ None
+    sheet_name, _, cells = a1_range.rpartition('!')
+    if not sheet_name:
+        sheet_name, cells = cells, ''
+    if sheet_name.startswith("'") and sheet_name.endswith("'"):
+        sheet_name = sheet_name[1:-1].replace("''", "'")
+    if not cells:
+        return sheet_name, None
+    parts = cells.split(':')
+    bounds = []
+    for part in parts:
+        match = re.fullmatch(r'([A-Za-z]*)(\d*)', part)
+        if not match:
+            raise bad_request(f"Unable to parse range: {a1_range}")
+        col = column_index(match.group(1)) if match.group(1) else None
+        row = int(match.group(2)) if match.group(2) else None
+        bounds.append((row, col))
+    (start_row, start_col), (end_row, end_col) = bounds[0], bounds[-1]
+    return sheet_name, (
+        (start_row or 1) - 1,
+        (start_col or 1) - 1,
+        end_row,
+        end_col,
+    )
+
+
+def user_entered(value):
+    # valueInputOption=USER_ENTERED の数値変換だけを真似る
+    if isinstance(value, str):
+        try:
+            number = float(value)
+        except ValueError:
+            return value
+        return int(number) if number.is_integer() and '.' not in value else number
+    return value
+
+
+class Sheet:
+    def __init__(self, sheet_id, title, index, rows=DEFAULT_ROWS, cols=DEFAULT_COLS):
+        self.sheet_id = sheet_id
+        self.title = title
+        self.index = index
+        self.rows = rows
+        self.cols = cols
+        self.values = {}    # (行, 列) -> 値
+        self.formats = {}   # (行, 列) -> userEnteredFormat
+
+    def properties(self):
+        return {
+            'sheetId': self.sheet_id,
+            'title': self.title,
+            'index': self.index,
+            'sheetType': 'GRID',
+            'gridProperties': {'rowCount': self.rows, 'columnCount': self.cols},
+        }
+
+    def check(self, end_row, end_col):
+        if end_row > self.rows or end_col > self.cols:
+            raise bad_request(
+                f"Range ('{self.title}'!{end_row}:{end_col}) exceeds grid limits. "
+                f"Max rows: {self.rows}, max columns: {self.cols}"
+            )
+
+    def grid(self):
+        # 値のある範囲を2次元リストで返す (末尾の空セルは落とす)
+        if not self.values:
+            return []
+        last_row = max(r for r, _ in self.values)
+        grid = []
+        for r in range(last_row + 1):
+            row = [self.values.get((r, c), '') for c in range(self.cols)]
+            while row and row[-1] == '':
+                row.pop()
+            grid.append(row)
+        return grid
+
+    def shift_rows(self, start, count):
+        # count > 0 で start 行目の前に挿入、count < 0 で start 行目から削除
+        for attr in ('values', 'formats'):
+            shifted = {}
+            for (r, c), value in getattr(self, attr).items():
+                if r < start:
+                    shifted[(r, c)] = value
+                elif count < 0 and r < start - count:
+                    continue
+                else:
+                    shifted[(r + count, c)] = value
+            setattr(self, attr, shifted)
+        self.rows += count
+
+
+class Spreadsheet:
+    def __init__(self, title):
+        self.id = uuid.uuid4().hex
+        self.title = title
+        self.sheets = []
+        self.next_sheet_id = 1
+        self.add_sheet('シート1', sheet_id=0)
+
+    def add_sheet(self, title, sheet_id=None, rows=DEFAULT_ROWS, cols=DEFAULT_COLS):
+        if any(sheet.title == title for sheet in self.sheets):
+            raise bad_request(f'A sheet with the name "{title}" already exists.')
+        if sheet_id is None:
+            sheet_id = self.next_sheet_id
+        self.next_sheet_id = max(self.next_sheet_id, sheet_id + 1)
+        sheet = Sheet(sheet_id, title, len(self.sheets), rows, cols)
+        self.sheets.append(sheet)
+        return sheet
+
+    def sheet_by_id(self, sheet_id):
+        for sheet in self.sheets:
+            if sheet.sheet_id == sheet_id:
+                return sheet
+        raise bad_request(f"No grid with id: {sheet_id}")
+
+    def sheet_by_title(self, title):
+        for sheet in self.sheets:
+            if sheet.title == title:
+                return sheet
+        raise bad_request(f"Unable to parse range: {title}")
+
+    def metadata(self):
+        return {
+            'spreadsheetId': self.id,
+            'properties': {'title': self.title, 'locale': 'ja_JP', 'timeZone': 'Asia/Tokyo'},
+            'sheets': [{'properties': sheet.properties()} for sheet in self.sheets],
+        }
+
+    # --- spreadsheets.batchUpdate ---
+    def apply(self, request):
+        (kind, body), = request.items()
+        handler = getattr(self, 'req_' + kind, None)
+        if handler is None:
+            raise bad_request(f"Unsupported request: {kind}")
+        return handler(body)
+
+    def grid_range(self, grid_range):
+        sheet = self.sheet_by_id(grid_range.get('sheetId', 0))
+        start_row = grid_range.get('startRowIndex', 0)
+        end_row = grid_range.get('endRowIndex', sheet.rows)
+        start_col = grid_range.get('startColumnIndex', 0)
+        end_col = grid_range.get('endColumnIndex', sheet.cols)
+        sheet.check(end_row, end_col)
+        return sheet, start_row, end_row, start_col, end_col
+
+    def req_addSheet(self, body):
+        properties = body.get('properties', {})
+        grid = properties.get('gridProperties', {})
+        sheet = self.add_sheet(properties.get('title', f"シート{len(self.sheets) + 1}"), properties.get('sheetId'),
+                               grid.get('rowCount', DEFAULT_ROWS), grid.get('columnCount', DEFAULT_COLS))
+        return {'addSheet': {'properties': sheet.properties()}}
+
+    def req_deleteSheet(self, body):
+        sheet = self.sheet_by_id(body['sheetId'])
+        self.sheets.remove(sheet)
+        for index, other in enumerate(self.sheets):
+            other.index = index
+        return {}
+
+    def req_updateSheetProperties(self, body):
+        properties = body['properties']
+        sheet = self.sheet_by_id(properties.get('sheetId', 0))
+        if 'title' in properties:
+            sheet.title = properties['title']
+        grid = properties.get('gridProperties', {})
+        sheet.rows = grid.get('rowCount', sheet.rows)
+        sheet.cols = grid.get('columnCount', sheet.cols)
+        return {}
+
+    def req_updateCells(self, body):
+        fields = body.get('fields', '')
+        if 'range' in body:
+            sheet, start_row, end_row, start_col, end_col = self.grid_range(body['range'])
+            for key in [k for k in sheet.values if start_row <= k[0] < end_row and start_col <= k[1] < end_col]:
+                if 'userEnteredValue' in fields or fields == '*':
+                    del sheet.values[key]
+            rows = body.get('rows', [])
+        else:
+            start = body['start']
+            sheet = self.sheet_by_id(start.get('sheetId', 0))
+            start_row, start_col = start.get('rowIndex', 0), start.get('columnIndex', 0)
+            rows = body.get('rows', [])
+            width = max((len(row.get('values', [])) for row in rows), default=0)
+            sheet.check(start_row + len(rows), start_col + width)
+        for i, row in enumerate(rows):
+            for j, cell in enumerate(row.get('values', [])):
+                key = (start_row + i, start_col + j)
+                value = cell.get('userEnteredValue')
+                if value is None:
+                    sheet.values.pop(key, None)
+                else:
+                    (_, sheet.values[key]), = value.items()
+        return {}
+
+    def req_repeatCell(self, body):
+        sheet, start_row, end_row, start_col, end_col = self.grid_range(body['range'])
+        cell_format = body.get('cell', {}).get('userEnteredFormat')
+        if cell_format is not None:
+            for r in range(start_row, end_row):
+                for c in range(start_col, end_col):
+                    sheet.formats[(r, c)] = cell_format
+        return {}
+
+    def req_appendDimension(self, body):
+        sheet = self.sheet_by_id(body['sheetId'])
+        if body['dimension'] == 'ROWS':
+            sheet.rows += body['length']
+        else:
+            sheet.cols += body['length']
+        return {}
+
+    def req_insertDimension(self, body):
+        grid_range = body['range']
+        sheet = self.sheet_by_id(grid_range['sheetId'])
+        if grid_range['dimension'] != 'ROWS':
+            sheet.cols += grid_range['endIndex'] - grid_range['startIndex']
+            return {}
+        if grid_range['startIndex'] > sheet.rows:
+            raise bad_request("insertDimension: startIndex exceeds grid limits")
+        sheet.shift_rows(grid_range['startIndex'], grid_range['endIndex'] - grid_range['startIndex'])
+        return {}
+
+    def req_deleteDimension(self, body):
+        grid_range = body['range']
+        sheet = self.sheet_by_id(grid_range['sheetId'])
+        if grid_range['dimension'] != 'ROWS':
+            sheet.cols -= grid_range['endIndex'] - grid_range['startIndex']
+            return {}
+        sheet.check(grid_range['endIndex'], 1)
+        sheet.shift_rows(grid_range['startIndex'], grid_range['startIndex'] - grid_range['endIndex'])
+        return {}
+
+    def req_autoResizeDimensions(self, body):
+        self.sheet_by_id(body['dimensions']['sheetId'])
+        return {}
+
+    def req_updateDimensionProperties(self, body):
+        self.sheet_by_id(body['range']['sheetId'])
+        return {}
+
+    # --- spreadsheets.values ---
+    def write_values(self, a1_range, values, value_input_option):
+        sheet_name, bounds = parse_a1(a1_range)
+        sheet = self.sheet_by_title(sheet_name)
+        start_row, start_col = (bounds[0], bounds[1]) if bounds else (0, 0)
+        width = max((len(row) for row in values), default=0)
+        # values.update はシートの大きさが足りなければ広げる
+        sheet.rows = max(sheet.rows, start_row + len(values))
+        sheet.cols = max(sheet.cols, start_col + width)
+        for i, row in enumerate(values):
+            for j, value in enumerate(row):
+                key = (start_row + i, start_col + j)
+                if value in ('', None):
+                    sheet.values.pop(key, None)
+                else:
+                    sheet.values[key] = user_entered(value) if value_input_option == 'USER_ENTERED' else value
+        return {
+            'spreadsheetId': self.id,
+            'updatedRange': a1_range,
+            'updatedRows': len(values),
+            'updatedColumns': width,
+            'updatedCells': sum(len(row) for row in values),
+        }
+
+    def clear_values(self, a1_range):
+        sheet_name, bounds = parse_a1(a1_range)
+        sheet = self.sheet_by_title(sheet_name)
+        if bounds is None:
+            sheet.values = {}
+        else:
+            start_row, start_col, end_row, end_col = bounds
+            end_row = end_row if end_row is not None else sheet.rows
+            end_col = end_col if end_col is not None else sheet.cols
+            for key in [k for k in sheet.values if start_row <= k[0] < end_row and start_col <= k[1] < end_col]:
+                del sheet.values[key]
+        return {'spreadsheetId': self.id, 'clearedRange': a1_range}
+
+    def read_values(self, a1_range):
+        sheet_name, bounds = parse_a1(a1_range)
+        sheet = self.sheet_by_title(sheet_name)
+        grid = sheet.grid()
+        if bounds is not None:
+            start_row, start_col, end_row, end_col = bounds
+            grid = [row[start_col:end_col] for row in grid[start_row:end_row]]
+        return {'range': a1_range, 'majorDimension': 'ROWS', 'values': grid}
+
+
+class EmulatorState:
+    def __init__(self, options):
+        self.options = options
+        self.lock = threading.Lock()
+        self.random = random.Random(options['seed'])
+        self.spreadsheets = {}
+        self.recent_calls = deque()
+        self.counters = {}
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def reset(self):
+        with self.lock:
+            self.spreadsheets = {}
+            self.recent_calls.clear()
+            self.counters = {}
+
+    def find_by_title(self, title):
+        for spreadsheet in self.spreadsheets.values():
+            if spreadsheet.title == title:
+                return spreadsheet
+        return None
+
+    def spreadsheet(self, spreadsheet_id):
+        spreadsheet = self.spreadsheets.get(spreadsheet_id)
+        if spreadsheet is None:
+            raise EmulatorError(404, 'NOT_FOUND', f"Requested entity was not found: {spreadsheet_id}")
+        return spreadsheet
+
+    def inject_errors(self):
+        # 呼び出しごとに、クォータ超過・ランダムな 429/503 を判定する
+        options = self.options
+        retry_after = {'Retry-After': str(options['retry_after'])}
+        now = time.monotonic()
+        while self.recent_calls and now - self.recent_calls[0] > 60:
+            self.recent_calls.popleft()
+        if options['quota_per_minute'] is not None and len(self.recent_calls) >= options['quota_per_minute']:
+            self.count('throttled')
+            raise EmulatorError(429, 'RESOURCE_EXHAUSTED', "Quota exceeded for quota metric 'Write requests' (emulated)",
+                                reason='rateLimitExceeded', headers=retry_after)
+        self.recent_calls.append(now)
+        roll = self.random.random()
+        if roll < options['error_rate_429']:
+            self.count('throttled')
+            raise EmulatorError(429, 'RESOURCE_EXHAUSTED', "Quota exceeded (injected)",
+                                reason='rateLimitExceeded', headers=retry_after)
+        if roll < options['error_rate_429'] + options['error_rate_503']:
+            self.count('unavailable')
+            raise EmulatorError(503, 'UNAVAILABLE', "The service is currently unavailable (injected)")
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'counters': dict(self.counters),
+                'spreadsheets': {
+                    spreadsheet.title: {sheet.title: sheet.grid() for sheet in spreadsheet.sheets}
+                    for spreadsheet in self.spreadsheets.values()
+                },
+            }
+
+
+ROUTES = [
+    ('GET', re.compile(r'^/drive/v3/files$'), 'drive_list'),
+    ('GET', re.compile(r'^/v4/spreadsheets/([^/:]+)$'), 'spreadsheet_get'),
+    ('POST', re.compile(r'^/v4/spreadsheets/([^/:]+):batchUpdate$'), 'batch_update'),
+    ('POST', re.compile(r'^/v4/spreadsheets/([^/:]+)/values:batchUpdate$'), 'values_batch_update'),
+    ('POST', re.compile(r'^/v4/spreadsheets/([^/:]+)/values:batchClear$'), 'values_batch_clear'),
+    ('POST', re.compile(r'^/v4/spreadsheets/([^/:]+)/values/(.+):clear$'), 'values_clear'),
+    ('PUT', re.compile(r'^/v4/spreadsheets/([^/:]+)/values/(.+)$'), 'values_update'),
+    ('GET', re.compile(r'^/v4/spreadsheets/([^/:]+)/values/(.+)$'), 'values_get'),
+]
+
+
+class EmulatorHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    state = None    # サーバーごとのサブクラスで EmulatorState を設定する
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, data, headers=None):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=UTF-8')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return {}
+        return json.loads(self.rfile.read(length).decode('utf-8'))
+
+    def do_GET(self):
+        self.dispatch('GET')
+
+    def do_POST(self):
+        self.dispatch('POST')
+
+    def do_PUT(self):
+        self.dispatch('PUT')
+
+    def dispatch(self, method):
+        url = urlparse(self.path)
+        path = unquote(url.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        body = self.read_json() if method in ('POST', 'PUT') else {}
+
+        # 計測用: 呼び出し回数とシートの中身 / 状態の初期化 (遅延・エラー注入の対象外)
+        if path == '/_emulator/stats':
+            return self.send_json(200, self.state.snapshot())
+        if path == '/_emulator/reset':
+            self.state.reset()
+            return self.send_json(200, {})
+
+        for route_method, pattern, name in ROUTES:
+            match = pattern.match(path)
+            if route_method == method and match:
+                break
+        else:
+            return self.send_json(404, EmulatorError(404, 'NOT_FOUND', f"{method} {path}").body())
+
+        options = self.state.options
+        delay = options['latency'] + self.state.random.uniform(0, options['latency_jitter'])
+        if delay > 0:
+            time.sleep(delay)
+
+        with self.state.lock:
+            self.state.count('requests')
+            self.state.count(name)
+            try:
+                self.state.inject_errors()
+                result = getattr(self, 'handle_' + name)(*match.groups(), query=query, body=body)
+            except EmulatorError as e:
+                self.state.count('errors')
+                return self.send_json(e.code, e.body(), e.headers)
+        self.send_json(200, result)
+
+    # --- 各API ---
+    def handle_drive_list(self, query, body):
+        title_match = re.search(r'name = "((?:[^"\\]|\\.)*)"', query.get('q', ''))
+        files = []
+        if title_match:
+            title = title_match.group(1)
+            spreadsheet = self.state.find_by_title(title)
+            if spreadsheet is None and self.state.options['auto_create']:
+                spreadsheet = Spreadsheet(title)
+                self.state.spreadsheets[spreadsheet.id] = spreadsheet
+            if spreadsheet is not None:
+                files.append(spreadsheet)
+        else:
+            files = list(self.state.spreadsheets.values())
+        return {
+            'kind': 'drive#fileList',
+            'files': [{
+                'id': spreadsheet.id,
+                'name': spreadsheet.title,
+                'mimeType': SHEETS_MIME_TYPE,
+                'createdTime': '2025-01-01T00:00:00.000Z',
+                'modifiedTime': '2025-01-01T00:00:00.000Z',
+            } for spreadsheet in files],
+        }
+
+    def handle_spreadsheet_get(self, spreadsheet_id, query, body):
+        return self.state.spreadsheet(spreadsheet_id).metadata()
+
+    def handle_batch_update(self, spreadsheet_id, query, body):
+        # batchUpdate は全体で1つのトランザクション: 1件でも失敗したら何も反映しない
+        spreadsheet = self.state.spreadsheet(spreadsheet_id)
+        requests = body.get('requests', [])
+        self.state.count('batch_requests', len(requests))
+        working = copy.deepcopy(spreadsheet)
+        replies = [working.apply(request) for request in requests]
+        self.state.spreadsheets[spreadsheet_id] = working
+        return {'spreadsheetId': spreadsheet_id, 'replies': replies}
+
+    def handle_values_update(self, spreadsheet_id, a1_range, query, body):
+        spreadsheet = self.state.spreadsheet(spreadsheet_id)
+        return spreadsheet.write_values(a1_range, body.get('values', []), query.get('valueInputOption', 'RAW'))
+
+    def handle_values_batch_update(self, spreadsheet_id, query, body):
+        spreadsheet = self.state.spreadsheet(spreadsheet_id)
+        responses = [spreadsheet.write_values(item['range'], item.get('values', []), body.get('valueInputOption', 'RAW'))
+                     for item in body.get('data', [])]
+        return {'spreadsheetId': spreadsheet_id, 'responses': responses}
+
+    def handle_values_clear(self, spreadsheet_id, a1_range, query, body):
+        return self.state.spreadsheet(spreadsheet_id).clear_values(a1_range)
+
+    def handle_values_batch_clear(self, spreadsheet_id, query, body):
+        spreadsheet = self.state.spreadsheet(spreadsheet_id)
+        for a1_range in body.get('ranges', []):
+            spreadsheet.clear_values(a1_range)
+        return {'spreadsheetId': spreadsheet_id, 'clearedRanges': body.get('ranges', [])}
+
+    def handle_values_get(self, spreadsheet_id, a1_range, query, body):
+        return self.state.spreadsheet(spreadsheet_id).read_values(a1_range)
+
+
+class SheetsEmulator:
+    # with SheetsEmulator(latency=0.2) as emulator: config['google_api']['endpoint'] = emulator.endpoint
+    def __init__(self, **options):
+        self.options = dict(DEFAULT_EMULATOR_OPTIONS)
+        self.options.update(options)
+        self.state = EmulatorState(self.options)
+        handler = type('BoundEmulatorHandler', (EmulatorHandler,), {'state': self.state})
+        self.server = ThreadingHTTPServer((self.options['host'], self.options['port']), handler)
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def endpoint(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def counters(self):
+        return self.state.snapshot()['counters']
+
+    def sheet_values(self, spreadsheet_title, sheet_title):
+        return self.state.snapshot()['spreadsheets'].get(spreadsheet_title, {}).get(sheet_title)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Sheets/Drive API emulator for offline tests")
+    arg_parser.add_argument('--host', default=DEFAULT_EMULATOR_OPTIONS['host'])
+    arg_parser.add_argument('--port', type=int, default=DEFAULT_EMULATOR_OPTIONS['port'])
+    arg_parser.add_argument('--latency', type=float, default=0.0, help="1回の呼び出しごとの遅延(秒)")
+    arg_parser.add_argument('--latency-jitter', type=float, default=0.0)
+    arg_parser.add_argument('--error-rate-429', type=float, default=0.0)
+    arg_parser.add_argument('--error-rate-503', type=float, default=0.0)
+    arg_parser.add_argument('--quota-per-minute', type=int, default=None)
+    arg_parser.add_argument('--retry-after', type=int, default=DEFAULT_EMULATOR_OPTIONS['retry_after'])
+    arg_parser.add_argument('--seed', type=int, default=None)
+    args = arg_parser.parse_args()
+
+    emulator = SheetsEmulator(**{key: value for key, value in vars(args).items()})
+    print(f"Sheets API emulator: {emulator.endpoint}  (統計: {emulator.endpoint}/_emulator/stats)")
+    try:
+        emulator.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        emulator.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
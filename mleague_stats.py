@@ -0,0 +1,443 @@
+import bisect
+import hashlib
+import json
+import math
+import os
+import tempfile
+from array import array
+
+from mleague_store import as_player_data
+
+# 1回の実行で1度だけ集計し、各シート・HTML生成で共有する集計エンジン
+# 選手名・チーム名・試合名は整数IDに置き換え、値は array の列で持つ
+# 集計結果はスナップショットとして保存でき、新しい試合だけを差分として適用できる
+
+RANKS = (1, 2, 3, 4)
+# スナップショットには行ごとの列 (row_title / row_player / row_score) を保存しない (試合数に比例して大きくなるため。必要なときに試合データから作り直す)
+SNAPSHOT_VERSION = 1
+
+
+class NameTable:
+    # 名前 <-> 整数ID (登場順に採番)
+    def __init__(self, names=()):
+        self.names = []
+        self.index = {}
+        for name in names:
+            self.intern(name)
+
+    def intern(self, name):
+        name_id = self.index.get(name)
+        if name_id is None:
+            name_id = len(self.names)
+            self.index[name] = name_id
+            self.names.append(name)
+        return name_id
+
+    def get(self, name):
+        return self.index.get(name)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.index
+
+
+def draft_key(draft_teams):
+    # ドラフト構成が変わったらスナップショットは使えない
+    payload = json.dumps(draft_teams, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class RunStats:
+    def __init__(self, player_data, draft_teams):
+        self.draft_teams = draft_teams
+        self.draft_key = draft_key(draft_teams)
+
+        self.teams = NameTable(draft_teams.keys())
+        self.players = NameTable()
+        self.titles = NameTable()
+        self.row_count = 0
+
+        # 選手ごとの列
+        self.player_team = array('i')
+        self.total_score = array('d')
+        self.game_count = array('i')
+        self.rank_sum = array('i')
+        self.rank_counts = array('i')   # 選手ID * 4 + (順位 - 1)
+        self.day_diff = array('d')
+
+        # 行ごとの列 (ドラフト構成によらない。別リーグへの射影 project() と選手の推移に使う)
+        # スナップショットには保存しないので、読み込んだ後は ensure_rows() で試合データから作り直す
+        self.row_title = array('i')
+        self.row_player = array('i')
+        self.row_score = array('d')
+        self.rows_complete = True
+
+        # 試合ごとの列
+        self.title_dates = []
+        self.title_team_scores = array('d')   # 試合ID * チーム数 + チームID
+        self.title_has_team = array('b')
+        self.last_date = None
+
+        # 試合名順のチーム累計 (開幕前を0とした値)
+        self.sorted_titles = []
+        self.sorted_names = []                # sorted_titles と同じ並びの試合名 (二分探索用)
+        self.sorted_cumulative = array('d')   # 並び順 * チーム数 + チームID
+
+        # チームごとの列
+        self.team_totals = array('d', [0.0] * len(self.teams))
+        self.team_day_diffs = array('d', [0.0] * len(self.teams))
+
+        # 選手 -> 最初に見つかったチーム
+        self._first_team = {}
+        for team, members in draft_teams.items():
+            for member in members:
+                self._first_team.setdefault(member, self.teams.get(team))
+
+        self.apply(player_data)
+
+    def _add_player(self, name):
+        player_id = self.players.intern(name)
+        if player_id == len(self.player_team):
+            self.player_team.append(self._first_team.get(name, -1))
+            self.total_score.append(0.0)
+            self.game_count.append(0)
+            self.rank_sum.append(0)
+            self.rank_counts.extend((0, 0, 0, 0))
+            self.day_diff.append(0.0)
+        return player_id
+
+    def _add_title(self, title):
+        title_id = self.titles.intern(title)
+        if title_id == len(self.title_has_team):
+            self.title_dates.append(title.split(' ')[0])
+            self.title_team_scores.extend([0.0] * len(self.teams))
+            self.title_has_team.append(0)
+        return title_id
+
+    def apply(self, player_data):
+        # 新しい行だけを反映する (全件集計も空の状態からの apply と同じ)
+        # 計算量は追加行数 + 影響を受ける累計系列の末尾 + チーム人数 程度
+        player_data = as_player_data(player_data)
+        team_count = len(self.teams)
+        known_titles = len(self.titles)
+        touched_titles = set()
+        new_rows = []
+
+        # --- 1回の走査で選手別合計・順位分布・試合ごとのチーム得点を集計 ---
+        for game_title, player_name, score, rank in player_data:
+            title_id = self._add_title(game_title)
+            player_id = self._add_player(player_name)
+            new_rows.append((title_id, player_id, score))
+            if self.rows_complete:
+                self.row_title.append(title_id)
+                self.row_player.append(player_id)
+                self.row_score.append(score)
+
+            self.total_score[player_id] += score
+            self.game_count[player_id] += 1
+            self.rank_sum[player_id] += rank
+            if rank in RANKS:
+                self.rank_counts[player_id * 4 + rank - 1] += 1
+
+            team_id = self.player_team[player_id]
+            if team_id >= 0:
+                self.title_team_scores[title_id * team_count + team_id] += score
+                self.title_has_team[title_id] = 1
+                touched_titles.add(title_id)
+        self.row_count += len(new_rows)
+
+        # 試合に出ていないドラフト選手も0件として持つ
+        for members in self.draft_teams.values():
+            for member in members:
+                self._add_player(member)
+
+        # --- 直近日の差分 (最新日が進んだらリセット) ---
+        new_dates = [self.title_dates[title_id] for title_id in range(known_titles, len(self.titles))]
+        if new_dates:
+            latest = max(new_dates)
+            if self.last_date is None or latest > self.last_date:
+                self.last_date = latest
+                for player_id in range(len(self.day_diff)):
+                    self.day_diff[player_id] = 0.0
+        for title_id, player_id, score in new_rows:
+            if self.title_dates[title_id] == self.last_date:
+                self.day_diff[player_id] += score
+
+        # --- 試合名順の累計系列 (変わった位置から末尾だけ再計算) ---
+        start = len(self.sorted_titles)
+        for title_id in range(known_titles, len(self.titles)):
+            position = bisect.bisect_right(self.sorted_names, self.titles.names[title_id])
+            self.sorted_names.insert(position, self.titles.names[title_id])
+            self.sorted_titles.insert(position, title_id)
+            start = min(start, position)
+        for title_id in touched_titles:
+            # 試合名は重複しないので bisect_left がそのまま並び順の位置になる
+            start = min(start, bisect.bisect_left(self.sorted_names, self.titles.names[title_id]))
+        self._rebuild_cumulative(start)
+        self._update_team_totals()
+        return self
+
+    def _update_team_totals(self):
+        # --- チーム合計 (ドラフト順に選手合計を足す) ---
+        for team, members in self.draft_teams.items():
+            team_id = self.teams.get(team)
+            self.team_totals[team_id] = 0.0
+            self.team_day_diffs[team_id] = 0.0
+            for member in members:
+                player_id = self.players.get(member)
+                self.team_totals[team_id] += self.total_score[player_id]
+                self.team_day_diffs[team_id] += self.day_diff[player_id]
+
+    def ensure_rows(self, player_data=None):
+        # 行ごとの列がなければ (スナップショットから読み込んだ集計) 試合データから作り直す
+        # player_data は集計に使ったのと同じ行 (メモリ上のリストでも mleague_store.ResultsStore でもよい)
+        if self.rows_complete:
+            return self
+        if player_data is None:
+            raise ValueError("スナップショットから読み込んだ集計には行ごとの列がありません。試合データを渡してください。")
+        row_title, row_player, row_score = array('i'), array('i'), array('d')
+        for game_title, player_name, score, _ in as_player_data(player_data):
+            title_id = self.titles.get(game_title)
+            player_id = self.players.get(player_name)
+            if title_id is None or player_id is None:
+                raise ValueError(f"集計にない行です: {game_title} {player_name}")
+            row_title.append(title_id)
+            row_player.append(player_id)
+            row_score.append(score)
+        if len(row_title) != self.row_count:
+            raise ValueError(f"行数が集計と一致しません: {len(row_title)} != {self.row_count}")
+        self.row_title, self.row_player, self.row_score = row_title, row_player, row_score
+        self.rows_complete = True
+        return self
+
+    def project(self, draft_teams, player_data=None):
+        # 同じ試合データを別のドラフト構成で見た集計を返す (文字列処理はしない)
+        # 選手別の列はそのまま使い、チームに関わる列だけを行ごとの列から作り直す
+        # スナップショットから読み込んだ集計なら player_data から行ごとの列を作ってから射影する
+        # 結果は compute_stats(同じ行, draft_teams) と同じになる
+        self.ensure_rows(player_data)
+        stats = RunStats([], draft_teams)
+        stats.row_count = self.row_count
+        stats.last_date = self.last_date
+        stats.titles = NameTable(self.titles.names)
+        stats.title_dates = list(self.title_dates)
+        stats.sorted_titles = list(self.sorted_titles)
+        stats.sorted_names = list(self.sorted_names)
+
+        # 試合に出た選手だけを引き継ぎ、0試合の選手は新しいドラフトの分だけ後から足す
+        stats.players = NameTable()
+        for column in (stats.player_team, stats.total_score, stats.game_count, stats.rank_sum, stats.rank_counts, stats.day_diff):
+            del column[:]
+        player_ids = array('i', [-1] * len(self.players))
+        for player_id, name in enumerate(self.players.names):
+            if self.game_count[player_id] == 0:
+                continue
+            new_id = stats._add_player(name)
+            player_ids[player_id] = new_id
+            stats.total_score[new_id] = self.total_score[player_id]
+            stats.game_count[new_id] = self.game_count[player_id]
+            stats.rank_sum[new_id] = self.rank_sum[player_id]
+            stats.rank_counts[new_id * 4:new_id * 4 + 4] = self.rank_counts[player_id * 4:player_id * 4 + 4]
+            stats.day_diff[new_id] = self.day_diff[player_id]
+        for members in draft_teams.values():
+            for member in members:
+                stats._add_player(member)
+
+        team_count = len(stats.teams)
+        stats.title_team_scores = array('d', [0.0]) * (len(stats.titles) * team_count)
+        stats.title_has_team = array('b', [0]) * len(stats.titles)
+        for title_id, player_id, score in zip(self.row_title, self.row_player, self.row_score):
+            new_id = player_ids[player_id]
+            stats.row_title.append(title_id)
+            stats.row_player.append(new_id)
+            stats.row_score.append(score)
+            team_id = stats.player_team[new_id]
+            if team_id >= 0:
+                stats.title_team_scores[title_id * team_count + team_id] += score
+                stats.title_has_team[title_id] = 1
+
+        stats._rebuild_cumulative(0)
+        stats._update_team_totals()
+        return stats
+
+    def _rebuild_cumulative(self, start):
+        team_count = len(self.teams)
+        del self.sorted_cumulative[start * team_count:]
+        if start > 0:
+            cumulative = list(self.sorted_cumulative[(start - 1) * team_count:start * team_count])
+        else:
+            cumulative = [0.0] * team_count
+        for title_id in self.sorted_titles[start:]:
+            base = title_id * team_count
+            for team_id in range(team_count):
+                cumulative[team_id] += self.title_team_scores[base + team_id]
+            self.sorted_cumulative.extend(cumulative)
+
+    # --- 参照用 ---
+    def player(self, name):
+        player_id = self.players.get(name)
+        if player_id is None:
+            return {'total_score': 0.0, 'game_count': 0, 'rank_sum': 0, 'day_diff': 0.0,
+                    'ranks': {rank: 0 for rank in RANKS}}
+        base = player_id * 4
+        return {
+            'total_score': self.total_score[player_id],
+            'game_count': self.game_count[player_id],
+            'rank_sum': self.rank_sum[player_id],
+            'day_diff': self.day_diff[player_id],
+            'ranks': {rank: self.rank_counts[base + rank - 1] for rank in RANKS},
+        }
+
+    def avg_rank(self, name):
+        player_id = self.players.get(name)
+        if player_id is None or self.game_count[player_id] == 0:
+            return 0
+        return self.rank_sum[player_id] / self.game_count[player_id]
+
+    def team_of(self, name):
+        player_id = self.players.get(name)
+        if player_id is None or self.player_team[player_id] < 0:
+            return None
+        return self.teams.names[self.player_team[player_id]]
+
+    def team_total(self, team):
+        return self.team_totals[self.teams.get(team)]
+
+    def team_day_diff(self, team):
+        return self.team_day_diffs[self.teams.get(team)]
+
+    def team_history(self, initial=None, team_games_only=False):
+        # 試合名順の、試合ごとのチーム累計スコア [(試合名, [チーム順の累計]), ...]
+        team_count = len(self.teams)
+        offset = list(initial) if initial is not None else [0.0] * team_count
+        history = []
+        for position, title_id in enumerate(self.sorted_titles):
+            if team_games_only and not self.title_has_team[title_id]:
+                continue
+            base = position * team_count
+            cumulative = [offset[k] + self.sorted_cumulative[base + k] for k in range(team_count)]
+            history.append((self.titles.names[title_id], cumulative))
+        return history
+
+    # --- スナップショット ---
+    def to_snapshot(self):
+        return {
+            'version': SNAPSHOT_VERSION,
+            'draft_key': self.draft_key,
+            'row_count': self.row_count,
+            'last_date': self.last_date,
+            'teams': self.teams.names,
+            'players': self.players.names,
+            'titles': self.titles.names,
+            'player_team': self.player_team.tolist(),
+            'total_score': self.total_score.tolist(),
+            'game_count': self.game_count.tolist(),
+            'rank_sum': self.rank_sum.tolist(),
+            'rank_counts': self.rank_counts.tolist(),
+            'day_diff': self.day_diff.tolist(),
+            'title_team_scores': self.title_team_scores.tolist(),
+            'title_has_team': self.title_has_team.tolist(),
+            'sorted_titles': self.sorted_titles,
+            'sorted_cumulative': self.sorted_cumulative.tolist(),
+            'team_totals': self.team_totals.tolist(),
+            'team_day_diffs': self.team_day_diffs.tolist(),
+        }
+
+    @classmethod
+    def from_snapshot(cls, snapshot, draft_teams):
+        stats = cls([], draft_teams)
+        stats.row_count = snapshot['row_count']
+        stats.last_date = snapshot['last_date']
+        stats.players = NameTable(snapshot['players'])
+        stats.titles = NameTable(snapshot['titles'])
+        stats.title_dates = [title.split(' ')[0] for title in stats.titles.names]
+        stats.player_team = array('i', snapshot['player_team'])
+        stats.total_score = array('d', snapshot['total_score'])
+        stats.game_count = array('i', snapshot['game_count'])
+        stats.rank_sum = array('i', snapshot['rank_sum'])
+        stats.rank_counts = array('i', snapshot['rank_counts'])
+        stats.day_diff = array('d', snapshot['day_diff'])
+        stats.rows_complete = False
+        stats.title_team_scores = array('d', snapshot['title_team_scores'])
+        stats.title_has_team = array('b', snapshot['title_has_team'])
+        stats.sorted_titles = list(snapshot['sorted_titles'])
+        stats.sorted_names = [stats.titles.names[title_id] for title_id in stats.sorted_titles]
+        stats.sorted_cumulative = array('d', snapshot['sorted_cumulative'])
+        stats.team_totals = array('d', snapshot['team_totals'])
+        stats.team_day_diffs = array('d', snapshot['team_day_diffs'])
+        return stats
+
+
+def compute_stats(player_data, draft_teams):
+    return RunStats(player_data, draft_teams)
+
+
+def save_snapshot(stats, path, season=None):
+    # season は集計した試合のシーズン (config の season_start_year。シーズンが替わったら使わない)
+    snapshot = stats.to_snapshot()
+    snapshot['season'] = season
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def load_snapshot(path, draft_teams, expected_rows=None, season=None):
+    # 使えないスナップショット (無い・版違い・シーズン違い・ドラフト変更・件数不一致) なら None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if snapshot.get('version') != SNAPSHOT_VERSION or snapshot.get('draft_key') != draft_key(draft_teams):
+        return None
+    if season is not None and snapshot.get('season') != season:
+        return None
+    if expected_rows is not None and snapshot.get('row_count') != expected_rows:
+        return None
+    return RunStats.from_snapshot(snapshot, draft_teams)
+
+
+def verify_stats(stats, player_data, draft_teams):
+    # 全件から集計し直してスナップショット由来の集計と比較する。不一致の説明のリストを返す
+    fresh = compute_stats(player_data, draft_teams)
+    mismatches = []
+
+    def close(a, b):
+        return math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-6)
+
+    if stats.row_count != fresh.row_count:
+        mismatches.append(f"行数: {stats.row_count} != {fresh.row_count}")
+    if stats.last_date != fresh.last_date:
+        mismatches.append(f"最新日: {stats.last_date} != {fresh.last_date}")
+
+    for name in set(stats.players.names) | set(fresh.players.names):
+        a, b = stats.player(name), fresh.player(name)
+        if a['game_count'] != b['game_count'] or a['rank_sum'] != b['rank_sum'] or a['ranks'] != b['ranks']:
+            mismatches.append(f"選手 {name}: 出場数・順位が一致しません")
+        if not close(a['total_score'], b['total_score']) or not close(a['day_diff'], b['day_diff']):
+            mismatches.append(f"選手 {name}: スコアが一致しません")
+
+    for team in draft_teams.keys():
+        if not close(stats.team_total(team), fresh.team_total(team)) or not close(stats.team_day_diff(team), fresh.team_day_diff(team)):
+            mismatches.append(f"チーム {team}: 合計が一致しません")
+
+    history_a = stats.team_history()
+    history_b = fresh.team_history()
+    if [t for t, _ in history_a] != [t for t, _ in history_b]:
+        mismatches.append("累計系列: 試合の並びが一致しません")
+    else:
+        for (title, a), (_, b) in zip(history_a, history_b):
+            if not all(close(x, y) for x, y in zip(a, b)):
+                mismatches.append(f"累計系列: {title} の値が一致しません")
+                break
+
+    return mismatches
@@ -0,0 +1,160 @@
+import sqlite3
+from datetime import datetime
+
+from mleague_dedup import group_games, latest_games, make_game_id
+
+# 試合の主キーは試合の枠 (日付, 回戦) から作る試合ID (mleague_dedup.make_game_id)
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS seasons (
+    season      INTEGER PRIMARY KEY,
+    updated_at  TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS games (
+    game_id     TEXT PRIMARY KEY,
+    season      INTEGER NOT NULL REFERENCES seasons(season),
+    date        TEXT NOT NULL,
+    title       TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS player_results (
+    game_id     TEXT NOT NULL REFERENCES games(game_id) ON DELETE CASCADE,
+    player      TEXT NOT NULL,
+    score       REAL NOT NULL,
+    rank        INTEGER NOT NULL,
+    PRIMARY KEY (game_id, player)
+);
+CREATE INDEX IF NOT EXISTS idx_games_date ON games(date);
+CREATE INDEX IF NOT EXISTS idx_games_season_date ON games(season, date);
+CREATE INDEX IF NOT EXISTS idx_player_results_player ON player_results(player);
+"""
+
+# [試合名, 選手名, スコア, 順位] の並びで返すための共通SELECT
+SELECT_ROWS = """
+SELECT g.title, r.player, r.score, r.rank
+FROM player_results r JOIN games g ON g.game_id = r.game_id
+"""
+ORDER_ROWS = " ORDER BY g.title, g.game_id, r.rank"
+
+
+class ResultsStore:
+    def __init__(self, path, season=None):
+        # season は as_player_data(store) でシーズンを指定しなかったときに使うシーズン (通常は config の season_start_year)
+        self.path = path
+        self.season = season
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # --- 書き込み ---
+    def upsert_player_data(self, player_data, season):
+        # [試合名, 選手名, スコア, 順位] の行リストを試合ごとにまとめて書き込む
+        games = ((make_game_id(title, rows), title, rows) for title, rows in group_games(player_data))
+        return self.upsert_games(games, season)
+
+    def upsert_games(self, games, season, replace=False):
+        # games: (試合ID, 試合名, 行) の並び。同じ試合を何度書き込んでも結果は変わらない (冪等)
+        # 既にある試合は選手の行を入れ替える (スコアの修正)。同じ試合IDが複数あれば後のものを使う
+        # replace=True ならそのシーズンの既存の試合を消してから書き込む (同じトランザクション内)
+        now = datetime.now().strftime('%Y/%m/%d %H:%M:%S')
+        game_rows = []
+        result_rows = []
+        for game_id, game_title, rows in latest_games(games):
+            game_rows.append((game_id, season, game_title.split(' ')[0], game_title))
+            for _, player_name, score, rank in rows:
+                result_rows.append((game_id, player_name, score, rank))
+
+        with self.conn:
+            if replace:
+                self.conn.execute("DELETE FROM games WHERE season = ?", (season,))
+            self.conn.execute(
+                "INSERT INTO seasons (season, updated_at) VALUES (?, ?) "
+                "ON CONFLICT(season) DO UPDATE SET updated_at = excluded.updated_at",
+                (season, now),
+            )
+            self.conn.executemany(
+                "INSERT INTO games (game_id, season, date, title) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(game_id) DO UPDATE SET season = excluded.season, date = excluded.date, title = excluded.title",
+                game_rows,
+            )
+            self.conn.executemany(
+                "DELETE FROM player_results WHERE game_id = ?",
+                [(game_id,) for game_id, _, _, _ in game_rows],
+            )
+            self.conn.executemany(
+                "INSERT INTO player_results (game_id, player, score, rank) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(game_id, player) DO UPDATE SET score = excluded.score, rank = excluded.rank",
+                result_rows,
+            )
+        return len(game_rows)
+
+    # --- 読み込み ---
+    def count_games(self, season=None):
+        if season is None:
+            return self.conn.execute("SELECT COUNT(*) FROM games").fetchone()[0]
+        return self.conn.execute("SELECT COUNT(*) FROM games WHERE season = ?", (season,)).fetchone()[0]
+
+    def game_ids(self, season=None):
+        if season is None:
+            return [row[0] for row in self.conn.execute("SELECT game_id FROM games")]
+        return [row[0] for row in self.conn.execute("SELECT game_id FROM games WHERE season = ?", (season,))]
+
+    def seasons(self):
+        return [row[0] for row in self.conn.execute("SELECT season FROM seasons ORDER BY season")]
+
+    def all_player_data(self, season=None):
+        if season is None:
+            rows = self.conn.execute(SELECT_ROWS + ORDER_ROWS)
+        else:
+            rows = self.conn.execute(SELECT_ROWS + " WHERE g.season = ?" + ORDER_ROWS, (season,))
+        return [list(row) for row in rows]
+
+    def default_season(self):
+        # バックフィルで複数シーズンが入っていると、シーズンを決めずに全件を集計すると混ざってしまう
+        if self.season is not None:
+            return self.season
+        seasons = self.seasons()
+        if len(seasons) > 1:
+            raise ValueError(f"データベースに複数のシーズン ({seasons[0]}〜{seasons[-1]}) があります。シーズンを指定してください。")
+        return seasons[0] if seasons else None
+
+    def season_results(self, season):
+        return self.all_player_data(season)
+
+    def player_results(self, player_name, season=None):
+        if season is None:
+            rows = self.conn.execute(SELECT_ROWS + " WHERE r.player = ?" + ORDER_ROWS, (player_name,))
+        else:
+            rows = self.conn.execute(SELECT_ROWS + " WHERE r.player = ? AND g.season = ?" + ORDER_ROWS, (player_name, season))
+        return [list(row) for row in rows]
+
+    def results_on(self, date):
+        # date は "2025/10/05" 形式
+        rows = self.conn.execute(SELECT_ROWS + " WHERE g.date = ?" + ORDER_ROWS, (date,))
+        return [list(row) for row in rows]
+
+    def results_between(self, start_date, end_date):
+        rows = self.conn.execute(SELECT_ROWS + " WHERE g.date BETWEEN ? AND ?" + ORDER_ROWS, (start_date, end_date))
+        return [list(row) for row in rows]
+
+
+def as_player_data(source, season=None):
+    # シート作成・HTML生成はメモリ上のリストでも ResultsStore でも受け取れる
+    # ResultsStore でシーズンを省いたら、ストアの既定のシーズン (default_season) の行だけを返す
+    if isinstance(source, ResultsStore):
+        if season is None:
+            season = source.default_season()
+        return source.all_player_data(season)
+    return source
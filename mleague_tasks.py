@@ -0,0 +1,64 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# 依存関係つきのタスクを上限つきスレッドプールで実行する小さなスケジューラ
+# 依存先がすべて終わったタスクから順に並列で走らせ、失敗はタスクごとに記録して他のタスクは続ける
+
+
+class DependencyFailed(Exception):
+    def __init__(self, task_name, failed):
+        super().__init__(f"{task_name}: 依存するタスクが失敗しました ({', '.join(failed)})")
+        self.failed = failed
+
+
+class TaskGraph:
+    def __init__(self, max_workers=4):
+        self.max_workers = max_workers
+        self.tasks = {}      # タスク名 -> (関数, 依存タスク名, 依存先が失敗しても実行するか)
+        self.results = {}
+        self.errors = {}
+        self.durations = {}
+
+    def add(self, name, func, deps=(), always=False):
+        for dep in deps:
+            if dep not in self.tasks:
+                raise ValueError(f"{name}: 未登録のタスク {dep} に依存しています")
+        self.tasks[name] = (func, tuple(deps), always)
+        return name
+
+    def _run_task(self, name, func):
+        started = time.perf_counter()
+        try:
+            return func()
+        finally:
+            self.durations[name] = time.perf_counter() - started
+
+    def run(self):
+        # すべてのタスクが終わるまで待ち、(結果, エラー) の辞書を返す
+        remaining = dict(self.tasks)
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while remaining or running:
+                for name, (func, deps, always) in list(remaining.items()):
+                    if any(dep in remaining or dep in running.values() for dep in deps):
+                        continue
+                    del remaining[name]
+                    failed = [dep for dep in deps if dep in self.errors]
+                    if failed and not always:
+                        self.errors[name] = DependencyFailed(name, failed)
+                        continue
+                    running[executor.submit(self._run_task, name, func)] = name
+
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        self.results[name] = future.result()
+                    except Exception as e:
+                        self.errors[name] = e
+        return self.results, self.errors
+
+    def succeeded(self, name):
+        return name in self.results
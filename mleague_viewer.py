@@ -1,75 +1,33 @@
+import base64
+import gzip
+import hashlib
 import json
 import os
+import re
+import sys
+import tempfile
+from array import array
 from datetime import datetime, timedelta
-from collections import defaultdict
-
-def generate_html(all_player_data, draft_teams, team_colors):
-    # --- 1. データ集計 (最終スコア & 直近日差分) ---
-    player_stats = defaultdict(lambda: {'total_score': 0.0, 'game_count': 0, 'rank_sum': 0, 'day_diff': 0.0})
-    team_totals = defaultdict(float)
-    team_day_diffs = defaultdict(float)
-
-    # 日付リストを取得して最新の日付を特定
-    all_dates = sorted(list(set([d[0].split(' ')[0] for d in all_player_data])))
-    last_date = all_dates[-1] if all_dates else None
-
-    for game_title, player_name, score, rank in all_player_data:
-        # トータル集計
-        player_stats[player_name]['total_score'] += score
-        player_stats[player_name]['game_count'] += 1
-        player_stats[player_name]['rank_sum'] += rank
-        
-        # 直近日差分集計
-        game_date = game_title.split(' ')[0]
-        if game_date == last_date:
-            player_stats[player_name]['day_diff'] += score
-
-    # チーム集計
-    for team, members in draft_teams.items():
-        for member in members:
-            team_totals[team] += player_stats[member]['total_score']
-            team_day_diffs[team] += player_stats[member]['day_diff']
-
-    sorted_teams = sorted(team_totals.items(), key=lambda x: x[1], reverse=True)
-    
-    # --- 2. 時系列データの作成 (グラフ用) ---
-    games_map = defaultdict(list)
-    for game_title, player_name, score, rank in all_player_data:
-        games_map[game_title].append({'name': player_name, 'score': score})
-    
-    history_dates = ['開幕前']
-    team_history = {team: [0.0] for team in draft_teams.keys()}
-    current_team_scores = {team: 0.0 for team in draft_teams.keys()}
-    
-    # 試合順に処理
-    for game_title, players in games_map.items():
-        history_dates.append(game_title.split(' ')[0])
-        
-        for p in players:
-            for team, members in draft_teams.items():
-                if p['name'] in members:
-                    current_team_scores[team] += p['score']
-                    break
-        
-        for team in draft_teams.keys():
-            team_history[team].append(round(current_team_scores[team], 1))
-
-    # --- 3. サンプルチーム用データ ---
-    all_players_info = []
-    for player_name, stats in player_stats.items():
-        all_players_info.append({
-            'name': player_name,
-            'score': round(stats['total_score'], 1)
-        })
-    all_players_info.sort(key=lambda x: x['score'], reverse=True)
-
-
-    # --- 4. HTML生成 ---
-    # 日本時間 (UTC+9)
-    jst_now = datetime.utcnow() + timedelta(hours=9)
-    now_str = jst_now.strftime('%Y/%m/%d %H:%M')
-    
-    html = f"""
+from html import escape
+from itertools import groupby
+
+import mleague_history
+from mleague_stats import compute_stats
+
+try:
+    import brotli   # 任意: 入っていなければ .br は作らない
+except ImportError:
+    brotli = None
+
+# ダッシュボード (index.html) の生成
+# 静的な部分 (CSS・JS・見出し) はモジュール読み込み時に1度だけ用意し、
+# チームカード・表の行だけを断片として作り、一時ファイルに順に書いてから置き換える
+# グラフとサンプルチームのデータは data/ 以下の JSON (ファイル名に内容のハッシュ) に分け、
+# 月ごとの推移は確定した月のファイル名が変わらないので、再訪問時は新しい月の分だけ取得される
+# 選手ごとの推移は 0.1点単位の整数の差分を Int16/Int32 のバイト列にして base64 で持たせ、ページ側で復元する
+
+# --- 静的な部分 ---
+PAGE_HEAD = """
 <!DOCTYPE html>
 <html lang="ja">
 <head>
@@ -79,111 +37,111 @@ def generate_html(all_player_data, draft_teams, team_colors):
     <script src="https://cdn.jsdelivr.net/npm/chart.js"></script>
     <link href="https://fonts.googleapis.com/css2?family=Nota+Sans+JP:wght@400;700&family=Roboto:wght@400;700&display=swap" rel="stylesheet">
     <style>
-        :root {{
+        :root {
             --bg-color: #121212;
             --card-bg: #1e1e1e;
             --text-main: #ffffff;
             --text-sub: #b0b0b0;
             --accent: #d4af37; /* Gold */
-        }}
-        body {{
+        }
+        body {
             font-family: 'Roboto', 'Noto Sans JP', sans-serif;
             background-color: var(--bg-color);
             color: var(--text-main);
             margin: 0;
             padding: 20px;
-        }}
-        .container {{
+        }
+        .container {
             max-width: 1200px;
             margin: 0 auto;
-        }}
-        header {{
+        }
+        header {
             text-align: center;
             margin-bottom: 40px;
             padding-bottom: 20px;
             border-bottom: 1px solid #333;
-        }}
-        h1 {{
+        }
+        h1 {
             font-size: 2.5rem;
             margin: 0;
             color: var(--accent);
-        }}
-        .timestamp {{
+        }
+        .timestamp {
             color: var(--text-sub);
             font-size: 0.9rem;
             margin-top: 5px;
-        }}
+        }
         
-        section {{
+        section {
             margin-bottom: 60px;
-        }}
-        h2 {{
+        }
+        h2 {
             border-left: 4px solid var(--accent);
             padding-left: 10px;
             margin-bottom: 20px;
-        }}
+        }
 
         /* チームランキング */
-        .rankings-grid {{
+        .rankings-grid {
             display: grid;
             grid-template-columns: repeat(auto-fit, minmax(280px, 1fr));
             gap: 20px;
-        }}
-        .team-card {{
+        }
+        .team-card {
             background-color: var(--card-bg);
             border-radius: 12px;
             padding: 20px;
             box-shadow: 0 4px 6px rgba(0,0,0,0.3);
             border-top: 4px solid transparent;
-        }}
-        .team-rank {{ font-size: 1.2rem; font-weight: bold; color: var(--text-sub); }}
-        .team-name {{ font-size: 1.5rem; font-weight: bold; margin: 10px 0; }}
-        .team-score {{ font-size: 2.5rem; font-weight: bold; text-align: right; }}
-        .team-diff {{ font-size: 1rem; text-align: right; margin-top: -5px; margin-bottom: 10px; }}
-        .team-members {{ margin-top: 15px; font-size: 0.9rem; color: var(--text-sub); border-top: 1px solid #333; padding-top: 10px; }}
+        }
+        .team-rank { font-size: 1.2rem; font-weight: bold; color: var(--text-sub); }
+        .team-name { font-size: 1.5rem; font-weight: bold; margin: 10px 0; }
+        .team-score { font-size: 2.5rem; font-weight: bold; text-align: right; }
+        .team-diff { font-size: 1rem; text-align: right; margin-top: -5px; margin-bottom: 10px; }
+        .team-members { margin-top: 15px; font-size: 0.9rem; color: var(--text-sub); border-top: 1px solid #333; padding-top: 10px; }
 
         /* グラフエリア */
-        .chart-container {{
+        .chart-container {
             background-color: var(--card-bg);
             border-radius: 12px;
             padding: 20px;
             height: 400px;
             position: relative;
-        }}
+        }
 
         /* 個人成績テーブル */
-        .table-container {{
+        .table-container {
             background-color: var(--card-bg);
             border-radius: 12px;
             padding: 20px;
             overflow-x: auto;
-        }}
-        table {{ width: 100%; border-collapse: collapse; white-space: nowrap; }}
-        th, td {{ padding: 12px 15px; text-align: left; border-bottom: 1px solid #333; }}
-        th {{ color: var(--accent); font-weight: bold; }}
-        tr:hover {{ background-color: #2a2a2a; }}
-        .positive {{ color: #4CAF50; }}
-        .negative {{ color: #FF5252; }}
-        .diff-text {{ font-size: 0.8rem; margin-left: 5px; }}
+        }
+        table { width: 100%; border-collapse: collapse; white-space: nowrap; }
+        th, td { padding: 12px 15px; text-align: left; border-bottom: 1px solid #333; }
+        th { color: var(--accent); font-weight: bold; }
+        tr:hover { background-color: #2a2a2a; }
+        .positive { color: #4CAF50; }
+        .negative { color: #FF5252; }
+        .diff-text { font-size: 0.8rem; margin-left: 5px; }
 
         /* サンプルチーム (My Team) */
-        .sample-team-container {{
+        .sample-team-container {
             background-color: var(--card-bg);
             border-radius: 12px;
             padding: 20px;
-        }}
-        .selectors-grid {{
+        }
+        .selectors-grid {
             display: grid;
             grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
             gap: 15px;
             margin-bottom: 20px;
-        }}
-        .selector-item {{
+        }
+        .selector-item {
             display: flex;
             flex-direction: column;
             gap: 5px;
-        }}
-        select {{
+        }
+        select {
             width: 100%;
             padding: 10px;
             background-color: #333;
@@ -191,29 +149,36 @@ def generate_html(all_player_data, draft_teams, team_colors):
             border: 1px solid #555;
             border-radius: 6px;
             font-size: 1rem;
-        }}
-        .player-score-display {{
+        }
+        .player-score-display {
             text-align: right;
             font-size: 0.9rem;
             min-height: 1.2em;
             font-weight: bold;
-        }}
-        .my-team-result {{
+        }
+        .my-team-result {
             text-align: center;
             border-top: 1px solid #444;
             padding-top: 20px;
-        }}
-        .my-total-label {{ font-size: 1.2rem; color: var(--text-sub); }}
-        .my-total-score {{ font-size: 3rem; font-weight: bold; color: var(--accent); }}
+        }
+        .my-total-label { font-size: 1.2rem; color: var(--text-sub); }
+        .my-team-chart {
+            height: 300px;
+            position: relative;
+            margin-top: 20px;
+        }
+        .my-total-score { font-size: 3rem; font-weight: bold; color: var(--accent); }
 
-        footer {{ text-align: center; margin-top: 40px; color: var(--text-sub); font-size: 0.8rem; }}
+        footer { text-align: center; margin-top: 40px; color: var(--text-sub); font-size: 0.8rem; }
     </style>
 </head>
 <body>
     <div class="container">
         <header>
             <h1>M-League Dashboard</h1>
-            <div class="timestamp">Last Updated: {now_str} (JST)</div>
+            <div class="timestamp">Last Updated: """
+
+HEADER_END = """ (JST)</div>
         </header>
 
         <!-- 1. チームランキング -->
@@ -222,35 +187,7 @@ def generate_html(all_player_data, draft_teams, team_colors):
             <div class="rankings-grid">
     """
 
-    for i, (team, score) in enumerate(sorted_teams, 1):
-        color_data = team_colors.get(team, {'red': 1, 'green': 1, 'blue': 1})
-        r, g, b = int(color_data['red']*255), int(color_data['green']*255), int(color_data['blue']*255)
-        border_color = f"rgb({r},{g},{b})"
-        
-        members_str = " / ".join(draft_teams.get(team, []))
-        score_class = "positive" if score >= 0 else "negative"
-        score_fmt = f"{score:+.1f}"
-
-        # 差分表示
-        diff = team_day_diffs[team]
-        if diff != 0:
-            diff_sign = "+" if diff > 0 else ""
-            diff_color = "#4CAF50" if diff > 0 else "#FF5252"
-            diff_html = f'<span style="color: {diff_color};">({last_date}: {diff_sign}{diff:.1f})</span>'
-        else:
-            diff_html = '<span style="color: #555;">(-)</span>'
-
-        html += f"""
-                <div class="team-card" style="border-top-color: {border_color};">
-                    <div class="team-rank">#{i}</div>
-                    <div class="team-name">{team}</div>
-                    <div class="team-score {score_class}">{score_fmt}</div>
-                    <div class="team-diff">{diff_html}</div>
-                    <div class="team-members">{members_str}</div>
-                </div>
-        """
-
-    html += """
+TABLE_START = """
             </div>
         </section>
 
@@ -281,59 +218,7 @@ def generate_html(all_player_data, draft_teams, team_colors):
                     <tbody>
     """
 
-    player_data_list = []
-    valid_players = set()
-    for players in draft_teams.values():
-        valid_players.update(players)
-
-    for player, stats in player_stats.items():
-        if player not in valid_players:
-            continue
-            
-        final_score = stats['total_score']
-        avg_rank = stats['rank_sum'] / stats['game_count'] if stats['game_count'] > 0 else 0
-        
-        team_name = "Unknown"
-        for t, members in draft_teams.items():
-            if player in members:
-                team_name = t
-                break
-        
-        player_data_list.append({
-            'name': player,
-            'team': team_name,
-            'score': final_score,
-            'diff': stats['day_diff'],
-            'games': stats['game_count'],
-            'avg_rank': avg_rank
-        })
-
-    player_data_list.sort(key=lambda x: x['score'], reverse=True)
-
-    for i, p in enumerate(player_data_list, 1):
-        score_class = "positive" if p['score'] >= 0 else "negative"
-        
-        # 個人差分
-        if p['diff'] != 0:
-            diff_sign = "+" if p['diff'] > 0 else ""
-            diff_color = "positive" if p['diff'] > 0 else "negative"
-            diff_html = f'<span class="{diff_color} diff-text">({diff_sign}{p["diff"]:.1f})</span>'
-        else:
-            diff_html = '<span style="color: #555; font-size: 0.8rem;">-</span>'
-
-        html += f"""
-                        <tr>
-                            <td>{i}</td>
-                            <td>{p['name']}</td>
-                            <td>{p['team']}</td>
-                            <td class="{score_class}">{p['score']:+.1f}</td>
-                            <td>{diff_html}</td>
-                            <td>{p['games']}</td>
-                            <td>{p['avg_rank']:.2f}</td>
-                        </tr>
-        """
-
-    html += """
+SAMPLE_TEAM_AND_SCRIPT_START = """
                     </tbody>
                 </table>
             </div>
@@ -366,6 +251,9 @@ def generate_html(all_player_data, draft_teams, team_colors):
                     <div class="my-total-label">Estimated Total Score</div>
                     <div class="my-total-score" id="myScore">0.0</div>
                 </div>
+                <div class="my-team-chart">
+                    <canvas id="myTeamChart"></canvas>
+                </div>
             </div>
         </section>
 
@@ -375,33 +263,91 @@ def generate_html(all_player_data, draft_teams, team_colors):
     </div>
 
     <script>
-        // --- データ埋め込み ---
+        // --- データ読み込み (ファイル名に内容のハッシュが入っているので、変わったファイルだけ取り直される) ---
     """
 
-    html += f"const labels = {json.dumps(history_dates, ensure_ascii=False)};\n"
-    html += "const datasets = [\n"
-    
-    for team, scores in team_history.items():
-        color_data = team_colors.get(team, {'red': 1, 'green': 1, 'blue': 1})
-        r, g, b = int(color_data['red']*255), int(color_data['green']*255), int(color_data['blue']*255)
-        
-        html += "{\n"
-        html += f"  label: '{team}',\n"
-        html += f"  data: {scores},\n"
-        html += f"  borderColor: 'rgba({r}, {g}, {b}, 1)',\n"
-        html += f"  backgroundColor: 'rgba({r}, {g}, {b}, 1)',\n"
-        html += "  borderWidth: 2,\n"
-        html += "  tension: 0.1,\n"
-        html += "  pointRadius: 0,\n"
-        html += "  pointHoverRadius: 5\n"
-        html += "},\n"
-    
-    html += "];\n"
-
-    html += f"const playerMap = {json.dumps(all_players_info, ensure_ascii=False)};\n"
-
-    html += """
+SCRIPT_END = """
+        async function loadJson(url) {
+            const response = await fetch(url);
+            if (!response.ok) {
+                throw new Error(`${url}: ${response.status}`);
+            }
+            return response.json();
+        }
+
+        async function loadDashboard() {
+            const [summary, ...chunks] = await Promise.all([manifest.summary, ...manifest.history].map(loadJson));
+
+            // 月ごとのデータをつなげて開幕前 (0) からの累計系列にする
+            const labels = ['開幕前'];
+            const series = summary.teams.map(() => [0.0]);
+            chunks.forEach(chunk => {
+                chunk.labels.forEach(label => labels.push(label));
+                chunk.series.forEach((values, i) => values.forEach(value => series[i].push(value)));
+            });
+            const datasets = summary.teams.map((team, i) => ({
+                label: team.label,
+                data: series[i],
+                borderColor: `rgba(${team.color.join(', ')}, 1)`,
+                backgroundColor: `rgba(${team.color.join(', ')}, 1)`,
+                borderWidth: 2,
+                tension: 0.1,
+                pointRadius: 0,
+                pointHoverRadius: 5
+            }));
+
+            drawChart(labels, datasets);
+
+            // 選手ごとの推移 (0.1点単位の整数)。その月に点の動きがない選手はチャンクに含まれない
+            playerTenths = new Map();
+            let length = 1;
+            chunks.forEach(chunk => {
+                const count = chunk.labels.length;
+                const deltas = decodeDeltas(chunk.players, count);
+                deltas.forEach((_, name) => {
+                    if (!playerTenths.has(name)) {
+                        playerTenths.set(name, new Array(length).fill(0));
+                    }
+                });
+                playerTenths.forEach((values, name) => {
+                    const playerDeltas = deltas.get(name);
+                    let value = values[values.length - 1];
+                    for (let j = 0; j < count; j++) {
+                        value += playerDeltas ? playerDeltas[j] : 0;
+                        values.push(value);
+                    }
+                });
+                length += count;
+            });
+            historyLabels = labels;
+
+            fillPlayerSelects(summary.players);
+            drawMyTeamChart();
+        }
+
+        // base64 のバイト列 (リトルエンディアンの Int16 / Int32) を選手ごとの差分 Map(名前 -> [差分]) に戻す
+        function decodeDeltas(packed, count) {
+            const binary = atob(packed.deltas);
+            const bytes = new Uint8Array(binary.length);
+            for (let i = 0; i < binary.length; i++) {
+                bytes[i] = binary.charCodeAt(i);
+            }
+            const view = new DataView(bytes.buffer);
+            const size = packed.type === 'i16' ? 2 : 4;
+            const result = new Map();
+            packed.names.forEach((name, i) => {
+                const deltas = new Array(count);
+                for (let j = 0; j < count; j++) {
+                    const offset = (i * count + j) * size;
+                    deltas[j] = size === 2 ? view.getInt16(offset, true) : view.getInt32(offset, true);
+                }
+                result.set(name, deltas);
+            });
+            return result;
+        }
+
         // --- グラフ描画 ---
+        function drawChart(labels, datasets) {
         const ctx = document.getElementById('historyChart').getContext('2d');
         new Chart(ctx, {
             type: 'line',
@@ -433,6 +379,7 @@ def generate_html(all_player_data, draft_teams, team_colors):
                 }
             }
         });
+        }
 
         // --- サンプルチーム計算 ---
         const selects = [
@@ -449,6 +396,7 @@ def generate_html(all_player_data, draft_teams, team_colors):
         ];
 
         // セレクトボックス初期化 (名前だけ表示、スコアは隠す)
+        function fillPlayerSelects(playerMap) {
         playerMap.forEach(p => {
             const optionText = p.name; 
             selects.forEach(sel => {
@@ -458,6 +406,88 @@ def generate_html(all_player_data, draft_teams, team_colors):
                 sel.appendChild(opt);
             });
         });
+        }
+
+        // --- サンプルチームの推移グラフ (選んだ選手とチーム合計) ---
+        let playerTenths = null;
+        let historyLabels = [];
+        let myTeamChart = null;
+        const MY_TEAM_COLORS = ['#4FC3F7', '#FFB74D', '#BA68C8', '#81C784'];
+
+        function drawMyTeamChart() {
+            if (playerTenths === null) {
+                return;
+            }
+            const datasets = [];
+            const total = new Array(historyLabels.length).fill(0);
+            selects.forEach((sel, index) => {
+                if (sel.selectedIndex <= 0) {
+                    return;
+                }
+                const name = sel.options[sel.selectedIndex].textContent;
+                const tenths = playerTenths.get(name) || new Array(historyLabels.length).fill(0);
+                tenths.forEach((value, j) => { total[j] += value; });
+                datasets.push({
+                    label: name,
+                    data: tenths.map(value => value / 10),
+                    borderColor: MY_TEAM_COLORS[index],
+                    backgroundColor: MY_TEAM_COLORS[index],
+                    borderWidth: 1,
+                    tension: 0.1,
+                    pointRadius: 0,
+                    pointHoverRadius: 4
+                });
+            });
+            if (datasets.length > 0) {
+                datasets.unshift({
+                    label: 'My Team',
+                    data: total.map(value => value / 10),
+                    borderColor: '#fff',
+                    backgroundColor: '#fff',
+                    borderWidth: 3,
+                    tension: 0.1,
+                    pointRadius: 0,
+                    pointHoverRadius: 5
+                });
+            }
+
+            if (myTeamChart !== null) {
+                myTeamChart.data.datasets = datasets;
+                myTeamChart.update();
+                return;
+            }
+            myTeamChart = new Chart(document.getElementById('myTeamChart').getContext('2d'), {
+                type: 'line',
+                data: {
+                    labels: historyLabels,
+                    datasets: datasets
+                },
+                options: {
+                    responsive: true,
+                    maintainAspectRatio: false,
+                    animation: false,
+                    interaction: {
+                        mode: 'index',
+                        intersect: false,
+                    },
+                    scales: {
+                        y: {
+                            grid: { color: '#333' },
+                            ticks: { color: '#aaa' }
+                        },
+                        x: {
+                            grid: { display: false },
+                            ticks: { color: '#aaa' }
+                        }
+                    },
+                    plugins: {
+                        legend: {
+                            labels: { color: '#fff' }
+                        }
+                    }
+                }
+            });
+        }
 
         function calculateMyTeam() {
             let total = 0.0;
@@ -484,16 +514,292 @@ def generate_html(all_player_data, draft_teams, team_colors):
             } else {
                 totalDisplay.style.color = '#FF5252';
             }
+            drawMyTeamChart();
         }
+
+        loadDashboard().catch(error => {
+            console.error('データの読み込みに失敗しました:', error);
+            // ファイルを直接開いた (file://) ときはブラウザが data/ の読み込みを許可しない
+            const message = location.protocol === 'file:'
+                ? 'グラフのデータを読み込めません。ローカルで確認するときは python -m http.server で配信してください。'
+                : 'グラフのデータを読み込めませんでした。';
+            document.querySelectorAll('.chart-container').forEach(container => { container.textContent = message; });
+        });
     </script>
 </body>
 </html>
     """
 
-    output_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'index.html')
-    with open(output_path, 'w', encoding='utf-8') as f:
-        f.write(html)
+# --- 繰り返しの断片 (値は埋め込む前にエスケープする) ---
+TEAM_CARD = """
+                <div class="team-card" style="border-top-color: {border_color};">
+                    <div class="team-rank">#{rank}</div>
+                    <div class="team-name">{team}</div>
+                    <div class="team-score {score_class}">{score_fmt}</div>
+                    <div class="team-diff">{diff_html}</div>
+                    <div class="team-members">{members_str}</div>
+                </div>
+        """
+
+PLAYER_ROW = """
+                        <tr>
+                            <td>{rank}</td>
+                            <td>{name}</td>
+                            <td>{team}</td>
+                            <td class="{score_class}">{score:+.1f}</td>
+                            <td>{diff_html}</td>
+                            <td>{games}</td>
+                            <td>{avg_rank:.2f}</td>
+                        </tr>
+        """
+
+DEFAULT_COLOR = {'red': 1, 'green': 1, 'blue': 1}
+
+# --- データファイル ---
+DATA_DIR = 'data'   # index.html と同じ場所からの相対パス
+PAYLOAD_PATTERN = re.compile(r'^(summary|history-[^.]+)\.[0-9a-f]{12}\.json(\.gz|\.br)?$')
+GENERATIONS_FILE = 'generations.json'   # 今回と前回の manifest が参照するデータファイル名
+
+
+def js_value(value):
+    # <script> 内に埋め込む値。名前に "</script>" などが含まれてもスクリプトが途切れないようにする
+    return json.dumps(value, ensure_ascii=False).replace('</', '<\\/')
+
+
+def write_payload(data_dir, name, data):
+    # "name.<内容のハッシュ>.json" として書き出し、gzip (と brotli) で圧縮した版も並べて置く
+    # 同じファイル名なら中身も同じなので書き直さない。ファイル名を返す
+    body = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    filename = f"{name}.{hashlib.sha256(body).hexdigest()[:12]}.json"
+    path = os.path.join(data_dir, filename)
+    if not os.path.exists(path):
+        # 圧縮版を先に置き、.json があれば揃っているとみなせるようにする
+        write_fragments(path + '.gz', [gzip.compress(body, compresslevel=9, mtime=0)], mode='wb')
+        if brotli is not None:
+            write_fragments(path + '.br', [brotli.compress(body)], mode='wb')
+        write_fragments(path, [body], mode='wb')
+    return filename
+
+
+def pack_deltas(values):
+    # 整数列をリトルエンディアンの Int16 (範囲外の値があれば Int32) のバイト列にして base64 で返す
+    typecode, name = ('h', 'i16') if all(-32768 <= value <= 32767 for value in values) else ('i', 'i32')
+    packed = array(typecode, values)
+    if sys.byteorder == 'big':
+        packed.byteswap()
+    return name, base64.b64encode(packed.tobytes()).decode('ascii')
+
+
+def write_payloads(data_dir, draft_teams, team_colors, stats, history_options=None, player_data=None):
+    # 月ごとの推移と、それ以外 (チームの色・サンプルチーム用の選手スコア) の要約を書き出す
+    # index.html に埋め込む読み込み先一覧 (manifest) を返す
+    # player_data は選手ごとの推移に使う (スナップショットから読み込んだ集計のとき)
+    os.makedirs(data_dir, exist_ok=True)
+    teams = list(draft_teams.keys())
+    history_options = history_options or mleague_history.DEFAULT_HISTORY_OPTIONS
+
+    # 時系列順の点を、月が変わるところで区切る。累計は開幕からの値なので確定した月の中身は変わらない
+    # (点数の上限を超えて間引くときは、点が増えるたびに残る点が変わるので過去の月も書き直される)
+    points = mleague_history.build_history(stats, history_options['resolution'], history_options['max_points'])
+    player_series = mleague_history.player_history(stats, points, player_data)
+    player_names = sorted(enumerate(stats.players.names), key=lambda item: item[1])
+    previous = [0] * len(stats.players)     # 前の月の末尾の累計 (0.1点単位)
+    position = 0
+    history = []
+    for month, month_points in groupby(points, key=lambda point: point[1][:7]):
+        month_points = list(month_points)
+        count = len(month_points)
+        labels = [point[0] for point in month_points]
+        series = [[round(point[2][team_id], 1) for point in month_points] for team_id in range(len(teams))]
+
+        # 選手ごとの累計を 0.1点単位の整数にして、前の点との差分を選手名順に並べる
+        # その月に点が動かなかった選手は省く (後から出てきた選手で過去の月の中身が変わらない)
+        names = []
+        deltas = []
+        for player_id, player_name in player_names:
+            tenths = [round(value * 10) for value in player_series[player_id][position:position + count]]
+            player_deltas = [value - before for before, value in zip([previous[player_id]] + tenths, tenths)]
+            previous[player_id] = tenths[-1]
+            if any(player_deltas):
+                names.append(player_name)
+                deltas.extend(player_deltas)
+        position += count
+        delta_type, packed = pack_deltas(deltas)
+
+        # 日付として読めない試合 ("日付不明") は英数字が残らないので unknown にする (PAYLOAD_PATTERN で掃除できる名前)
+        name = 'history-' + (re.sub(r'[^0-9A-Za-z]+', '-', month).strip('-') or 'unknown')
+        history.append(write_payload(data_dir, name, {
+            'labels': labels,
+            'series': series,
+            'players': {'names': names, 'type': delta_type, 'deltas': packed},
+        }))
+
+    players = [
+        {'name': player_name, 'score': round(stats.total_score[player_id], 1)}
+        for player_id, player_name in enumerate(stats.players.names)
+    ]
+    players.sort(key=lambda x: x['score'], reverse=True)
+    summary = write_payload(data_dir, 'summary', {
+        'teams': [{'label': team, 'color': list(team_rgb(team_colors, team))} for team in teams],
+        'players': players,
+    })
+
+    base = os.path.basename(data_dir)
+    return {'summary': f"{base}/{summary}", 'history': [f"{base}/{filename}" for filename in history]}
+
+
+def remove_stale_payloads(data_dir, manifest):
+    # 今回と前回の manifest のどちらからも参照されない古いデータファイルを消す
+    # キャッシュに残った前回の index.html が読みに来るファイルは、次に内容が変わるまで残す
+    current = sorted(os.path.basename(url) for url in [manifest['summary']] + manifest['history'])
+    path = os.path.join(data_dir, GENERATIONS_FILE)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            generations = json.load(f)
+    except (OSError, ValueError):
+        # 記録がなければ、今あるファイルをすべて前回の分とみなす (何も消さない)
+        generations = {'current': sorted(filename for filename in os.listdir(data_dir)
+                                         if PAYLOAD_PATTERN.match(filename) and not filename.endswith(('.gz', '.br')))}
+    if generations.get('current') != current:
+        generations = {'current': current, 'previous': generations.get('current', [])}
+        write_fragments(path, [json.dumps(generations, ensure_ascii=False, indent=2)])
+    keep = set(generations['current']) | set(generations.get('previous', []))
+    removed = 0
+    for filename in os.listdir(data_dir):
+        match = PAYLOAD_PATTERN.match(filename)
+        if match and filename[:len(filename) - len(match.group(2) or '')] not in keep:
+            os.remove(os.path.join(data_dir, filename))
+            removed += 1
+    return removed
+
+
+def team_rgb(team_colors, team):
+    color_data = team_colors.get(team, DEFAULT_COLOR)
+    return int(color_data['red']*255), int(color_data['green']*255), int(color_data['blue']*255)
+
+
+def render_page(draft_teams, team_colors, stats, now_str, manifest):
+    # ページを先頭から順に断片 (文字列) として返す。全体を1つの文字列にはしない
+    # --- 1. データ集計 (最終スコア & 直近日差分) ---
+    last_date = stats.last_date
+    team_day_diffs = {team: stats.team_day_diff(team) for team in draft_teams.keys()}
+    team_totals = {team: stats.team_total(team) for team in draft_teams.keys()}
+
+    sorted_teams = sorted(team_totals.items(), key=lambda x: x[1], reverse=True)
+
+    yield PAGE_HEAD
+    yield escape(now_str)
+    yield HEADER_END
+
+    for i, (team, score) in enumerate(sorted_teams, 1):
+        r, g, b = team_rgb(team_colors, team)
+
+        # 差分表示
+        diff = team_day_diffs[team]
+        if diff != 0:
+            diff_sign = "+" if diff > 0 else ""
+            diff_color = "#4CAF50" if diff > 0 else "#FF5252"
+            diff_html = f'<span style="color: {diff_color};">({escape(str(last_date))}: {diff_sign}{diff:.1f})</span>'
+        else:
+            diff_html = '<span style="color: #555;">(-)</span>'
+
+        yield TEAM_CARD.format(
+            border_color=f"rgb({r},{g},{b})",
+            rank=i,
+            team=escape(team),
+            score_class="positive" if score >= 0 else "negative",
+            score_fmt=f"{score:+.1f}",
+            diff_html=diff_html,
+            members_str=" / ".join(escape(member) for member in draft_teams.get(team, [])),
+        )
+
+    yield TABLE_START
+
+    # --- 2. 個人成績 (ドラフトされた選手のみ) ---
+    valid_players = set()
+    for players in draft_teams.values():
+        valid_players.update(players)
+
+    player_data_list = []
+    for player_id, player in enumerate(stats.players.names):
+        if player not in valid_players:
+            continue
+        player_data_list.append({
+            'name': player,
+            'team': stats.team_of(player) or "Unknown",
+            'score': stats.total_score[player_id],
+            'diff': stats.day_diff[player_id],
+            'games': stats.game_count[player_id],
+            'avg_rank': stats.avg_rank(player)
+        })
+    player_data_list.sort(key=lambda x: x['score'], reverse=True)
+
+    for i, p in enumerate(player_data_list, 1):
+        # 個人差分
+        if p['diff'] != 0:
+            diff_sign = "+" if p['diff'] > 0 else ""
+            diff_color = "positive" if p['diff'] > 0 else "negative"
+            diff_html = f'<span class="{diff_color} diff-text">({diff_sign}{p["diff"]:.1f})</span>'
+        else:
+            diff_html = '<span style="color: #555; font-size: 0.8rem;">-</span>'
+
+        yield PLAYER_ROW.format(
+            rank=i,
+            name=escape(p['name']),
+            team=escape(p['team']),
+            score_class="positive" if p['score'] >= 0 else "negative",
+            score=p['score'],
+            diff_html=diff_html,
+            games=p['games'],
+            avg_rank=p['avg_rank'],
+        )
+
+    yield SAMPLE_TEAM_AND_SCRIPT_START
+
+    # --- 3. グラフ・サンプルチームのデータの読み込み先 ---
+    yield f"        const manifest = {js_value(manifest)};\n"
+
+    yield SCRIPT_END
+
+
+def write_fragments(path, fragments, mode='w'):
+    # 断片を一時ファイルに順に書き、書き終えてから置き換える (途中で失敗しても古いページが残る)
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, mode, encoding=None if 'b' in mode else 'utf-8') as f:
+            for fragment in fragments:
+                f.write(fragment)
+        os.chmod(tmp_path, 0o644)   # 公開するファイルなので mkstemp の 0600 のままにしない
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def generate_html(all_player_data, draft_teams, team_colors, stats=None, output_path=None, history_options=None):
+    # all_player_data はメモリ上のリストでも mleague_store.ResultsStore でもよい
+    # stats (mleague_stats.RunStats) を渡すと集計を再利用する
+    # history_options はグラフの点のまとめ方と上限 (mleague_history.get_history_options)
+    # output_path を省略するとこのファイルと同じ場所の index.html に書き出す
+    if stats is None:
+        stats = compute_stats(all_player_data, draft_teams)
+
+    # 日本時間 (UTC+9)
+    jst_now = datetime.utcnow() + timedelta(hours=9)
+    now_str = jst_now.strftime('%Y/%m/%d %H:%M')
+
+    if output_path is None:
+        output_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'index.html')
+    # データファイルを先に置いてから index.html を差し替え、最後に参照されなくなったファイルを消す
+    data_dir = os.path.join(os.path.dirname(os.path.abspath(output_path)), DATA_DIR)
+    manifest = write_payloads(data_dir, draft_teams, team_colors, stats, history_options, all_player_data)
+    write_fragments(output_path, render_page(draft_teams, team_colors, stats, now_str, manifest))
+    remove_stale_payloads(data_dir, manifest)
     print(f"Web Page generated: {output_path}")
+    return output_path
 
 if __name__ == "__main__":
     pass
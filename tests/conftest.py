@@ -0,0 +1,15 @@
+import os
+import sys
+
+import pytest
+
+# モジュールはリポジトリ直下に置いているので、テストからそのまま import できるようにする
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def make_game():
+    # 1試合分の [試合名, 選手名, スコア, 順位] の4行を作る
+    def make(title, scores=(40.0, 10.0, -20.0, -30.0), players=('A', 'B', 'C', 'D')):
+        return [[title, player, score, rank] for rank, (player, score) in enumerate(zip(players, scores), 1)]
+    return make
@@ -0,0 +1,110 @@
+from mleague_dedup import (CHANGED, NEW, SeenSet, content_hash, dedupe_games, game_fingerprint, latest_games,
+                           make_game_id)
+from mleague_fingerprint import data_fingerprint
+from mleague_parser import UNKNOWN_DATE, UNKNOWN_NUMBER
+
+
+def game_id(game):
+    return make_game_id(game[0][0], game)
+
+
+def test_game_id_depends_only_on_slot(make_game):
+    fixed_scores = (41.0, 9.0, -20.0, -30.0)
+    assert game_id(make_game('2025/10/01 1回戦')) == game_id(make_game('2025/10/01 1回戦', scores=fixed_scores))
+    assert game_id(make_game('2025/10/01 1回戦')) != game_id(make_game('2025/10/01 2回戦'))
+    assert game_id(make_game('2025/10/01 1回戦')) != game_id(make_game('2025/10/02 1回戦'))
+
+
+def test_game_id_without_slot_uses_content(make_game):
+    # 日付か回戦が読めなかった試合は、同じ試合名でも選手・スコアが違えば別の試合
+    for title in (f'2025/10/01 {UNKNOWN_NUMBER}', f'{UNKNOWN_DATE} 1回戦', f'{UNKNOWN_DATE} {UNKNOWN_NUMBER}'):
+        first = make_game(title)
+        other = make_game(title, players=('E', 'F', 'G', 'H'))
+        assert game_id(first) == game_id(make_game(title))
+        assert game_id(first) != game_id(other)
+
+        seen = SeenSet()
+        corrected = []
+        kept = list(dedupe_games([(title, first), (title, other)], seen, corrected))
+        assert len(latest_games(kept)) == 2
+        assert corrected == []
+
+
+def test_content_hash_ignores_row_order_and_score_notation(make_game):
+    rows = make_game('2025/10/01 1回戦')
+    reordered = [list(row) for row in reversed(rows)]
+    reordered[0][2] = str(reordered[0][2]) + '0'    # -30.0 -> "-30.00"
+    assert content_hash(rows) == content_hash(reordered)
+    assert content_hash(rows) != content_hash(make_game('2025/10/01 1回戦', scores=(41.0, 9.0, -20.0, -30.0)))
+
+
+def test_seen_set_reports_new_changed_and_duplicate():
+    seen = SeenSet()
+    assert seen.add('g1', 'a') == NEW
+    assert seen.add('g1', 'a') is None
+    assert seen.add('g1', 'b') == CHANGED
+    assert len(seen) == 1
+    assert seen.fingerprint == game_fingerprint('g1', 'b')
+
+
+def test_seen_set_capacity_forgets_oldest():
+    seen = SeenSet(capacity=2)
+    for game_id in ('x', 'y', 'z'):
+        seen.add(game_id, 'digest')
+    assert 'x' not in seen
+    assert 'y' in seen and 'z' in seen
+
+
+def test_seen_set_round_trip(tmp_path):
+    path = tmp_path / 'seen.txt'
+    seen = SeenSet()
+    seen.add('x', 'a')
+    seen.add('y', 'b')
+    seen.save(path, row_count=8, results_bytes=100, season=2025)
+
+    loaded = SeenSet.load(path, expected_rows=8, expected_bytes=100, expected_season=2025)
+    assert loaded is not None
+    assert loaded.fingerprint == seen.fingerprint
+    assert loaded.add('x', 'a') is None
+    # 保存済みCSVと件数・バイト数が合わなければ使わない
+    assert SeenSet.load(path, expected_rows=12) is None
+    assert SeenSet.load(path, expected_bytes=101) is None
+    # シーズンが替わったら使わない
+    assert SeenSet.load(path, expected_season=2026) is None
+
+
+def test_dedupe_games_yields_new_and_corrected_games(make_game):
+    seen = SeenSet()
+    first = make_game('2025/10/01 1回戦')
+    second = make_game('2025/10/01 2回戦')
+    assert [g[1] for g in dedupe_games([(first[0][0], first), (second[0][0], second)], seen)] == [
+        '2025/10/01 1回戦', '2025/10/01 2回戦']
+
+    # 同じ内容は取り込まず、同じ枠でスコアが変わった試合は修正として返す
+    fixed = make_game('2025/10/01 1回戦', scores=(41.0, 9.0, -20.0, -30.0))
+    corrected = []
+    result = list(dedupe_games([(first[0][0], first), (fixed[0][0], fixed)], seen, corrected))
+    assert [(g[0], g[2]) for g in result] == [(game_id(first), fixed)]
+    assert corrected == [(game_id(first), '2025/10/01 1回戦')]
+
+
+def test_dedupe_games_skips_incomplete_games(make_game):
+    rows = make_game('2025/10/01 1回戦')[:3]
+    assert list(dedupe_games([(rows[0][0], rows)], SeenSet())) == []
+
+
+def test_latest_games_keeps_last_copy_in_first_position(make_game):
+    old = make_game('2025/10/01 1回戦')
+    other = make_game('2025/10/01 2回戦')
+    new = make_game('2025/10/01 1回戦', scores=(41.0, 9.0, -20.0, -30.0))
+    games = [('g1', old[0][0], old), ('g2', other[0][0], other), ('g1', new[0][0], new)]
+    assert latest_games(games) == [('g1', new[0][0], new), ('g2', other[0][0], other)]
+
+
+def test_seen_fingerprint_matches_data_fingerprint_after_correction(make_game):
+    seen = SeenSet()
+    first = make_game('2025/10/01 1回戦')
+    fixed = make_game('2025/10/01 1回戦', scores=(41.0, 9.0, -20.0, -30.0))
+    second = make_game('2025/10/01 2回戦')
+    list(dedupe_games([(first[0][0], first), (second[0][0], second), (fixed[0][0], fixed)], seen))
+    assert seen.fingerprint_hex() == data_fingerprint(fixed + second)
@@ -0,0 +1,48 @@
+import math
+
+import pytest
+
+from mleague_history import downsample, title_key, week_start
+
+
+def make_points(count, team_count=3):
+    # (ラベル, 日付, [チーム順の累計], 何試合目まで) の形で、チームごとに形の違う系列を作る
+    return [
+        (f'p{i}', '2025/10/01', [math.sin(i / 7 + k) * 100 + k * i for k in range(team_count)], i + 1)
+        for i in range(count)
+    ]
+
+
+@pytest.mark.parametrize('count, max_points', [(10, 3), (100, 7), (501, 500), (1000, 50), (37, 10)])
+def test_downsample_keeps_endpoints_and_size(count, max_points):
+    points = make_points(count)
+    sampled = downsample(points, max_points)
+    assert len(sampled) == max_points
+    assert sampled[0] is points[0]
+    assert sampled[-1] is points[-1]
+    # 選んだ点は時系列順で、重複しない
+    ends = [point[3] for point in sampled]
+    assert ends == sorted(set(ends))
+
+
+@pytest.mark.parametrize('max_points', [0, 100, 200])
+def test_downsample_leaves_short_series(max_points):
+    points = make_points(100)
+    assert downsample(points, max_points) is points
+
+
+def test_downsample_keeps_peak():
+    points = make_points(200, team_count=1)
+    points[120] = ('peak', '2025/10/01', [10000.0], 121)
+    assert points[120] in downsample(points, 20)
+
+
+def test_title_key_orders_game_numbers_numerically():
+    titles = ['2025/10/01 10回戦', '2025/10/01 9回戦', '2025/09/30 2回戦']
+    assert sorted(titles, key=title_key) == ['2025/09/30 2回戦', '2025/10/01 9回戦', '2025/10/01 10回戦']
+
+
+def test_week_start_is_monday():
+    assert week_start('2025/10/05') == '2025/09/29'
+    assert week_start('2025/09/29') == '2025/09/29'
+    assert week_start('日付不明') == '日付不明'
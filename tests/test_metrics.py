@@ -0,0 +1,24 @@
+import json
+
+from mleague_metrics import EVENT_PREFIX, RunMetrics
+
+
+def test_events_are_opt_in():
+    # 計測値は metrics_callback を渡したときだけ流す
+    metrics = RunMetrics()
+    metrics.set('fetch', pages=3)
+    metrics.finish_stage('fetch', 0.5, 'ok')
+    assert metrics.finish()['stages']['fetch'] == {'pages': 3, 'wall_time': 0.5, 'status': 'ok'}
+
+
+def test_events_carry_stage_values():
+    events = []
+    metrics = RunMetrics(events.append)
+    metrics.add('fetch', requests=2)
+    metrics.add('fetch', requests=1)
+    metrics.finish_stage('fetch', 0.25, 'failed', ValueError('boom'))
+    metrics.finish()
+
+    assert [event.name for event in events] == ['stage', 'run']
+    assert events[0].data == {'stage': 'fetch', 'requests': 3, 'wall_time': 0.25, 'status': 'failed', 'error': 'boom'}
+    assert json.loads(events[0][len(EVENT_PREFIX):])['event'] == 'stage'
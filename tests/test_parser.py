@@ -0,0 +1,53 @@
+import pytest
+
+from mleague_benchmark import generate_month_page
+from mleague_parser import parse_results_games, parse_results_page, parse_results_page_bs4, title_season
+
+pytest.importorskip('bs4')
+
+PAGE = """<html><body>
+<div class="p-gamesResult__date">10/6<span>(月)</span></div>
+<div class="p-gamesResult__column">
+  <div class="p-gamesResult__number">1回戦</div>
+  <ol class="p-gamesResult__rank-list">
+    <li><div class="p-gamesResult__name">選手A</div><div class="p-gamesResult__point">+52.3pt</div>
+    <li><div class="p-gamesResult__name">選手B</div><div class="p-gamesResult__point">+8.1pt</div>
+    <li><div class="p-gamesResult__name">選手C</div><div class="p-gamesResult__point">▲20.4pt</div>
+    <li><div class="p-gamesResult__name">選手D</div><div class="p-gamesResult__point">▲40.0pt</div>
+  </ol>
+</div>
+</body></html>"""
+
+
+@pytest.mark.parametrize('close_items', [True, False])
+@pytest.mark.parametrize('year, month', [(2025, 10), (2026, 3)])
+def test_streaming_parser_matches_bs4(year, month, close_items):
+    content = generate_month_page(year, month, game_days=4, close_items=close_items)
+    rows = parse_results_page(content, 2025)
+    assert len(rows) == 4 * 2 * 4
+    assert rows == parse_results_page_bs4(content, 2025)
+
+
+def test_unclosed_list_items():
+    rows = parse_results_page(PAGE, 2025)
+    assert rows == parse_results_page_bs4(PAGE.encode('utf-8'), 2025)
+    assert rows == [
+        ['2025/10/06 1回戦', '選手A', 52.3, 1],
+        ['2025/10/06 1回戦', '選手B', 8.1, 2],
+        ['2025/10/06 1回戦', '選手C', -20.4, 3],
+        ['2025/10/06 1回戦', '選手D', -40.0, 4],
+    ]
+
+
+def test_games_group_rows_by_column():
+    content = generate_month_page(2025, 10, game_days=2)
+    games = parse_results_games(content, 2025)
+    assert [title for title, _ in games] == ['2025/10/01 1回戦', '2025/10/01 2回戦', '2025/10/03 1回戦', '2025/10/03 2回戦']
+    assert [row for _, rows in games for row in rows] == parse_results_page(content, 2025)
+
+
+def test_title_season():
+    assert title_season('2025/09/15 1回戦') == 2025
+    assert title_season('2026/05/10 2回戦') == 2025
+    assert title_season('2026/09/01 1回戦') == 2026
+    assert title_season('日付不明 1回戦') is None
@@ -0,0 +1,108 @@
+import pytest
+
+from mleague_publish import SheetsBatch, is_idempotent, request_size, split_request
+
+
+class FakeWorksheet:
+    def __init__(self, sheet_id=0, row_count=10, col_count=5):
+        self.id = sheet_id
+        self.row_count = row_count
+        self.col_count = col_count
+
+
+class FakeSpreadsheet:
+    def __init__(self):
+        self.bodies = []
+
+    def batch_update(self, body):
+        self.bodies.append(body)
+
+
+class FakeApi:
+    # GoogleApiClient.call と同じ呼び出し方で、送った順と idempotent を記録する
+    def __init__(self, fail_times=0):
+        self.calls = []
+        self.fail_times = fail_times
+
+    def call(self, func, *args, idempotent=True, **kwargs):
+        if self.fail_times:
+            self.fail_times -= 1
+            raise ConnectionError('boom')
+        self.calls.append(idempotent)
+        return func(*args, **kwargs)
+
+
+def test_split_request_halves_update_cells():
+    worksheet = FakeWorksheet()
+    batch = SheetsBatch(FakeSpreadsheet(), api=FakeApi())
+    batch.write_values(worksheet, 3, 1, [[i, f'row{i}'] for i in range(5)])
+    request = batch.requests[-1]
+    first, second = split_request(request)
+    assert first['updateCells']['start']['rowIndex'] == 2
+    assert second['updateCells']['start']['rowIndex'] == 4
+    assert first['updateCells']['rows'] + second['updateCells']['rows'] == request['updateCells']['rows']
+    # 分けられないリクエストはそのまま
+    assert split_request({'autoResizeDimensions': {}}) == [{'autoResizeDimensions': {}}]
+
+
+def test_chunks_respect_max_request_bytes_and_order():
+    worksheet = FakeWorksheet(row_count=1000)
+    batch = SheetsBatch(FakeSpreadsheet(), api=FakeApi(), max_request_bytes=2000)
+    values = [[f'2025/10/{i % 28 + 1:02d} {i}回戦', f'選手{i}', i * 1.5, i % 4 + 1] for i in range(200)]
+    batch.write_values(worksheet, 1, 1, values)
+    batch.auto_resize_columns(worksheet, 0, 4)
+
+    chunks = list(batch.chunks())
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert sum(request_size(request) for request in chunk) <= 2000
+    requests = [request for chunk in chunks for request in chunk]
+    assert 'autoResizeDimensions' in requests[-1]
+    rows = [row for request in requests if 'updateCells' in request for row in request['updateCells']['rows']]
+    assert [row['values'][1]['userEnteredValue']['stringValue'] for row in rows] == [f'選手{i}' for i in range(200)]
+    starts = [request['updateCells']['start']['rowIndex'] for request in requests if 'updateCells' in request]
+    assert starts == sorted(starts) and starts[0] == 0
+
+
+def test_ensure_size_tracks_grid():
+    worksheet = FakeWorksheet(row_count=2, col_count=2)
+    batch = SheetsBatch(FakeSpreadsheet(), api=FakeApi())
+    batch.write_values(worksheet, 1, 1, [[1, 2, 3]] * 4)
+    kinds = [next(iter(request)) for request in batch.requests]
+    assert kinds == ['appendDimension', 'appendDimension', 'updateCells']
+    assert batch.grid[worksheet.id] == [4, 3]
+    batch.delete_rows(worksheet, 2, 3)
+    assert batch.grid[worksheet.id] == [2, 3]
+    assert batch.clamp_range(worksheet, 1, 10) == 'A1:C2'
+
+
+def test_flush_marks_non_idempotent_chunks():
+    worksheet = FakeWorksheet(row_count=2)
+    spreadsheet = FakeSpreadsheet()
+    api = FakeApi()
+    batch = SheetsBatch(spreadsheet, api=api, max_request_bytes=300)
+    batch.insert_rows(worksheet, 1, 1)
+    batch.write_values(worksheet, 1, 1, [['x' * 100]])
+    batch.write_values(worksheet, 1, 2, [['y' * 100]])
+
+    assert batch.flush() == len(spreadsheet.bodies) == len(api.calls)
+    assert api.calls == [is_idempotent(body['requests']) for body in spreadsheet.bodies]
+    assert api.calls[0] is False and api.calls[-1] is True
+
+
+def test_flush_resumes_after_failure():
+    worksheet = FakeWorksheet(row_count=100)
+    spreadsheet = FakeSpreadsheet()
+    api = FakeApi()
+    batch = SheetsBatch(spreadsheet, api=api, max_request_bytes=300)
+    for row in range(1, 4):
+        batch.write_values(worksheet, row, 1, [['v' * 100]])
+    expected = list(batch.chunks())
+
+    api.fail_times = 1
+    with pytest.raises(ConnectionError):
+        batch.flush()
+    assert len(batch) == 3
+    batch.flush()
+    assert [body['requests'] for body in spreadsheet.bodies] == expected
+    assert len(batch) == 0
@@ -0,0 +1,59 @@
+import pytest
+from gspread import utils as gspread_utils
+
+from mleague_sheets import diff_rows
+
+
+def apply_diff(old_rows, diff):
+    # SheetDiff を stage_diff と同じ順でリストに適用する (シートに書いたときと同じ結果になるか調べる)
+    rows = [list(row) for row in old_rows]
+    for start, end in diff.clear_rows:
+        for row in range(start - 1, end):
+            rows[row] = []
+    for op in diff.structural:
+        if op[0] == 'delete':
+            del rows[op[1] - 1:op[2]]
+        else:
+            rows[op[1] - 1:op[1] - 1] = [list(values) for values in op[2]]
+    for cell_range, values in diff.updates:
+        row, col = gspread_utils.a1_to_rowcol(cell_range.split(':')[0])
+        target = rows[row - 1]
+        target.extend([''] * (col - 1 + len(values[0]) - len(target)))
+        target[col - 1:col - 1 + len(values[0])] = values[0]
+    return rows
+
+
+def trimmed(rows):
+    result = []
+    for row in rows:
+        row = list(row)
+        while row and row[-1] in ('', None):
+            row.pop()
+        result.append(row)
+    while result and not result[-1]:
+        result.pop()
+    return result
+
+
+def test_diff_rows_identical_is_empty():
+    rows = [['試合', '選手'], ['2025/10/01 1回戦', 'A']]
+    assert diff_rows(rows, [list(r) + [''] for r in rows]).is_empty()
+
+
+@pytest.mark.parametrize('old, new', [
+    ([['a', 1], ['b', 2], ['c', 3]], [['a', 1], ['b', 5], ['c', 3]]),          # セルの更新
+    ([['a', 1], ['c', 3]], [['a', 1], ['b', 2], ['c', 3]]),                    # 途中に挿入
+    ([['a', 1], ['b', 2], ['c', 3]], [['a', 1], ['c', 3]]),                    # 途中を削除
+    ([['a', 1], ['b', 2], ['c', 3]], [['a', 1]]),                              # 末尾を削除
+    ([['a', 1]], [['a', 1], ['b', 2], ['c', 3]]),                              # 末尾に追加
+    ([['x'], ['a', 1], ['b', 2]], [['a', 1], ['z', 9], ['b', 2], ['y', 0]]),
+])
+def test_diff_rows_reproduces_new_rows(old, new):
+    diff = diff_rows(old, new)
+    assert trimmed(apply_diff(old, diff)) == trimmed(new)
+
+
+def test_diff_rows_marks_touched_rows():
+    diff = diff_rows([['a', 1], ['b', 2]], [['a', 1], ['b', 3], ['c', 4]])
+    assert diff.touched_rows == {2, 3}
+    assert diff.inserted_row_count() == 1
@@ -0,0 +1,42 @@
+import pytest
+
+import mleague_store
+from mleague_store import ResultsStore, as_player_data
+
+
+def test_reopen_keeps_games(tmp_path, make_game):
+    path = tmp_path / 'results.sqlite3'
+    rows = make_game('2025/10/01 1回戦')
+    with ResultsStore(path) as store:
+        store.upsert_player_data(rows, 2025)
+    with ResultsStore(path) as store:
+        assert store.conn.execute("PRAGMA user_version").fetchone()[0] == mleague_store.SCHEMA_VERSION
+        assert store.all_player_data(2025) == rows
+
+
+def test_upsert_replaces_corrected_game(tmp_path, make_game):
+    with ResultsStore(tmp_path / 'results.sqlite3') as store:
+        store.upsert_player_data(make_game('2025/10/01 1回戦'), 2025)
+        fixed = make_game('2025/10/01 1回戦', scores=(41.0, 9.0, -20.0, -30.0))
+        # 順位が入れ替わっても選手の行は4行のまま
+        fixed[0][1], fixed[1][1] = 'B', 'A'
+        store.upsert_player_data(fixed, 2025)
+        assert store.count_games() == 1
+        assert sorted(store.all_player_data(2025)) == sorted(fixed)
+
+
+def test_as_player_data_uses_one_season(tmp_path, make_game):
+    path = tmp_path / 'results.sqlite3'
+    current = make_game('2025/10/01 1回戦')
+    previous = make_game('2024/10/01 1回戦')
+    with ResultsStore(path) as store:
+        store.upsert_player_data(current, 2025)
+        assert as_player_data(store) == current
+        store.upsert_player_data(previous, 2024)
+        # バックフィル後はシーズンを決めないと混ざるので受け付けない
+        with pytest.raises(ValueError):
+            as_player_data(store)
+        assert as_player_data(store, 2024) == previous
+
+    with ResultsStore(path, season=2025) as store:
+        assert as_player_data(store) == current
@@ -0,0 +1,46 @@
+import os
+
+from mleague_viewer import remove_stale_payloads
+
+
+def payload(data_dir, name):
+    for suffix in ('', '.gz'):
+        with open(os.path.join(data_dir, name + suffix), 'w') as f:
+            f.write('{}')
+    return name
+
+
+def manifest(*names):
+    return {'summary': f"data/{names[0]}", 'history': [f"data/{name}" for name in names[1:]]}
+
+
+def test_keeps_previous_generation(tmp_path):
+    data_dir = str(tmp_path)
+    first = [payload(data_dir, 'summary.000000000001.json'), payload(data_dir, 'history-2025-10.000000000001.json')]
+    remove_stale_payloads(data_dir, manifest(*first))
+
+    second = [payload(data_dir, 'summary.000000000002.json'), first[1]]
+    remove_stale_payloads(data_dir, manifest(*second))
+    # 前回の index.html が参照するファイルはまだ残す
+    assert os.path.exists(os.path.join(data_dir, first[0]))
+    assert os.path.exists(os.path.join(data_dir, first[0] + '.gz'))
+
+    # 同じ内容で作り直しても前回の世代は入れ替わらない
+    remove_stale_payloads(data_dir, manifest(*second))
+    assert os.path.exists(os.path.join(data_dir, first[0]))
+
+    third = [payload(data_dir, 'summary.000000000003.json'), first[1]]
+    remove_stale_payloads(data_dir, manifest(*third))
+    assert not os.path.exists(os.path.join(data_dir, first[0]))
+    assert not os.path.exists(os.path.join(data_dir, first[0] + '.gz'))
+    assert sorted(os.listdir(data_dir)) == sorted(
+        [name + suffix for name in set(second + third) for suffix in ('', '.gz')] + ['generations.json'])
+
+
+def test_without_record_keeps_existing_files(tmp_path):
+    # 記録のないディレクトリ (公開中のファイルを戻しただけ) では何も消さない
+    data_dir = str(tmp_path)
+    old = payload(data_dir, 'summary.00000000000a.json')
+    new = payload(data_dir, 'summary.00000000000b.json')
+    remove_stale_payloads(data_dir, manifest(new))
+    assert os.path.exists(os.path.join(data_dir, old))